@@ -1,3 +1,4 @@
 import os
 
-PROJECT_PATH = os.path.dirname(__file__)
\ No newline at end of file
+# FINB_PROJECT_PATH moves the market directory, it is also seen by the worker processes
+PROJECT_PATH = os.environ.get("FINB_PROJECT_PATH", os.path.dirname(__file__))
\ No newline at end of file
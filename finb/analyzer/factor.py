@@ -1,13 +1,18 @@
+import inspect
+import functools
 import pandas as pd
 import numpy as np
 import datetime
 from finb.utils.datahub import read_balance_sheet, read_income_statement, \
     read_cashflow, read_financial_indicators, read_price_df, read_major_holders
 from finb.utils.date import current_quarter_and_year, prev_quarter
+from finb.utils.trading_calendar import quarter_end_sessions
 from finb.utils.constant import PAR_VALUE, TAX_RATE
+from finb.utils.accounts import ACCOUNT
 
 
 def nanc(f):
+    @functools.wraps(f)
     def inside(self, *args, **kwargs):
         try:
             return f(self, *args, **kwargs)
@@ -16,381 +21,455 @@ def nanc(f):
     return inside
 
 
-class CompanyQuarterlyFundamentalFactors:
-    def __init__(self, symbol, year:int=None, quarter:int=None, dont_load_prev=False, using_current_price=False):
-        self.symbol = symbol
-        if year is None or quarter is None:
-            self.year, self.quarter = current_quarter_and_year()
-        else:
-            self.year = year
-            self.quarter = quarter
+class memoized:
+    """ Property computed on first access and kept in the instance """
+    def __init__(self, f):
+        self.f = f
+        self.name = f.__name__
+        self.__doc__ = f.__doc__
 
-        self.balansheet_df = read_balance_sheet(symbol, self.year, self.quarter)
-        self.incomestat_df = read_income_statement(symbol, self.year, self.quarter)
-        self.cashflow_df = read_cashflow(symbol, self.year, self.quarter)
-        # self.fininds_df = read_financial_indicators(symbol, self.year, self.quarter)
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self.f(instance)
+        instance.__dict__[self.name] = value
+        return value
 
-        self.price_df = read_price_df(symbol)
 
-        if self.quarter == 1:
-            sd = datetime.datetime(year=year, month=1, day=1)
-            ed = datetime.datetime(year=year, month=4, day=1)
-        elif self.quarter == 2:
-            sd = datetime.datetime(year=year, month=4, day=1)
-            ed = datetime.datetime(year=year, month=7, day=1)
-        elif self.quarter == 3:
-            sd = datetime.datetime(year=year, month=7, day=1)
-            ed = datetime.datetime(year=year, month=10, day=1)
-        else:
-            sd = datetime.datetime(year=year, month=10, day=1)
-            ed = datetime.datetime(year=year+1, month=1, day=1)
+class factor(memoized):
+    """ Memoized factor property, the factors and the data it reads are taken from its code """
+    def __init__(self, f):
+        super().__init__(f)
+        self.names = set(inspect.unwrap(f).__code__.co_names)
 
-        if not using_current_price:
-            self.price_df = self.price_df[(self.price_df.index >= sd) & (self.price_df.index < ed)]
 
-        self.prev_fund_factors = []
+# lazily loaded data of CompanyQuarterlyFundamentalFactors
+FACTOR_DATA = ("balansheet_df", "incomestat_df", "cashflow_df", "price_df", "prev_fund_factors")
 
-        if not dont_load_prev:
-            prev_y = self.year
-            prev_q = self.quarter
-            for _ in range(4):
-                prev_y, prev_q = prev_quarter(prev_y, prev_q)
 
-                prev_fund_factor = CompanyQuarterlyFundamentalFactors(
-                        self.symbol, year=prev_y, quarter=prev_q, dont_load_prev=True)
-                self.prev_fund_factors.append(prev_fund_factor)
+class CompanyQuarterlyFundamentalFactors:
+    """ Factors of a company for a quarter
 
-    @property
+    Statements, prices and the previous quarters are loaded on first use and every factor is
+    computed once per instance, so requesting a subset of factors loads only what they need.
+    """
+    def __init__(self, symbol, year:int=None, quarter:int=None, dont_load_prev=False, using_current_price=False):
+        self.symbol = symbol
+        if year is None or quarter is None:
+            self.year, self.quarter = current_quarter_and_year()
+        else:
+            self.year = year
+            self.quarter = quarter
+        self.dont_load_prev = dont_load_prev
+        self.using_current_price = using_current_price
+
+    @memoized
+    def balansheet_df(self):
+        return read_balance_sheet(self.symbol, self.year, self.quarter, by_id=True)
+
+    @memoized
+    def incomestat_df(self):
+        return read_income_statement(self.symbol, self.year, self.quarter, by_id=True)
+
+    @memoized
+    def cashflow_df(self):
+        return read_cashflow(self.symbol, self.year, self.quarter, by_id=True)
+
+    @memoized
+    def price_df(self):
+        """ Prices of the quarter, or all prices with using_current_price """
+        price_df = read_price_df(self.symbol)
+        if self.using_current_price:
+            return price_df
+
+        sd = datetime.datetime(year=self.year, month=3 * self.quarter - 2, day=1)
+        ed = quarter_end_sessions(self.year, self.quarter)
+        return price_df[(price_df.index >= sd) & (price_df.index <= ed)]
+
+    @memoized
+    def prev_fund_factors(self):
+        """ Factors of the 4 previous quarters """
+        ret = []
+        if self.dont_load_prev:
+            return ret
+
+        prev_y = self.year
+        prev_q = self.quarter
+        for _ in range(4):
+            prev_y, prev_q = prev_quarter(prev_y, prev_q)
+
+            prev_fund_factor = CompanyQuarterlyFundamentalFactors(
+                    self.symbol, year=prev_y, quarter=prev_q, dont_load_prev=True)
+            ret.append(prev_fund_factor)
+        return ret
+
+    @classmethod
+    def factor_names(cls):
+        return [name for name, v in vars(cls).items() if isinstance(v, factor)]
+
+    @classmethod
+    def factor_graph(cls):
+        """ factor -> (factors it uses, data it reads), factors of previous quarters count as used factors """
+        names = set(cls.factor_names())
+        return {name: (sorted(vars(cls)[name].names & names), sorted(vars(cls)[name].names & set(FACTOR_DATA)))
+                for name in cls.factor_names()}
+
+    @classmethod
+    def dependencies(cls, factors):
+        """ Factors and data needed to compute the given factors
+
+        :return: (set of factors, set of data attributes)
+        """
+        graph = cls.factor_graph()
+        needed = set()
+        data = set()
+        stack = list(factors)
+        while len(stack) > 0:
+            name = stack.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            deps, reads = graph[name]
+            data.update(reads)
+            stack.extend(deps)
+        return needed, data
+
+    def compute(self, factors=None) -> pd.Series:
+        """ Values of the given factors, all factors by default """
+        factors = self.factor_names() if factors is None else factors
+        return pd.Series({name: getattr(self, name) for name in factors}, name=self.symbol)
+
+    @factor
     @nanc
     def NumberOfShares(self):
-        shares_equity = self.balansheet_df.loc["1. Vốn đầu tư của chủ sở hữu"]["values"]
+        shares_equity = self.balansheet_df.loc[ACCOUNT["owner_capital"]]["values"]
         num_of_shares = shares_equity / PAR_VALUE
         return num_of_shares
 
-    @property
+    @factor
     @nanc
     def BVPS(self):
         """ Book value """
-        v = (self.balansheet_df.loc["TỔNG CỘNG TÀI SẢN"]["values"]-self.balansheet_df.loc["A. Nợ phải trả"]["values"])/self.NumberOfShares
+        v = (self.balansheet_df.loc[ACCOUNT["total_assets"]]["values"]-self.balansheet_df.loc[ACCOUNT["liabilities"]]["values"])/self.NumberOfShares
         return v
 
-    @property
+    @factor
     @nanc
     def MC(self):
         """ Market Capitalization"""
         return self.NumberOfShares * self.price_df.iloc[-1]["Close"]*1000
 
-    @property
+    @factor
     @nanc
     def CCE(self):
         """ Cash and cash equivalents """
-        return float(self.balansheet_df.loc["I. Tiền và các khoản tương đương tiền"]["values"])
+        return float(self.balansheet_df.loc[ACCOUNT["cash"]]["values"])
 
-    @property
+    @factor
     @nanc
     def TotalDebt(self):
         """ Short-term debt + Long-term debt"""
-        return float(self.balansheet_df.loc["A. Nợ phải trả"]["values"])
+        return float(self.balansheet_df.loc[ACCOUNT["liabilities"]]["values"])
 
-    @property
+    @factor
     @nanc
     def TotalAsset(self):
         """ Short-term debt + Long-term debt"""
-        return float(self.balansheet_df.loc["TỔNG CỘNG TÀI SẢN"]["values"])
+        return float(self.balansheet_df.loc[ACCOUNT["total_assets"]]["values"])
 
-    @property
+    @factor
     @nanc
     def EV(self):
         """ Enterprise Value """
-        return self.MC + self.TotalDebt - self.CCE - self.balansheet_df.loc["II. Các khoản đầu tư tài chính ngắn hạn"]["values"]
+        return self.MC + self.TotalDebt - self.CCE - self.balansheet_df.loc[ACCOUNT["short_term_investments"]]["values"]
 
-    @property
+    @factor
     @nanc
     def CFO(self):
         """ Cash Flow From Operating Activities """
-        return float(self.cashflow_df.loc["Lưu chuyển tiền thuần từ hoạt động kinh doanh"]["values"])
+        return float(self.cashflow_df.loc[ACCOUNT["cfo"]]["values"])
 
-    @property
+    @factor
     @nanc
     def CFO2EV(self):
         return self.CFO/self.EV
 
-    @property
+    @factor
     @nanc
     def EBIT(self):
         """Earnings Before Interest and Tax"""
-        return self.incomestat_df.loc["15. Tổng lợi nhuận kế toán trước thuế (11)+(14)"]["values"] + \
-               self.incomestat_df.loc["-Trong đó: Chi phí lãi vay"]["values"]
+        return self.incomestat_df.loc[ACCOUNT["pretax_profit"]]["values"] + \
+               self.incomestat_df.loc[ACCOUNT["interest_expense"]]["values"]
 
-    @property
+    @factor
     @nanc
     def EBITDA(self):
         "Earnings Before Interest, Tax, Depreciation and Amortization"
-        return self.EBIT + self.cashflow_df.loc["- Khấu hao TSCĐ"]["values"]
+        return self.EBIT + self.cashflow_df.loc[ACCOUNT["depreciation"]]["values"]
 
-    @property
+    @factor
     @nanc
     def EBITDA2EV(self):
         "Earnings Before Interest, Tax, Depreciation and Amortization to Enterprise Value"
         return self.EBITDA/self.EV
 
-    @property
+    @factor
     @nanc
     def Trailing12MonthEPS(self):
         return self.EPS + self.prev_fund_factors[0].EPS + self.prev_fund_factors[1].EPS + self.prev_fund_factors[2].EPS
 
-    @property
+    @factor
     @nanc
     def Trailing12MonthPE(self):
         return self.price_df.iloc[-1].Close*1000 / self.Trailing12MonthEPS
 
-    @property
+    @factor
     @nanc
     def NetBB(self):
         """Net buyback"""
-        return -self.cashflow_df.loc["8. Cổ tức, lợi nhuận đã trả cho chủ sở hữu"]["values"] + \
-              -self.cashflow_df.loc["2. Tiền chi trả vốn góp cho các chủ sở hữu, mua lại cổ phiếu của doanh nghiệp đã phát hành"]["values"] - \
-             self.cashflow_df.loc["1. Tiền thu từ phát hành cổ phiếu, nhận vốn góp của chủ sở hữu"]["values"]
+        return -self.cashflow_df.loc[ACCOUNT["dividends_paid"]]["values"] + \
+              -self.cashflow_df.loc[ACCOUNT["share_buybacks"]]["values"] - \
+             self.cashflow_df.loc[ACCOUNT["share_issues"]]["values"]
 
-    @property
+    @factor
     @nanc
     def NetExtFin(self):
         """Net external Financing"""
 
         return self.NetBB + \
-                -self.cashflow_df.loc["4. Tiền chi trả nợ gốc vay"]["values"] - \
-                self.cashflow_df.loc["3. Tiền vay ngắn hạn, dài hạn nhận được"]["values"]
+                -self.cashflow_df.loc[ACCOUNT["loan_repayments"]]["values"] - \
+                self.cashflow_df.loc[ACCOUNT["borrowings_received"]]["values"]
 
-    @property
+    @factor
     @nanc
     def BB2P(self):
         """ Net buyback to market capitalization """
         return self.NetBB / self.MC
 
-    @property
+    @factor
     @nanc
     def BB2EV(self):
         """ Net external financing to enterprise value"""
         return self.NetExtFin / self.EV
 
-    @property
+    @factor
     @nanc
     def B2P(self):
         """ Book value to maket value"""
         return self.BVPS / (self.price_df.iloc[-1]["Close"]*1000)
 
-    @property
+    @factor
     @nanc
     def OPL(self):
         """Operating Liablities"""
-        return self.balansheet_df.loc["3. Phải trả người bán ngắn hạn"]["values"] + \
-            self.balansheet_df.loc["4. Người mua trả tiền trước"]["values"] + \
-            self.balansheet_df.loc["6. Phải trả người lao động"]["values"] + \
-            self.balansheet_df.loc["7. Chi phí phải trả ngắn hạn"]["values"] + \
-            self.balansheet_df.loc["10. Doanh thu chưa thực hiện ngắn hạn"]["values"] + \
-            self.balansheet_df.loc["1. Vay và nợ thuê tài chính ngắn hạn"]["values"]
+        return self.balansheet_df.loc[ACCOUNT["trade_payables"]]["values"] + \
+            self.balansheet_df.loc[ACCOUNT["advances_from_customers"]]["values"] + \
+            self.balansheet_df.loc[ACCOUNT["payables_to_employees"]]["values"] + \
+            self.balansheet_df.loc[ACCOUNT["accrued_expenses"]]["values"] + \
+            self.balansheet_df.loc[ACCOUNT["unearned_revenue"]]["values"] + \
+            self.balansheet_df.loc[ACCOUNT["short_term_borrowings"]]["values"]
 
-    @property
+    @factor
     @nanc
     def OPA(self):
         """Operating Assets"""
-        return self.balansheet_df.loc["I. Tiền và các khoản tương đương tiền"]["values"] + \
-                self.balansheet_df.loc["III. Các khoản phải thu ngắn hạn"]["values"] + \
-                self.balansheet_df.loc["IV. Tổng hàng tồn kho"]["values"] + \
-                self.balansheet_df.loc["I. Các khoản phải thu dài hạn"]["values"] + \
-                self.balansheet_df.loc["II. Tài sản cố định"]["values"] + \
-                self.balansheet_df.loc["1. Chi phí trả trước dài hạn"]["values"] + \
-                self.balansheet_df.loc["VII. Lợi thế thương mại"]["values"] + \
-                self.balansheet_df.loc["1. Chi phí sản xuất, kinh doanh dở dang dài hạn"]["values"] + \
-                self.balansheet_df.loc["2. chi phí xây dựng cơ bản dở dang"]["values"]
-
-    @property
+        return self.balansheet_df.loc[ACCOUNT["cash"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["short_term_receivables"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["inventories"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["long_term_receivables"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["fixed_assets"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["long_term_prepaid_expenses"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["goodwill"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["long_term_work_in_progress"]]["values"] + \
+                self.balansheet_df.loc[ACCOUNT["construction_in_progress"]]["values"]
+
+    @factor
     @nanc
     def NOA(self):
         """Net Operating Assets"""
         return self.OPA - self.OPL
 
-    @property
+    @factor
     @nanc
     def CFROI(self):
         """ Cash flow from operations to net operating assets """
         return self.CFO/self.NOA
 
-    @property
+    @factor
     @nanc
     def OL(self):
         """ Operating Leverage """
         return self.OPL/self.NOA
 
-    @property
+    @factor
     @nanc
     def XF(self):
         """ Net external financing to net operating assets"""
         return self.NetExtFin/self.NOA
 
-    @property
+    @factor
     @nanc
     def WC(self):
         """ Working capital """
-        return self.balansheet_df.loc["A. Tài sản lưu động và đầu tư ngắn hạn"]["values"] - \
-               self.balansheet_df.loc["A. Nợ phải trả"]["values"]
+        return self.balansheet_df.loc[ACCOUNT["current_assets"]]["values"] - \
+               self.balansheet_df.loc[ACCOUNT["liabilities"]]["values"]
 
-    @property
+    @factor
     @nanc
     def Revenue(self):
         """ Revenue (Sales) """
-        return self.incomestat_df.loc["1. Tổng doanh thu hoạt động kinh doanh"]["values"]
+        return self.incomestat_df.loc[ACCOUNT["total_revenue"]]["values"]
 
-    @property
+    @factor
     @nanc
     def S2EV(self):
         return self.Revenue / self.EV
 
-    @property
+    @factor
     @nanc
     def GrossIncome(self):
-        return self.incomestat_df.loc["5. Lợi nhuận gộp (3)-(4)"]["values"]
+        return self.incomestat_df.loc[ACCOUNT["gross_profit"]]["values"]
 
-    @property
+    @factor
     @nanc
     def NetIncome(self):
         """ Net Operarting Profit After Tax """
-        return self.incomestat_df.loc["19. Lợi nhuận sau thuế thu nhập doanh nghiệp (15)-(18)"]["values"]
+        return self.incomestat_df.loc[ACCOUNT["net_income"]]["values"]
 
-    @property
+    @factor
     @nanc
     def DeltaNOPAT(self):
         return self.NetIncome - self.prev_fund_factors[0].NetIncome
 
-    @property
+    @factor
     @nanc
     def DeltaNOA(self):
         return self.NOA - self.prev_fund_factors[0].NOA
 
-    @property
+    @factor
     @nanc
     def DeltaSales(self):
         return self.Revenue - self.prev_fund_factors[0].Revenue
 
-    @property
+    @factor
     @nanc
     def Profitability(self):
         return self.DeltaNOPAT/self.DeltaSales
 
-    @property
+    @factor
     @nanc
     def Scalability(self):
         return self.DeltaSales/self.NOA
 
-    @property
+    @factor
     @nanc
     def Growth(self):
         return self.DeltaSales/self.Revenue
 
-    @property
+    @factor
     @nanc
     def RIC(self):
         return self.Profitability * self.Scalability
 
-    @property
+    @factor
     @nanc
     def OtherInvestments(self):
-        return self.cashflow_df.loc["5. Đầu tư góp vốn vào công ty liên doanh liên kết"]["values"] + \
-            self.cashflow_df.loc["6. Chi đầu tư ngắn hạn"]["values"] + \
-            self.cashflow_df.loc["7. Tiền chi đầu tư góp vốn vào đơn vị khác"]["values"]
+        return self.cashflow_df.loc[ACCOUNT["investments_in_associates"]]["values"] + \
+            self.cashflow_df.loc[ACCOUNT["short_term_investment_payments"]]["values"] + \
+            self.cashflow_df.loc[ACCOUNT["investments_in_other_entities"]]["values"]
 
-    @property
+    @factor
     @nanc
     def DA(self):
         """ Depreciation & Amortization"""
-        return self.cashflow_df.loc["- Khấu hao TSCĐ"]["values"]
+        return self.cashflow_df.loc[ACCOUNT["depreciation"]]["values"]
 
-    @property
+    @factor
     @nanc
     def FCFF(self):
         return self.NetIncome + self.DA - self.DeltaWC - self.CAPEX - self.OtherInvestments
 
-    @property
+    @factor
     @nanc
     def FCFE(self):
         return self.FCFF + \
-               (self.cashflow_df["3. Tiền vay ngắn hạn, dài hạn nhận được"]["values"] +
-                self.cashflow_df["4. Tiền chi trả nợ gốc vay"]["values"] +
-                self.cashflow_df["5. Tiền chi trả nợ thuê tài chính"]["values"]) - \
-                self.cashflow_df["- Chi phí lãi vay"]["values"]*(1 - TAX_RATE)
+               (self.cashflow_df.loc[ACCOUNT["borrowings_received"]]["values"] +
+                self.cashflow_df.loc[ACCOUNT["loan_repayments"]]["values"] +
+                self.cashflow_df.loc[ACCOUNT["lease_repayments"]]["values"]) - \
+                self.cashflow_df.loc[ACCOUNT["cf_interest_expense"]]["values"]*(1 - TAX_RATE)
 
-    @property
+    @factor
     @nanc
     def RNOA(self):
         return self.NetIncome/self.NOA
 
-    @property
+    @factor
     def EPS(self):
         return self.NetIncome/self.NumberOfShares
 
-    @property
+    @factor
     @nanc
     def PE(self):
         return self.price_df.iloc[-1].Close*1000 / self.EPS
 
-    @property
+    @factor
     @nanc
     def DeltaWC(self):
         return (self.WC - self.prev_fund_factors[0].WC)
 
-    @property
+    @factor
     @nanc
     def DeltaXF(self):
         return (self.XF - self.prev_fund_factors[0].XF)
 
-    @property
+    @factor
     @nanc
     def CAPEX(self):
-        return -(self.cashflow_df.loc["1. Tiền chi để mua sắm, xây dựng TSCĐ và các tài sản dài hạn khác"]["values"] +
-            self.cashflow_df.loc["2. Tiền thu từ thanh lý, nhượng bán TSCĐ và các tài sản dài hạn khác"]["values"])
+        return -(self.cashflow_df.loc[ACCOUNT["capex"]]["values"] +
+            self.cashflow_df.loc[ACCOUNT["asset_disposals"]]["values"])
 
-    @property
+    @factor
     @nanc
     def DeltaCAPEX(self):
         return (self.CAPEX - self.prev_fund_factors[0].CAPEX)
 
-    @property
+    @factor
     @nanc
     def DeltaOL(self):
         return self.OL - self.prev_fund_factors[0].OL
 
-    @property
+    @factor
     @nanc
     def AccountsPayable(self):
         """ Accounts Payable """
-        return self.balansheet_df.loc["3. Phải trả người bán ngắn hạn"]["values"] +\
-                self.balansheet_df.loc["11. Phải trả ngắn hạn khác"]["values"]
+        return self.balansheet_df.loc[ACCOUNT["trade_payables"]]["values"] +\
+                self.balansheet_df.loc[ACCOUNT["other_payables"]]["values"]
 
-    @property
+    @factor
     @nanc
     def COGS(self):
         "Cost of Goods Sold"
-        return self.incomestat_df.loc["4. Giá vốn hàng bán"]["values"]
+        return self.incomestat_df.loc[ACCOUNT["cogs"]]["values"]
 
-    @property
+    @factor
     @nanc
     def DPO(self):
         """Day payable outstanding"""
         return self.AccountsPayable / self.COGS * 365/4
 
-    @property
+    @factor
     @nanc
     def AdminExp2S(self):
         """ Administrative Expense to Revenue"""
-        return self.incomestat_df.loc["10. Chi phí quản lý doanh nghiệp"]["values"]/self.Revenue
+        return self.incomestat_df.loc[ACCOUNT["admin_expenses"]]["values"]/self.Revenue
 
-    @property
+    @factor
     @nanc
     def SellExp2S(self):
         """ Selling expenses """
-        return self.incomestat_df.loc["9. Chi phí bán hàng"]["values"]/self.Revenue
+        return self.incomestat_df.loc[ACCOUNT["selling_expenses"]]["values"]/self.Revenue
 
-    @property
+    @factor
     @nanc
     def ROS(self):
         """ return on sales """
@@ -0,0 +1,123 @@
+import os
+import warnings
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from tqdm import tqdm
+from finb import PROJECT_PATH
+from finb.analyzer.factor_panel import FactorPanel
+from finb.utils.datahub import read_considered_df
+from finb.utils.date import convert_quarter_to_end_date
+from finb.utils.statement_store import quarter_label
+
+FACTOR_TABLE_PATH = os.path.join(PROJECT_PATH, "market/factors.csv")
+
+
+def quarter_range(from_year, to_year):
+    """ (year, quarter) from the first quarter of from_year to the last finished quarter up to to_year """
+    now = datetime.now()
+    return [(y, q) for y in range(from_year, to_year + 1) for q in range(1, 5)
+            if convert_quarter_to_end_date(y, q) < now]
+
+
+def panel_factor_table(symbols, quarters, factors=None) -> pd.DataFrame:
+    """ (symbol, quarter) x factors frame of many symbols, computed by a FactorPanel in one vectorized pass
+
+    :param quarters: list of (year, quarter)
+    :param factors: factor names, default every factor of FactorPanel
+    """
+    labels = [quarter_label(y, q) for y, q in quarters]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df = FactorPanel(symbols, min(y for y, _ in quarters), max(y for y, _ in quarters)).panel(factors)
+    return df[df.index.get_level_values("quarter").isin(labels)]
+
+
+def _compute_chunk(symbols, quarters, factors):
+    # runs in a worker process, a failing symbol does not stop the others of the chunk
+    tables = dict()
+    errors = dict()
+    try:
+        df = panel_factor_table(symbols, quarters, factors)
+        return {symbol: df.loc[symbol] for symbol in symbols}, errors
+    except Exception:
+        pass
+    # find the failing symbols
+    for symbol in symbols:
+        try:
+            tables[symbol] = panel_factor_table([symbol], quarters, factors).loc[symbol]
+        except Exception as e:
+            errors[symbol] = str(e)
+    return tables, errors
+
+
+def compute_factor_table(symbols=None, from_year=2015, to_year=None, factors=None,
+                         n_workers=None, chunk_size=32, progress=True):
+    """ Factors of many symbols computed in a process pool, each worker computes a FactorPanel of a chunk
+
+    :param symbols: default every symbol of considered.csv
+    :param to_year: default the current year
+    :param n_workers: number of processes, default the number of cores, 0 computes the chunks in this process
+    :param chunk_size: symbols sent to a worker at once, larger chunks vectorize more
+    :return: ((symbol, quarter) x factors frame, dict symbol -> error message)
+    """
+    if symbols is None:
+        considered_df = read_considered_df()
+        symbols = [] if considered_df is None else considered_df.index.tolist()
+    symbols = list(symbols)
+    to_year = datetime.now().year if to_year is None else to_year
+    quarters = quarter_range(from_year, to_year)
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+
+    tables = dict()
+    errors = dict()
+    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+    pbar = tqdm(total=len(symbols)) if progress else None
+    if len(quarters) == 0:
+        chunks = []
+    if n_workers == 0:
+        for chunk in chunks:
+            chunk_tables, chunk_errors = _compute_chunk(chunk, quarters, factors)
+            tables.update(chunk_tables)
+            errors.update(chunk_errors)
+            if pbar is not None:
+                pbar.update(len(chunk))
+    elif len(chunks) > 0:
+        with ProcessPoolExecutor(max_workers=max(1, min(n_workers, len(chunks)))) as executor:
+            futures = {executor.submit(_compute_chunk, chunk, quarters, factors): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    chunk_tables, chunk_errors = future.result()
+                except Exception as e:
+                    # the worker died, e.g. out of memory
+                    chunk_tables, chunk_errors = dict(), {symbol: str(e) for symbol in chunk}
+                tables.update(chunk_tables)
+                errors.update(chunk_errors)
+                if pbar is not None:
+                    pbar.update(len(chunk))
+    if pbar is not None:
+        pbar.close()
+
+    for symbol, err in errors.items():
+        print("[compute_factor_table] Warning ", symbol, err)
+
+    done = [symbol for symbol in symbols if symbol in tables]
+    if len(done) == 0:
+        return pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=["symbol", "quarter"])), errors
+    df = pd.concat([tables[symbol] for symbol in done], keys=done, names=["symbol", "quarter"])
+    return df, errors
+
+
+def update_factor_table(from_year=2015, to_year=None, n_workers=None, output_path=None):
+    """ Compute the factors of considered.csv and write them to market/factors.csv """
+    df, errors = compute_factor_table(from_year=from_year, to_year=to_year, n_workers=n_workers)
+    output_path = FACTOR_TABLE_PATH if output_path is None else output_path
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    df.to_csv(output_path + ".tmp")
+    os.replace(output_path + ".tmp", output_path)
+    return df, errors
+
+
+if __name__ == "__main__":
+    update_factor_table()
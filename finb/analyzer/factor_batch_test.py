@@ -0,0 +1,73 @@
+import os
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.analyzer import factor_batch
+from finb.analyzer.factor_batch import compute_factor_table, update_factor_table
+from finb.analyzer.factor_panel import FactorPanel
+from finb.analyzer.factor_fixture import FactorFixtureTestCase
+
+
+class FactorBatchTestCase(FactorFixtureTestCase):
+    def test_matches_factor_panel(self):
+        df, errors = compute_factor_table(["AAA", "BBB"], 2019, 2020, factors=["MC", "EPS", "ROS"],
+                                          n_workers=0, chunk_size=1, progress=False)
+
+        self.assertEqual(errors, dict())
+        self.assertEqual(df.index.names, ["symbol", "quarter"])
+        self.assertEqual(df.columns.tolist(), ["MC", "EPS", "ROS"])
+        self.assertEqual(len(df), 2 * 8)
+        # no balance sheet for this quarter
+        self.assertTrue(np.isnan(df.loc[("AAA", "2019-Q3"), "MC"]))
+        expected = FactorPanel(["AAA", "BBB"], 2019, 2020).panel(["MC", "EPS", "ROS"])
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_process_pool(self):
+        # spawned workers do not inherit the patches of this process, they read the files of the fixture
+        # through FINB_PROJECT_PATH
+        spawn_pool = partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn"))
+        with mock.patch.object(factor_batch, "ProcessPoolExecutor", spawn_pool):
+            df, errors = compute_factor_table(["AAA", "BBB", "CCC"], 2019, 2020, factors=["MC", "EPS", "ROS"],
+                                              n_workers=2, chunk_size=1, progress=False)
+
+        self.assertEqual(errors, dict())
+        self.assertEqual(sorted(set(df.index.get_level_values("symbol"))), ["AAA", "BBB", "CCC"])
+        self.assertTrue(df.loc["CCC"].isnull().all().all())
+        expected = FactorPanel(["AAA", "BBB"], 2019, 2020).panel(["MC", "EPS", "ROS"])
+        pd.testing.assert_frame_equal(df.loc[["AAA", "BBB"]], expected)
+
+    def test_failure_isolation(self):
+        table = factor_batch.panel_factor_table
+
+        def failing_table(symbols, quarters, factors=None):
+            if "BBB" in symbols:
+                raise ValueError("broken statements")
+            return table(symbols, quarters, factors)
+
+        with mock.patch.object(factor_batch, "panel_factor_table", failing_table):
+            df, errors = compute_factor_table(["AAA", "BBB", "CCC"], 2019, 2019, factors=["MC"], n_workers=0,
+                                              chunk_size=2, progress=False)
+        self.assertEqual(errors, {"BBB": "broken statements"})
+        self.assertEqual(sorted(set(df.index.get_level_values("symbol"))), ["AAA", "CCC"])
+        self.assertTrue(df.loc["CCC", "MC"].isnull().all())
+
+    def test_update_factor_table(self):
+        pd.DataFrame({"symbol": ["AAA", "BBB"]}).to_csv(os.path.join(self.tmp_dir, "market/considered.csv"))
+        output_path = os.path.join(self.tmp_dir, "market/factors.csv")
+        df, errors = update_factor_table(2020, 2020, n_workers=0, output_path=output_path)
+
+        self.assertEqual(errors, dict())
+        stored = pd.read_csv(output_path, index_col=[0, 1])
+        self.assertEqual(stored.index.names, ["symbol", "quarter"])
+        self.assertEqual(stored.index.tolist(), [(s, f"2020-Q{q}") for s in ["AAA", "BBB"] for q in range(1, 5)])
+        expected = FactorPanel(["AAA", "BBB"], 2020, 2020).panel()
+        self.assertEqual(stored.columns.tolist(), expected.columns.tolist())
+        np.testing.assert_allclose(stored.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
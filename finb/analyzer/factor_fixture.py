@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.utils import datahub
+from finb.utils.datahub import FileCache
+from finb.utils.statement_store import update_statement_store
+
+# Statements and prices of the factor tests, written under a temporary project directory
+
+BALANCE_SHEET_FIELDS = [
+    "A. Tài sản lưu động và đầu tư ngắn hạn", "I. Tiền và các khoản tương đương tiền",
+    "II. Các khoản đầu tư tài chính ngắn hạn", "III. Các khoản phải thu ngắn hạn", "IV. Tổng hàng tồn kho",
+    "I. Các khoản phải thu dài hạn", "II. Tài sản cố định", "1. Chi phí trả trước dài hạn", "VII. Lợi thế thương mại",
+    "1. Chi phí sản xuất, kinh doanh dở dang dài hạn", "2. chi phí xây dựng cơ bản dở dang", "TỔNG CỘNG TÀI SẢN",
+    "A. Nợ phải trả", "1. Vay và nợ thuê tài chính ngắn hạn", "3. Phải trả người bán ngắn hạn",
+    "4. Người mua trả tiền trước", "6. Phải trả người lao động", "7. Chi phí phải trả ngắn hạn",
+    "10. Doanh thu chưa thực hiện ngắn hạn", "11. Phải trả ngắn hạn khác", "1. Vốn đầu tư của chủ sở hữu",
+    "TỔNG CỘNG NGUỒN VỐN"
+]
+INCOME_STATEMENT_FIELDS = [
+    "1. Tổng doanh thu hoạt động kinh doanh", "2. Các khoản giảm trừ doanh thu", "3. Doanh thu thuần (1)-(2)",
+    "4. Giá vốn hàng bán", "5. Lợi nhuận gộp (3)-(4)", "9. Chi phí bán hàng", "10. Chi phí quản lý doanh nghiệp",
+    "-Trong đó: Chi phí lãi vay", "15. Tổng lợi nhuận kế toán trước thuế (11)+(14)",
+    "19. Lợi nhuận sau thuế thu nhập doanh nghiệp (15)-(18)",
+    "21. Lợi nhuận sau thuế của cổ đông của công ty mẹ (19)-(20)"
+]
+CASHFLOW_FIELDS = [
+    "- Khấu hao TSCĐ", "Lưu chuyển tiền thuần từ hoạt động kinh doanh",
+    "1. Tiền chi để mua sắm, xây dựng TSCĐ và các tài sản dài hạn khác",
+    "2. Tiền thu từ thanh lý, nhượng bán TSCĐ và các tài sản dài hạn khác",
+    "5. Đầu tư góp vốn vào công ty liên doanh liên kết", "6. Chi đầu tư ngắn hạn",
+    "7. Tiền chi đầu tư góp vốn vào đơn vị khác",
+    "1. Tiền thu từ phát hành cổ phiếu, nhận vốn góp của chủ sở hữu",
+    "2. Tiền chi trả vốn góp cho các chủ sở hữu, mua lại cổ phiếu của doanh nghiệp đã phát hành",
+    "3. Tiền vay ngắn hạn, dài hạn nhận được", "4. Tiền chi trả nợ gốc vay", "5. Tiền chi trả nợ thuê tài chính",
+    "- Chi phí lãi vay", "8. Cổ tức, lợi nhuận đã trả cho chủ sở hữu"
+]
+
+
+def random_quarter(rng, fields):
+    df = pd.DataFrame({"values": rng.randint(1, 1000, len(fields)).astype(float) * 1e6},
+                      index=pd.Index(fields, name="fields"))
+    return df
+
+
+class FactorFixtureTestCase(unittest.TestCase):
+    """ Statements of AAA and BBB from 2017 to 2020 and their prices since 2018-06 in self.tmp_dir
+
+    The balance sheets of 2019-Q3 are missing, the operating cash flow of 2020-Q2 is 0 and the prices of 2019-Q3
+    are missing. FINB_PROJECT_PATH is set to self.tmp_dir for the processes started by the tests.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch("finb.utils.statement_store.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.datahub.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.crawl.company_profile.PROJECT_PATH", self.tmp_dir),
+            mock.patch.object(datahub, "file_cache", FileCache()),
+            # the quarterly readers crawl missing quarters
+            mock.patch.object(datahub, "_crawl_statement"),
+            mock.patch.dict(os.environ, {"FINB_PROJECT_PATH": self.tmp_dir}),
+        ]
+        for p in self.patches:
+            p.start()
+
+        rng = np.random.RandomState(7)
+        quarters = [(q, y) for y in range(2017, 2021) for q in range(1, 5)]
+        for symbol in ["AAA", "BBB"]:
+            bs = {k: random_quarter(rng, BALANCE_SHEET_FIELDS) for k in quarters}
+            inc = {k: random_quarter(rng, INCOME_STATEMENT_FIELDS) for k in quarters}
+            cf = {k: random_quarter(rng, CASHFLOW_FIELDS) for k in quarters}
+            # no statements for a quarter, and an operating cash flow rebuilt from its components
+            del bs[(3, 2019)]
+            cf[(2, 2020)].loc["Lưu chuyển tiền thuần từ hoạt động kinh doanh", "values"] = 0
+            update_statement_store(symbol, "balance_sheet", bs)
+            update_statement_store(symbol, "income_statement", inc)
+            update_statement_store(symbol, "cashflow", cf)
+
+            dates = pd.date_range("2018-06-01", pd.Timestamp.now().normalize())
+            dates = dates[~((dates >= "2019-07-01") & (dates < "2019-10-01"))]
+            price_df = pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0,
+                                     "Close": np.round(rng.rand(len(dates)) * 100, 2), "Volume": 100},
+                                    index=pd.DatetimeIndex(dates, name="Date"))
+            os.makedirs(os.path.join(self.tmp_dir, "market/company", symbol), exist_ok=True)
+            price_df.to_csv(os.path.join(self.tmp_dir, "market/company", symbol, "price.csv"))
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
@@ -0,0 +1,395 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from finb.utils.datahub import read_statement, read_price_df
+from finb.utils.trading_calendar import quarter_end_sessions
+from finb.utils.statement_store import quarter_label
+from finb.utils.constant import PAR_VALUE, TAX_RATE
+from finb.utils.accounts import ACCOUNT
+
+# quarters loaded before the requested range, for trailing and delta factors
+LOOKBACK = 3
+
+FACTORS = []
+
+
+def panel_factor(f):
+    """ Memoized symbols x quarters array of a factor, the name of the function is the name of the factor """
+    name = f.__name__
+    FACTORS.append(name)
+
+    def inside(self):
+        if name not in self._values:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._values[name] = f(self)
+        return self._values[name]
+    inside.__doc__ = f.__doc__
+    return property(inside)
+
+
+def prev(values, k=1):
+    """ Values of the k-th previous quarter """
+    ret = np.full_like(values, np.nan)
+    ret[:, k:] = values[:, :-k]
+    return ret
+
+
+class FactorPanel:
+    """ Fundamental factors of many symbols and quarters at once
+
+    Statements and prices are read once per symbol, every factor is a symbols x quarters array
+    following the definitions of CompanyQuarterlyFundamentalFactors. A factor is NaN where one
+    of its inputs is missing.
+    """
+    def __init__(self, symbols, from_year, to_year, using_current_price=False):
+        """
+        :param from_year: first year (inclusive)
+        :param to_year: last year (inclusive)
+        :param using_current_price: price factors use the latest close instead of the last close of the quarter
+        """
+        self.symbols = list(symbols)
+        self.from_year = from_year
+        self.to_year = to_year
+
+        start = from_year * 4 - LOOKBACK
+        self.quarters = [(i // 4, i % 4 + 1) for i in range(start, (to_year + 1) * 4)]
+        self.labels = [quarter_label(y, q) for y, q in self.quarters]
+
+        self._statements = {s: [self._load_statement(symbol, s) for symbol in self.symbols]
+                            for s in ["balance_sheet", "income_statement", "cashflow"]}
+        self._rows = dict()
+        self._values = dict()
+        self.close = self._load_close(using_current_price)
+
+    def _load_statement(self, symbol, statement):
+        df = read_statement(symbol, statement, by_id=True)
+        if df is None:
+            return np.empty((0, len(self.labels))), dict()
+        df = df[~df.index.duplicated(keep="first")]
+        positions = {account: i for i, account in enumerate(df.index)}
+        return df.reindex(columns=self.labels).to_numpy(dtype=np.float64), positions
+
+    def _load_close(self, using_current_price):
+        """ symbols x quarters last close of each quarter """
+        close = np.full((len(self.symbols), len(self.quarters)), np.nan)
+        starts = np.array([datetime(y, 3 * q - 2, 1) for y, q in self.quarters], dtype="datetime64[ns]")
+        ends = quarter_end_sessions([y for y, _ in self.quarters], [q for _, q in self.quarters]).values
+
+        for i, symbol in enumerate(self.symbols):
+            price_df = read_price_df(symbol)
+            if price_df is None or len(price_df) == 0:
+                continue
+            if using_current_price:
+                close[i] = price_df["Close"].iloc[-1]
+                continue
+            dates = price_df.index.values
+            # the last bar on or before the last session of the quarter
+            last = np.searchsorted(dates, ends, side="right") - 1
+            valid = (last >= 0) & (dates[np.maximum(last, 0)] >= starts)
+            close[i, valid] = price_df["Close"].to_numpy()[last[valid]]
+        return close
+
+    def _row(self, statement, code):
+        """ symbols x quarters values of an account, code of finb.utils.accounts """
+        key = (statement, code)
+        if key not in self._rows:
+            account = ACCOUNT[code]
+            row = np.full((len(self.symbols), len(self.quarters)), np.nan)
+            for i, (values, positions) in enumerate(self._statements[statement]):
+                j = positions.get(account)
+                if j is not None:
+                    row[i] = values[j]
+            self._rows[key] = row
+        return self._rows[key]
+
+    def bs(self, code):
+        return self._row("balance_sheet", code)
+
+    def inc(self, code):
+        return self._row("income_statement", code)
+
+    def cf(self, code):
+        return self._row("cashflow", code)
+
+    def factor(self, name) -> pd.DataFrame:
+        """ symbols x quarters frame of a factor over the requested years """
+        return pd.DataFrame(getattr(self, name)[:, LOOKBACK:], index=pd.Index(self.symbols, name="symbol"),
+                            columns=self.labels[LOOKBACK:])
+
+    def panel(self, factors=None) -> pd.DataFrame:
+        """ (symbol, quarter) x factors frame """
+        factors = FACTORS if factors is None else factors
+        index = pd.MultiIndex.from_product([self.symbols, self.labels[LOOKBACK:]], names=["symbol", "quarter"])
+        return pd.DataFrame({f: getattr(self, f)[:, LOOKBACK:].ravel() for f in factors}, index=index)
+
+    @panel_factor
+    def NumberOfShares(self):
+        return self.bs("owner_capital") / PAR_VALUE
+
+    @panel_factor
+    def BVPS(self):
+        """ Book value """
+        return (self.bs("total_assets") - self.bs("liabilities")) / self.NumberOfShares
+
+    @panel_factor
+    def MC(self):
+        """ Market Capitalization"""
+        return self.NumberOfShares * self.close * 1000
+
+    @panel_factor
+    def CCE(self):
+        """ Cash and cash equivalents """
+        return self.bs("cash")
+
+    @panel_factor
+    def TotalDebt(self):
+        return self.bs("liabilities")
+
+    @panel_factor
+    def TotalAsset(self):
+        return self.bs("total_assets")
+
+    @panel_factor
+    def EV(self):
+        """ Enterprise Value """
+        return self.MC + self.TotalDebt - self.CCE - self.bs("short_term_investments")
+
+    @panel_factor
+    def CFO(self):
+        """ Cash Flow From Operating Activities """
+        return self.cf("cfo")
+
+    @panel_factor
+    def CFO2EV(self):
+        return self.CFO / self.EV
+
+    @panel_factor
+    def EBIT(self):
+        """Earnings Before Interest and Tax"""
+        return self.inc("pretax_profit") + self.inc("interest_expense")
+
+    @panel_factor
+    def EBITDA(self):
+        "Earnings Before Interest, Tax, Depreciation and Amortization"
+        return self.EBIT + self.cf("depreciation")
+
+    @panel_factor
+    def EBITDA2EV(self):
+        return self.EBITDA / self.EV
+
+    @panel_factor
+    def Trailing12MonthEPS(self):
+        return self.EPS + prev(self.EPS, 1) + prev(self.EPS, 2) + prev(self.EPS, 3)
+
+    @panel_factor
+    def Trailing12MonthPE(self):
+        return self.close * 1000 / self.Trailing12MonthEPS
+
+    @panel_factor
+    def NetBB(self):
+        """Net buyback"""
+        return -self.cf("dividends_paid") + \
+            -self.cf("share_buybacks") - \
+            self.cf("share_issues")
+
+    @panel_factor
+    def NetExtFin(self):
+        """Net external Financing"""
+        return self.NetBB + \
+            -self.cf("loan_repayments") - \
+            self.cf("borrowings_received")
+
+    @panel_factor
+    def BB2P(self):
+        """ Net buyback to market capitalization """
+        return self.NetBB / self.MC
+
+    @panel_factor
+    def BB2EV(self):
+        """ Net external financing to enterprise value"""
+        return self.NetExtFin / self.EV
+
+    @panel_factor
+    def B2P(self):
+        """ Book value to maket value"""
+        return self.BVPS / (self.close * 1000)
+
+    @panel_factor
+    def OPL(self):
+        """Operating Liablities"""
+        return self.bs("trade_payables") + \
+            self.bs("advances_from_customers") + \
+            self.bs("payables_to_employees") + \
+            self.bs("accrued_expenses") + \
+            self.bs("unearned_revenue") + \
+            self.bs("short_term_borrowings")
+
+    @panel_factor
+    def OPA(self):
+        """Operating Assets"""
+        return self.bs("cash") + \
+            self.bs("short_term_receivables") + \
+            self.bs("inventories") + \
+            self.bs("long_term_receivables") + \
+            self.bs("fixed_assets") + \
+            self.bs("long_term_prepaid_expenses") + \
+            self.bs("goodwill") + \
+            self.bs("long_term_work_in_progress") + \
+            self.bs("construction_in_progress")
+
+    @panel_factor
+    def NOA(self):
+        """Net Operating Assets"""
+        return self.OPA - self.OPL
+
+    @panel_factor
+    def CFROI(self):
+        """ Cash flow from operations to net operating assets """
+        return self.CFO / self.NOA
+
+    @panel_factor
+    def OL(self):
+        """ Operating Leverage """
+        return self.OPL / self.NOA
+
+    @panel_factor
+    def XF(self):
+        """ Net external financing to net operating assets"""
+        return self.NetExtFin / self.NOA
+
+    @panel_factor
+    def WC(self):
+        """ Working capital """
+        return self.bs("current_assets") - self.bs("liabilities")
+
+    @panel_factor
+    def Revenue(self):
+        """ Revenue (Sales) """
+        return self.inc("total_revenue")
+
+    @panel_factor
+    def S2EV(self):
+        return self.Revenue / self.EV
+
+    @panel_factor
+    def GrossIncome(self):
+        return self.inc("gross_profit")
+
+    @panel_factor
+    def NetIncome(self):
+        """ Net Operarting Profit After Tax """
+        return self.inc("net_income")
+
+    @panel_factor
+    def DeltaNOPAT(self):
+        return self.NetIncome - prev(self.NetIncome)
+
+    @panel_factor
+    def DeltaNOA(self):
+        return self.NOA - prev(self.NOA)
+
+    @panel_factor
+    def DeltaSales(self):
+        return self.Revenue - prev(self.Revenue)
+
+    @panel_factor
+    def Profitability(self):
+        return self.DeltaNOPAT / self.DeltaSales
+
+    @panel_factor
+    def Scalability(self):
+        return self.DeltaSales / self.NOA
+
+    @panel_factor
+    def Growth(self):
+        return self.DeltaSales / self.Revenue
+
+    @panel_factor
+    def RIC(self):
+        return self.Profitability * self.Scalability
+
+    @panel_factor
+    def OtherInvestments(self):
+        return self.cf("investments_in_associates") + \
+            self.cf("short_term_investment_payments") + \
+            self.cf("investments_in_other_entities")
+
+    @panel_factor
+    def DA(self):
+        """ Depreciation & Amortization"""
+        return self.cf("depreciation")
+
+    @panel_factor
+    def FCFF(self):
+        return self.NetIncome + self.DA - self.DeltaWC - self.CAPEX - self.OtherInvestments
+
+    @panel_factor
+    def FCFE(self):
+        return self.FCFF + \
+            (self.cf("borrowings_received") +
+             self.cf("loan_repayments") +
+             self.cf("lease_repayments")) - \
+            self.cf("cf_interest_expense") * (1 - TAX_RATE)
+
+    @panel_factor
+    def RNOA(self):
+        return self.NetIncome / self.NOA
+
+    @panel_factor
+    def EPS(self):
+        return self.NetIncome / self.NumberOfShares
+
+    @panel_factor
+    def PE(self):
+        return self.close * 1000 / self.EPS
+
+    @panel_factor
+    def DeltaWC(self):
+        return self.WC - prev(self.WC)
+
+    @panel_factor
+    def DeltaXF(self):
+        return self.XF - prev(self.XF)
+
+    @panel_factor
+    def CAPEX(self):
+        return -(self.cf("capex") +
+                 self.cf("asset_disposals"))
+
+    @panel_factor
+    def DeltaCAPEX(self):
+        return self.CAPEX - prev(self.CAPEX)
+
+    @panel_factor
+    def DeltaOL(self):
+        return self.OL - prev(self.OL)
+
+    @panel_factor
+    def AccountsPayable(self):
+        """ Accounts Payable """
+        return self.bs("trade_payables") + self.bs("other_payables")
+
+    @panel_factor
+    def COGS(self):
+        "Cost of Goods Sold"
+        return self.inc("cogs")
+
+    @panel_factor
+    def DPO(self):
+        """Day payable outstanding"""
+        return self.AccountsPayable / self.COGS * 365 / 4
+
+    @panel_factor
+    def AdminExp2S(self):
+        """ Administrative Expense to Revenue"""
+        return self.inc("admin_expenses") / self.Revenue
+
+    @panel_factor
+    def SellExp2S(self):
+        """ Selling expenses """
+        return self.inc("selling_expenses") / self.Revenue
+
+    @panel_factor
+    def ROS(self):
+        """ return on sales """
+        return self.EBIT / self.Revenue
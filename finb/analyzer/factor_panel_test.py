@@ -0,0 +1,60 @@
+import unittest
+import warnings
+import numpy as np
+from finb.analyzer.factor_fixture import FactorFixtureTestCase
+from finb.analyzer.factor import CompanyQuarterlyFundamentalFactors
+from finb.analyzer.factor_panel import FactorPanel, FACTORS
+from finb.utils.constant import TAX_RATE
+from finb.utils.statement_store import read_statement_store
+
+
+class FactorPanelTestCase(FactorFixtureTestCase):
+    def test_matches_quarterly_factors(self):
+        panel = FactorPanel(["AAA", "BBB"], 2018, 2020)
+        df = panel.panel()
+        self.assertEqual(df.columns.tolist(), FACTORS)
+        self.assertEqual(len(df), 2 * 12)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for symbol in ["AAA", "BBB"]:
+                for year in range(2018, 2021):
+                    for quarter in range(1, 5):
+                        factors = CompanyQuarterlyFundamentalFactors(symbol, year=year, quarter=quarter)
+                        for name in FACTORS:
+                            expected = float(getattr(factors, name))
+                            actual = df.loc[(symbol, f"{year}-Q{quarter}"), name]
+                            if np.isnan(expected):
+                                self.assertTrue(np.isnan(actual), (symbol, year, quarter, name, actual))
+                            else:
+                                self.assertAlmostEqual(actual, expected, delta=abs(expected) * 1e-9,
+                                                       msg=(symbol, year, quarter, name))
+
+    def test_factor_frame(self):
+        panel = FactorPanel(["AAA", "BBB", "MISSING"], 2019, 2020)
+        mc = panel.factor("MC")
+
+        self.assertEqual(mc.index.tolist(), ["AAA", "BBB", "MISSING"])
+        self.assertEqual(mc.columns.tolist(), [f"{y}-Q{q}" for y in range(2019, 2021) for q in range(1, 5)])
+        self.assertTrue(mc.loc["MISSING"].isnull().all())
+        self.assertTrue(np.isnan(mc.loc["AAA", "2019-Q3"]))
+        self.assertFalse(np.isnan(mc.loc["AAA", "2019-Q4"]))
+
+    def test_fcfe(self):
+        # FCFF plus the net borrowing, less the interest after tax. FCFE was NaN before the chart of accounts
+        df = FactorPanel(["AAA"], 2020, 2020).panel(["FCFF", "FCFE"])
+        cf = read_statement_store("AAA", "cashflow")["2020-Q3"]
+        expected = df.loc[("AAA", "2020-Q3"), "FCFF"] + \
+            cf["3. Tiền vay ngắn hạn, dài hạn nhận được"] + cf["4. Tiền chi trả nợ gốc vay"] + \
+            cf["5. Tiền chi trả nợ thuê tài chính"] - cf["- Chi phí lãi vay"] * (1 - TAX_RATE)
+
+        self.assertFalse(np.isnan(expected))
+        self.assertAlmostEqual(df.loc[("AAA", "2020-Q3"), "FCFE"], expected, delta=abs(expected) * 1e-12)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            factors = CompanyQuarterlyFundamentalFactors("AAA", year=2020, quarter=3)
+            self.assertAlmostEqual(float(factors.FCFE), expected, delta=abs(expected) * 1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+import os
+import math
+import sqlite3
+import hashlib
+import warnings
+from contextlib import closing
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from finb import PROJECT_PATH
+from finb.analyzer.factor import CompanyQuarterlyFundamentalFactors
+from finb.utils.datahub import read_considered_df, read_price_df
+from finb.utils.date import convert_quarter_to_end_date, prev_quarter
+from finb.utils.statement_store import read_statement_store, quarter_label, parse_quarter_label
+from finb.utils.trading_calendar import quarter_end_sessions
+
+# Point-in-time factor values in market/factor_store.sqlite
+#   factors: one row per (symbol, quarter, factor, as_of), a new row is added only when a value changes,
+#            the value of a factor known at a date is the row with the latest as_of before that date
+#   inputs: digest of the statements and prices of every (symbol, quarter) the values were computed from
+# A value is knowable from the day it was computed. A backfill may instead stamp the first value of a quarter
+# REPORT_LAG days after the quarter end, see FactorStore.update_symbol.
+
+FACTOR_STORE_PATH = os.path.join(PROJECT_PATH, "market/factor_store.sqlite")
+
+# days between the end of a quarter and the deadline of its financial statements
+REPORT_LAG = 45
+
+# input -> data attribute of CompanyQuarterlyFundamentalFactors reading it
+INPUTS = {
+    "balance_sheet": "balansheet_df",
+    "income_statement": "incomestat_df",
+    "cashflow": "cashflow_df",
+    "price": "price_df"
+}
+
+# quarters after a quarter whose factors read it through prev_fund_factors
+PREV_QUARTERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS factors (
+    symbol TEXT NOT NULL,
+    quarter TEXT NOT NULL,
+    factor TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (symbol, quarter, factor, as_of)
+);
+CREATE INDEX IF NOT EXISTS factors_as_of ON factors (as_of);
+CREATE TABLE IF NOT EXISTS inputs (
+    symbol TEXT NOT NULL,
+    quarter TEXT NOT NULL,
+    input TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (symbol, quarter, input)
+);
+"""
+
+
+def _digest(series):
+    series = series.dropna()
+    h = hashlib.sha1()
+    h.update("\n".join(str(i) for i in series.index).encode())
+    h.update(series.to_numpy(dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def input_digests(symbol, quarters):
+    """ Digests of the statements and prices of each quarter
+
+    :param quarters: list of (year, quarter)
+    :return: dict (quarter label, input) -> digest
+    """
+    labels = [quarter_label(y, q) for y, q in quarters]
+    digests = dict()
+    for statement in ["balance_sheet", "income_statement", "cashflow"]:
+        df = read_statement_store(symbol, statement)
+        for label in labels:
+            values = df[label] if df is not None and label in df.columns else pd.Series(dtype=np.float64)
+            digests[(label, statement)] = _digest(values)
+
+    price_df = read_price_df(symbol)
+    for (y, q), label in zip(quarters, labels):
+        close = pd.Series(dtype=np.float64)
+        if price_df is not None:
+            # same window as CompanyQuarterlyFundamentalFactors.price_df
+            sd = datetime(year=y, month=3 * q - 2, day=1)
+            ed = quarter_end_sessions(y, q)
+            close = price_df["Close"][(price_df.index >= sd) & (price_df.index <= ed)]
+            close.index = close.index.astype(np.int64)
+        digests[(label, "price")] = _digest(close)
+    return digests
+
+
+def affected_factors(changed, labels):
+    """ Factors to compute again after some inputs changed
+
+    :param changed: set of (quarter label, input)
+    :param labels: quarter labels to update, in time order
+    :return: dict quarter label -> set of factor names
+    """
+    cls = CompanyQuarterlyFundamentalFactors
+    data = {name: cls.dependencies([name])[1] for name in cls.factor_names()}
+    uses_prev = {name for name, d in data.items() if "prev_fund_factors" in d}
+
+    ret = dict()
+    for label, input_name in changed:
+        quarter, year = parse_quarter_label(label)
+        names = {name for name, d in data.items() if INPUTS[input_name] in d}
+        ret.setdefault(label, set()).update(names)
+        # quarters reading this one as a previous quarter, e.g. Trailing12MonthEPS and Delta* factors
+        y, q = year, quarter
+        for _ in range(PREV_QUARTERS):
+            y, q = next_quarter(y, q)
+            ret.setdefault(quarter_label(y, q), set()).update(uses_prev)
+    return {label: names for label, names in ret.items() if label in set(labels) and len(names) > 0}
+
+
+def next_quarter(year, quarter):
+    if quarter == 4:
+        return year + 1, 1
+    return year, quarter + 1
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return math.isclose(a, b, rel_tol=1e-12, abs_tol=0.0)
+
+
+class FactorStore:
+    """ Point-in-time store of the factors of CompanyQuarterlyFundamentalFactors """
+    def __init__(self, path=None):
+        self.path = FACTOR_STORE_PATH if path is None else path
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def update_symbol(self, symbol, from_year, to_year=None, today=None, backdate=False):
+        """ Compute the factors whose statements or prices changed since the last update
+
+        :param today: date of the update, datetime.date, default today
+        :param backdate: stamp the first value of a quarter REPORT_LAG days after its end instead of today.
+            Only for a research backfill, the values are computed from today's statements and prices which
+            may hold restatements and later data, a snapshot before today then has lookahead
+        :return: number of stored values
+        """
+        today = datetime.now().date() if today is None else today
+        to_year = today.year if to_year is None else to_year
+        quarters = [(y, q) for y in range(from_year, to_year + 1) for q in range(1, 5)
+                    if convert_quarter_to_end_date(y, q).date() <= today]
+        if len(quarters) == 0:
+            return 0
+        labels = [quarter_label(y, q) for y, q in quarters]
+
+        # previous quarters of the first one take part in its factors
+        lookback = []
+        y, q = quarters[0]
+        for _ in range(PREV_QUARTERS):
+            y, q = prev_quarter(y, q)
+            lookback.insert(0, (y, q))
+        digests = input_digests(symbol, lookback + quarters)
+
+        with closing(self.connect()) as conn:
+            stored = {(label, input_name): digest for label, input_name, digest in conn.execute(
+                "SELECT quarter, input, digest FROM inputs WHERE symbol = ?", (symbol,))}
+            changed = {k for k, digest in digests.items() if stored.get(k) != digest}
+            todo = affected_factors(changed, labels)
+
+            latest = dict()
+            for label, name, value in conn.execute(
+                    "SELECT f.quarter, f.factor, f.value FROM factors f "
+                    "JOIN (SELECT quarter, factor, MAX(as_of) AS as_of FROM factors WHERE symbol = ? "
+                    "      GROUP BY quarter, factor) l USING (quarter, factor, as_of) "
+                    "WHERE f.symbol = ?", (symbol, symbol)):
+                latest[(label, name)] = value
+
+            rows = []
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                for (y, q), label in zip(quarters, labels):
+                    if label not in todo:
+                        continue
+                    known = today
+                    if backdate:
+                        known = min(today, convert_quarter_to_end_date(y, q).date() + timedelta(days=REPORT_LAG))
+                    values = CompanyQuarterlyFundamentalFactors(symbol, year=y, quarter=q).compute(sorted(todo[label]))
+                    for name, value in values.items():
+                        value = None if value is None or pd.isnull(value) else float(value)
+                        if (label, name) in latest:
+                            if _same(latest[(label, name)], value):
+                                continue
+                            # a revision is knowable from today
+                            as_of = today
+                        elif value is None:
+                            continue
+                        else:
+                            as_of = known
+                        rows.append((symbol, label, name, as_of.isoformat(), value))
+
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO factors VALUES (?, ?, ?, ?, ?)", rows)
+                conn.executemany("INSERT OR REPLACE INTO inputs VALUES (?, ?, ?, ?)",
+                                 [(symbol, label, input_name, digests[(label, input_name)])
+                                  for label, input_name in changed])
+        return len(rows)
+
+    def snapshot(self, as_of, factors=None, symbols=None) -> pd.DataFrame:
+        """ Factor values known at a date, without lookahead
+
+        :param as_of: date, datetime or "YYYY-MM-DD"
+        :return: (symbol, quarter) x factors frame
+        """
+        as_of = pd.Timestamp(as_of).date().isoformat()
+        query = ("SELECT f.symbol, f.quarter, f.factor, f.value FROM factors f "
+                 "JOIN (SELECT symbol, quarter, factor, MAX(as_of) AS as_of FROM factors WHERE as_of <= ? "
+                 "      GROUP BY symbol, quarter, factor) l USING (symbol, quarter, factor, as_of)")
+        params = [as_of]
+        conditions = []
+        for column, values in [("f.factor", factors), ("f.symbol", symbols)]:
+            if values is not None:
+                conditions.append("%s IN (%s)" % (column, ",".join("?" * len(values))))
+                params.extend(values)
+        if len(conditions) > 0:
+            query += " WHERE " + " AND ".join(conditions)
+
+        with closing(self.connect()) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        df = df.pivot(index=["symbol", "quarter"], columns="factor", values="value")
+        df.columns.name = None
+        if factors is not None:
+            df = df.reindex(columns=list(factors))
+        return df
+
+    def history(self, symbol, factor) -> pd.DataFrame:
+        """ Every stored version of a factor, rows (quarter, as_of, value) """
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query(
+                "SELECT quarter, as_of, value FROM factors WHERE symbol = ? AND factor = ? ORDER BY quarter, as_of",
+                conn, params=(symbol, factor))
+
+
+def update_factor_store(symbols=None, from_year=2015, path=None, backdate=False):
+    """ Update the store for every symbol of considered.csv
+
+    :param backdate: see FactorStore.update_symbol
+    """
+    if symbols is None:
+        considered_df = read_considered_df()
+        symbols = [] if considered_df is None else considered_df.index.tolist()
+    store = FactorStore(path)
+    for symbol in tqdm(symbols):
+        try:
+            store.update_symbol(symbol, from_year, backdate=backdate)
+        except Exception as e:
+            print("[update_factor_store] Warning ", symbol, str(e))
+    return store
+
+
+if __name__ == "__main__":
+    update_factor_store()
@@ -0,0 +1,68 @@
+import os
+import unittest
+import warnings
+from datetime import date
+import numpy as np
+from finb.analyzer.factor import CompanyQuarterlyFundamentalFactors
+from finb.analyzer.factor_fixture import FactorFixtureTestCase
+from finb.analyzer.factor_store import FactorStore, affected_factors
+from finb.utils.statement_store import read_statement_store, update_statement_store
+
+
+class FactorStoreTestCase(FactorFixtureTestCase):
+    def test_point_in_time(self):
+        store = FactorStore(os.path.join(self.tmp_dir, "market/factor_store.sqlite"))
+        self.assertGreater(store.update_symbol("AAA", 2020, today=date(2021, 1, 10), backdate=True), 0)
+
+        df = store.snapshot("2020-12-01", factors=["EPS", "BVPS", "Trailing12MonthEPS"])
+        # the last quarter is not knowable yet
+        self.assertEqual(df.loc["AAA"].index.tolist(), ["2020-Q1", "2020-Q2", "2020-Q3"])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            factors = CompanyQuarterlyFundamentalFactors("AAA", year=2020, quarter=3)
+            self.assertAlmostEqual(df.loc[("AAA", "2020-Q3"), "Trailing12MonthEPS"], factors.Trailing12MonthEPS)
+        self.assertEqual(store.snapshot("2021-01-10").index.get_level_values("quarter")[-1], "2020-Q4")
+
+        # nothing changed
+        self.assertEqual(store.update_symbol("AAA", 2020, today=date(2021, 1, 11)), 0)
+
+    def test_first_values_known_from_today(self):
+        store = FactorStore(os.path.join(self.tmp_dir, "market/factor_store.sqlite"))
+        store.update_symbol("AAA", 2020, today=date(2021, 1, 10))
+        self.assertEqual(len(store.snapshot("2021-01-09")), 0)
+        self.assertEqual(store.history("AAA", "EPS").as_of.unique().tolist(), ["2021-01-10"])
+
+    def test_revision(self):
+        store = FactorStore(os.path.join(self.tmp_dir, "market/factor_store.sqlite"))
+        store.update_symbol("AAA", 2020, today=date(2021, 3, 1), backdate=True)
+        before = store.snapshot("2021-03-01", symbols=["AAA"])
+
+        income_df = read_statement_store("AAA", "income_statement")
+        quarter_df = income_df[["2020-Q2"]].rename(columns={"2020-Q2": "values"}) * 2
+        update_statement_store("AAA", "income_statement", {(2, 2020): quarter_df})
+        self.assertGreater(store.update_symbol("AAA", 2020, today=date(2021, 3, 5)), 0)
+
+        # old values stay visible before the revision
+        self.assertTrue(before.equals(store.snapshot("2021-03-04", symbols=["AAA"])))
+        after = store.snapshot("2021-03-05", symbols=["AAA"])
+        self.assertAlmostEqual(after.loc[("AAA", "2020-Q2"), "EPS"], 2 * before.loc[("AAA", "2020-Q2"), "EPS"])
+        self.assertNotAlmostEqual(after.loc[("AAA", "2020-Q4"), "Trailing12MonthEPS"],
+                                  before.loc[("AAA", "2020-Q4"), "Trailing12MonthEPS"])
+        self.assertEqual(after.loc[("AAA", "2020-Q2"), "BVPS"], before.loc[("AAA", "2020-Q2"), "BVPS"])
+
+        history = store.history("AAA", "EPS")
+        self.assertEqual(history[history.quarter == "2020-Q2"].as_of.tolist(), ["2020-08-15", "2021-03-05"])
+        self.assertEqual(len(history[history.quarter == "2020-Q1"]), 1)
+
+    def test_affected_factors(self):
+        todo = affected_factors({("2020-Q2", "balance_sheet")}, ["2020-Q2", "2020-Q3", "2021-Q3"])
+        self.assertIn("BVPS", todo["2020-Q2"])
+        self.assertNotIn("Revenue", todo["2020-Q2"])
+        self.assertIn("DeltaWC", todo["2020-Q3"])
+        self.assertNotIn("BVPS", todo["2020-Q3"])
+        self.assertNotIn("2021-Q3", todo)
+        self.assertTrue(np.all([len(names) > 0 for names in todo.values()]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import warnings
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.analyzer import factor
+from finb.analyzer.factor import CompanyQuarterlyFundamentalFactors
+from finb.analyzer.factor_fixture import BALANCE_SHEET_FIELDS, INCOME_STATEMENT_FIELDS, CASHFLOW_FIELDS, \
+    random_quarter
+from finb.utils.accounts import account_ids
+
+
+def random_accounts(rng, statement, fields):
+    """ Quarter indexed by account ids like the readers called with by_id=True """
+    df = random_quarter(rng, fields)
+    return df.set_axis(account_ids(statement, df.index))
+
+
+class CompanyQuarterlyFundamentalFactorsTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        dates = pd.date_range("2019-01-01", "2020-12-31")
+        price_df = pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0,
+                                 "Close": np.round(rng.rand(len(dates)) * 100, 2), "Volume": 100},
+                                index=pd.DatetimeIndex(dates, name="Date"))
+        self.readers = {
+            "read_balance_sheet": mock.Mock(
+                side_effect=lambda *args, **kwargs: random_accounts(rng, "balance_sheet", BALANCE_SHEET_FIELDS)),
+            "read_income_statement": mock.Mock(
+                side_effect=lambda *args, **kwargs: random_accounts(rng, "income_statement", INCOME_STATEMENT_FIELDS)),
+            "read_cashflow": mock.Mock(
+                side_effect=lambda *args, **kwargs: random_accounts(rng, "cashflow", CASHFLOW_FIELDS)),
+            "read_price_df": mock.Mock(return_value=price_df),
+        }
+        self.patches = [mock.patch.object(factor, name, reader) for name, reader in self.readers.items()]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_subset_loads_needed_data(self):
+        factors = CompanyQuarterlyFundamentalFactors("AAA", year=2020, quarter=2)
+        values = factors.compute(["Revenue", "GrossIncome"])
+
+        self.assertEqual(values.index.tolist(), ["Revenue", "GrossIncome"])
+        self.readers["read_income_statement"].assert_called_once_with("AAA", 2020, 2, by_id=True)
+        self.readers["read_balance_sheet"].assert_not_called()
+        self.readers["read_cashflow"].assert_not_called()
+        self.readers["read_price_df"].assert_not_called()
+
+    def test_data_loaded_once(self):
+        factors = CompanyQuarterlyFundamentalFactors("AAA", year=2020, quarter=2)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            values = factors.compute()
+
+        self.assertEqual(values.index.tolist(), CompanyQuarterlyFundamentalFactors.factor_names())
+        # at most once for the quarter and each of its 4 previous quarters
+        for name in ["read_balance_sheet", "read_income_statement", "read_cashflow"]:
+            calls = [c.args for c in self.readers[name].call_args_list]
+            self.assertEqual(len(calls), len(set(calls)), name)
+            self.assertIn(("AAA", 2020, 2), calls)
+        self.assertEqual(self.readers["read_price_df"].call_count, 1)
+        self.assertEqual(factors.price_df.index.min(), pd.Timestamp("2020-04-01"))
+        self.assertEqual(factors.price_df.index.max(), pd.Timestamp("2020-06-30"))
+
+    def test_factor_computed_once(self):
+        descriptor = vars(CompanyQuarterlyFundamentalFactors)["NumberOfShares"]
+        with mock.patch.object(descriptor, "f", mock.Mock(wraps=descriptor.f)) as f:
+            factors = CompanyQuarterlyFundamentalFactors("AAA", year=2020, quarter=2, dont_load_prev=True)
+            factors.compute(["EV", "MC", "BVPS", "EPS", "NumberOfShares"])
+        self.assertEqual(f.call_count, 1)
+
+    def test_dependencies(self):
+        graph = CompanyQuarterlyFundamentalFactors.factor_graph()
+        self.assertEqual(graph["EV"], (["CCE", "MC", "TotalDebt"], ["balansheet_df"]))
+
+        names, data = CompanyQuarterlyFundamentalFactors.dependencies(["EV"])
+        self.assertEqual(names, {"EV", "MC", "NumberOfShares", "TotalDebt", "CCE"})
+        self.assertEqual(data, {"balansheet_df", "price_df"})
+
+
+if __name__ == "__main__":
+    unittest.main()
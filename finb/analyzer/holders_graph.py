@@ -1,8 +1,7 @@
 import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
-from finb.utils.datahub import read_major_holders, read_companies_df
-from finb.utils.vn_lang import vn_tolowercase
+from finb.utils.datahub import read_major_holders, read_company_registry
 
 #https://towardsdatascience.com/python-interactive-network-visualization-using-networkx-plotly-and-dash-e44749161ed7
 #https://stackoverflow.com/questions/26691442/how-do-i-add-a-new-attribute-to-an-edge-in-networkx
@@ -12,9 +11,7 @@ from finb.utils.vn_lang import vn_tolowercase
 
 def create_major_holders_graph(symbols):
     G = nx.DiGraph()
-    companies_df = read_companies_df()
-    companies_df["company"] = companies_df["company"].str.lower()
-    # print("công ty cổ phần chứng khoán ssi" in companies_df["company"].values)
+    registry = read_company_registry()
     holders = set()
     # edge_lists = []
     more_symbols = set(symbols)
@@ -30,12 +27,10 @@ def create_major_holders_graph(symbols):
             norm_holder = holder.replace("CTCP", "công ty cổ phần").lower()
             is_symbol = False
             is_fund = False
-            if vn_tolowercase(norm_holder) in companies_df["company"].values:
-                holder = companies_df.index[companies_df['company'] == vn_tolowercase(norm_holder)].tolist()[0]
-                more_symbols.add(holder)
-                is_symbol = True
-            if vn_tolowercase(holder) in companies_df["company"].values:
-                holder = companies_df.index[companies_df['company'] == vn_tolowercase(holder)].tolist()[0]
+            # names are matched without accents and case, CTCP expanded
+            holder_symbol = registry.symbol_of(holder)
+            if holder_symbol is not None and holder_symbol in registry.listed:
+                holder = holder_symbol
                 more_symbols.add(holder)
                 is_symbol = True
             if "fund" in norm_holder or "investment" in norm_holder or "đầu tư" in norm_holder or "halley" in norm_holder:
@@ -1,7 +1,9 @@
 import scipy.stats as stats
 import math
+import numpy as np
 import pandas as pd
 from finb.analyzer.factor import TechnicalFactors
+from finb.utils.datahub import read_price_panel
 
 
 def compute_returns(df, price_col="Close"):
@@ -19,7 +21,8 @@ def compute_beta(market_returns, stock_returns, start_date=None, end_date=None):
     if end_date is not None:
         market_returns = market_returns.loc[:end_date]
         stock_returns = stock_returns.loc[:end_date]
-    result = stats.linregress(stock_returns.Return, market_returns.Return)
+    # beta of the stock, the regression of the stock returns on the market returns
+    result = stats.linregress(market_returns.Return, stock_returns.Return)
     return result
 
 
@@ -46,29 +49,140 @@ def time_bar(df):
     return df
 
 
+def _aggregate_bars(df:pd.DataFrame, starts, ends) -> pd.DataFrame:
+    """ OHLCV bars of the rows starts[k]..ends[k], indexed by the date of the last row """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    bars = pd.DataFrame(index=df.index[ends], columns=["Open", "High", "Low", "Close", "Volume"], dtype=np.float64)
+    if len(starts) == 0:
+        return bars
+    # the last bar of reduceat runs to the end of the array
+    rows = slice(0, ends[-1] + 1)
+    bars["Open"] = df["Open"].to_numpy(dtype=np.float64)[starts]
+    bars["High"] = np.maximum.reduceat(df["High"].to_numpy(dtype=np.float64)[rows], starts)
+    bars["Low"] = np.minimum.reduceat(df["Low"].to_numpy(dtype=np.float64)[rows], starts)
+    bars["Close"] = df["Close"].to_numpy(dtype=np.float64)[ends]
+    bars["Volume"] = np.add.reduceat(df["Volume"].to_numpy(dtype=np.float64)[rows], starts)
+    return bars
+
+
+def _threshold_bars(df:pd.DataFrame, values, threshold) -> pd.DataFrame:
+    """ A bar closes on the row where the sum of values since the previous bar reaches threshold,
+    rows after the last bar are left out. values are non negative.
+    """
+    cs = np.cumsum(np.nan_to_num(np.asarray(values, dtype=np.float64)))
+    if threshold <= 0:
+        raise ValueError("threshold must be positive")
+    ends = []
+    base = 0.
+    i = 0
+    # one binary search per bar, the sum restarts from 0 after a bar
+    while i < len(cs):
+        i += int(np.searchsorted(cs[i:], base + threshold, side="left"))
+        if i >= len(cs):
+            break
+        ends.append(i)
+        base = cs[i]
+        i += 1
+    ends = np.asarray(ends, dtype=np.int64)
+    starts = np.concatenate([[0], ends[:-1] + 1]) if len(ends) > 0 else ends
+    return _aggregate_bars(df, starts, ends)
+
+
 def volume_bar(df:pd.DataFrame,threshold=1e6):
-    t = df["Volume"]
-    ts = 0
-    idx = []
-    for i, x in enumerate(t):
-        ts += x
-        if ts >= threshold:
-            idx.append(i)
-            ts = 0
-            continue
-    df = df.copy().iloc[idx].drop_duplicates()
-    return df
+    """ OHLCV bars of about threshold shares """
+    return _threshold_bars(df, df["Volume"], threshold)
 
 
 def dollar_bar(df:pd.DataFrame, threshold=1e12):
-    t = df["Volume"]
-    ts = 0
-    idx = []
-    for i, x in enumerate(t):
-        ts += (df.iloc[i].Close + df.iloc[i].Low + df.iloc[i].High)/3 * x * 1000
-        if ts >= threshold:
-            idx.append(i)
-            ts = 0
-            continue
-    df = df.copy().iloc[idx].drop_duplicates()
-    return df
+    """ OHLCV bars of about threshold VND traded, a row trades its typical price times its volume """
+    value = (df["Close"] + df["Low"] + df["High"]) / 3 * df["Volume"] * 1000
+    return _threshold_bars(df, value, threshold)
+
+
+def tick_rule(df:pd.DataFrame, price_col="Close") -> np.ndarray:
+    """ Sign of every price change, an unchanged price keeps the previous sign, the first row is 1 """
+    b = np.sign(np.diff(df[price_col].to_numpy(dtype=np.float64), prepend=np.nan))
+    b = pd.Series(np.where(b == 0, np.nan, b)).ffill().fillna(1.)
+    return b.to_numpy()
+
+
+def _first_crossing(cs, start, base, threshold, chunk):
+    """ First i >= start with |cs[i] - base| >= threshold, -1 when there is none """
+    while start < len(cs):
+        hits = np.flatnonzero(np.abs(cs[start:start + chunk] - base) >= threshold)
+        if len(hits) > 0:
+            return start + int(hits[0])
+        start += chunk
+        chunk *= 2
+    return -1
+
+
+def _imbalance_bars(df:pd.DataFrame, signed, expected_ticks, alpha) -> pd.DataFrame:
+    """ A bar closes when the absolute sum of signed since the bar start reaches the expected imbalance
+    of a bar, the exponentially weighted absolute imbalance of the previous bars. The first expected
+    imbalance is the one of a random walk of expected_ticks rows.
+    """
+    signed = np.nan_to_num(np.asarray(signed, dtype=np.float64))
+    cs = np.cumsum(signed)
+    n = len(cs)
+    if n == 0:
+        return _aggregate_bars(df, [], [])
+    # at least the smallest signed value, so that a bar never closes on a row without imbalance
+    floor = np.min(np.abs(signed[signed != 0])) if np.any(signed) else 1.
+    e_imbalance = math.sqrt(expected_ticks) * np.mean(np.abs(signed[:expected_ticks]))
+
+    ends = []
+    start = 0
+    while start < n:
+        base = cs[start - 1] if start > 0 else 0.
+        threshold = max(e_imbalance, floor)
+        end = _first_crossing(cs, start, base, threshold, max(2 * expected_ticks, 16))
+        if end < 0:
+            break
+        ends.append(end)
+        e_imbalance += alpha * (abs(cs[end] - base) - e_imbalance)
+        start = end + 1
+
+    ends = np.asarray(ends, dtype=np.int64)
+    starts = np.concatenate([[0], ends[:-1] + 1]) if len(ends) > 0 else ends
+    return _aggregate_bars(df, starts, ends)
+
+
+def tick_imbalance_bar(df:pd.DataFrame, expected_ticks=20, alpha=0.1):
+    """ Bars closing when the imbalance of up and down ticks exceeds its expected value
+
+    :param expected_ticks: about the rows of the first bars, the first expected imbalance is measured on these rows
+    :param alpha: weight of the last bar in the expected imbalance
+    """
+    return _imbalance_bars(df, tick_rule(df), expected_ticks, alpha)
+
+
+def volume_imbalance_bar(df:pd.DataFrame, expected_ticks=20, alpha=0.1):
+    """ Bars closing when the imbalance of volume traded on up and down ticks exceeds its expected value """
+    return _imbalance_bars(df, tick_rule(df) * df["Volume"].to_numpy(dtype=np.float64), expected_ticks, alpha)
+
+
+def panel_bars(bar_func, panel=None, symbols=None, **kwargs) -> pd.DataFrame:
+    """ Bars of many symbols of the price panel
+
+    :param bar_func: one of volume_bar, dollar_bar, tick_imbalance_bar, volume_imbalance_bar
+    :param panel: PricePanel, default datahub.read_price_panel()
+    :param kwargs: arguments of bar_func, a dict value gives one argument per symbol,
+        e.g. threshold={"VNM": 2e6, "FPT": 1e6}
+    :return: bars indexed by (symbol, Date)
+    """
+    if panel is None:
+        panel = read_price_panel()
+    symbols = panel.symbols.tolist() if symbols is None else symbols
+
+    frames = dict()
+    for symbol in symbols:
+        symbol_kwargs = {k: v[symbol] if isinstance(v, dict) else v for k, v in kwargs.items()}
+        try:
+            frames[symbol] = bar_func(panel.symbol_df(symbol), **symbol_kwargs)
+        except Exception as e:
+            print("[panel_bars] Warning ", symbol, str(e))
+    if len(frames) == 0:
+        return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+    return pd.concat(frames, names=["symbol", "Date"])
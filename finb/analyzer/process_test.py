@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.analyzer.process import volume_bar, dollar_bar, tick_rule, tick_imbalance_bar, volume_imbalance_bar, \
+    panel_bars
+from finb.utils.price_panel import build_panel
+
+
+def make_price_df(n=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    close = np.round(50 * np.exp(np.cumsum(rng.randn(n) * 0.02)), 1)
+    return pd.DataFrame({
+        "Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+        "Volume": rng.randint(1, 100, n) * 1000.
+    }, index=pd.date_range("2010-01-01", periods=n, name="Date"))
+
+
+def sampled_rows(values, threshold):
+    # rows closing a bar, the sum restarts from 0 after a bar
+    ts = 0
+    idx = []
+    for i, x in enumerate(values):
+        ts += x
+        if ts >= threshold:
+            idx.append(i)
+            ts = 0
+    return idx
+
+
+class BarTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df = make_price_df()
+
+    def test_volume_bar(self):
+        bars = volume_bar(self.df, threshold=1e6)
+        ends = sampled_rows(self.df["Volume"], 1e6)
+
+        self.assertEqual(bars.index.tolist(), self.df.index[ends].tolist())
+        self.assertTrue((bars["Volume"] >= 1e6).all())
+        self.assertEqual(bars["Volume"].sum(), self.df["Volume"].iloc[:ends[-1] + 1].sum())
+        first = self.df.iloc[:ends[0] + 1]
+        self.assertEqual(bars.iloc[0].tolist(), [first["Open"].iloc[0], first["High"].max(), first["Low"].min(),
+                                                 first["Close"].iloc[-1], first["Volume"].sum()])
+
+    def test_dollar_bar(self):
+        value = (self.df["Close"] + self.df["Low"] + self.df["High"]) / 3 * self.df["Volume"] * 1000
+        bars = dollar_bar(self.df, threshold=1e11)
+        self.assertEqual(bars.index.tolist(), self.df.index[sampled_rows(value, 1e11)].tolist())
+
+    def test_tick_rule(self):
+        df = pd.DataFrame({"Close": [10, 11, 11, 10, 10, 12]})
+        self.assertEqual(tick_rule(df).tolist(), [1, 1, 1, -1, -1, 1])
+
+    def test_imbalance_bars(self):
+        b = tick_rule(self.df)
+        for bars, signed in [(tick_imbalance_bar(self.df), b),
+                             (volume_imbalance_bar(self.df), b * self.df["Volume"].to_numpy())]:
+            self.assertGreater(len(bars), 10)
+            self.assertLess(len(bars), len(self.df) / 2)
+            self.assertTrue(bars.index.is_monotonic_increasing)
+            self.assertEqual(bars["Volume"].sum(), self.df.loc[:bars.index[-1], "Volume"].sum())
+            # every bar ends with its largest imbalance
+            ends = self.df.index.get_indexer(bars.index)
+            start = ends[1] + 1
+            imbalance = np.abs(np.cumsum(signed[start:ends[2] + 1]))
+            self.assertEqual(imbalance.argmax(), len(imbalance) - 1)
+
+
+class PanelBarTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patch = mock.patch("finb.utils.price_panel.PROJECT_PATH", self.tmp_dir)
+        self.patch.start()
+        self.frames = {"AAA": make_price_df(300, seed=1), "BBB": make_price_df(200, seed=2)}
+        for symbol, df in self.frames.items():
+            symbol_dir = os.path.join(self.tmp_dir, "market/company", symbol)
+            os.makedirs(symbol_dir)
+            df.to_csv(os.path.join(symbol_dir, "price.csv"))
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_panel_bars(self):
+        panel = build_panel(panel_dir=os.path.join(self.tmp_dir, "market/panel"))
+        bars = panel_bars(volume_bar, panel, threshold={"AAA": 1e6, "BBB": 5e5})
+
+        self.assertEqual(bars.index.names, ["symbol", "Date"])
+        pd.testing.assert_frame_equal(bars.loc["AAA"], volume_bar(self.frames["AAA"], 1e6), check_freq=False)
+        pd.testing.assert_frame_equal(bars.loc["BBB"], volume_bar(self.frames["BBB"], 5e5), check_freq=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,23 +1,55 @@
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from cvxopt import matrix, solvers
+from cvxopt import matrix, spdiag, solvers
 
 
-def mean_var_opt(f:np.ndarray, specific_risk_mat: np.ndarray, factor_mat: np.ndarray, risk_aversion=1) -> np.ndarray:
-    """ Solve the quaratic optimization problem
-
-    Maximize f'w - 1/2 risk_aversion * (w'*specific_risk_mat*w)
-    or Minimize 1/2 risk_aversion * (w'*specific_risk_mat*w) - f'w
-    subject to: w'. i = 0, and w'.factor_mat = 0
+def _specific_variances(specific_risk_mat: np.ndarray, num_stocks, per_date=False):
+    """ Diagonal of the specific risk and whether the matrix is diagonal, the layout is never guessed from
+    the shape:
+        (num_stocks,) a diagonal
+        (num_dates, num_stocks) a diagonal per date, only with per_date
+        (num_stocks, num_stocks) a matrix
+        (num_dates, num_stocks, num_stocks) a matrix per date
 
-    :param f: Forecast return, (num_stocks,)
-    :param specific_risk_mat: Diagonal matrix (num_stocks, num_stocks)
-    :param factor_mat: Factor matrix (num_stocks, num_factors)
-    :param risk_aversion: Risk Aversion parameter
-    :return: optimization weights, (adjusted forecast)
+    :return: (diagonal (num_stocks,) or (num_dates, num_stocks), is diagonal)
     """
-
-    P = matrix(risk_aversion * specific_risk_mat)
+    specific_risk_mat = np.asarray(specific_risk_mat, dtype=np.float64)
+    if specific_risk_mat.ndim == 1 or (per_date and specific_risk_mat.ndim == 2):
+        if specific_risk_mat.shape[-1] != num_stocks:
+            raise ValueError("specific risk of %d stocks, expected %d" % (specific_risk_mat.shape[-1], num_stocks))
+        return specific_risk_mat, True
+    if specific_risk_mat.ndim not in (2, 3) or specific_risk_mat.shape[-2:] != (num_stocks, num_stocks):
+        raise ValueError("specific risk matrix of shape %s, expected (%d, %d), or pass its diagonals with per_date"
+                         % (specific_risk_mat.shape, num_stocks, num_stocks))
+    d = np.diagonal(specific_risk_mat, axis1=-2, axis2=-1)
+    off_diagonal = specific_risk_mat.copy()
+    off_diagonal[..., np.arange(num_stocks), np.arange(num_stocks)] = 0
+    return d, not np.any(off_diagonal)
+
+
+def _mean_var_opt_kkt(f, d, factor_mat, risk_aversion):
+    """ Closed form of the equality constrained problem, batched over the first axis
+
+    w = D^-1 (f - A mu) / risk_aversion, with A'w = 0 giving (A' D^-1 A) mu = A' D^-1 f
+    """
+    num_dates, num_stocks = f.shape
+    A = np.broadcast_to(factor_mat, (num_dates,) + factor_mat.shape[-2:])
+    A = np.concatenate([A, np.ones((num_dates, num_stocks, 1))], axis=2)
+    d_inv = np.broadcast_to(1 / d, (num_dates, num_stocks))
+
+    d_inv_A = d_inv[:, :, None] * A
+    lhs = np.einsum("tnk,tnl->tkl", A, d_inv_A)
+    rhs = np.einsum("tnk,tn->tk", d_inv_A, f)
+    mu = np.linalg.solve(lhs, rhs[:, :, None])[:, :, 0]
+    return d_inv * (f - np.einsum("tnk,tk->tn", A, mu)) / risk_aversion
+
+
+def _mean_var_opt_qp(f, specific_risk_mat, factor_mat, risk_aversion, G, h):
+    specific_risk_mat = np.ascontiguousarray(specific_risk_mat)
+    factor_mat = np.ascontiguousarray(factor_mat)
+    if specific_risk_mat.ndim == 1:
+        P = spdiag(matrix(risk_aversion * specific_risk_mat))
+    else:
+        P = matrix(risk_aversion * specific_risk_mat)
     q = matrix(-f)
 
     i = matrix(np.ones([factor_mat.shape[0], 1]))
@@ -25,12 +57,54 @@ def mean_var_opt(f:np.ndarray, specific_risk_mat: np.ndarray, factor_mat: np.nda
 
     A = matrix(np.concatenate([factor_mat, i], axis=1).transpose([1,0]))
 
-    G = None
-    h = None
+    G = None if G is None else matrix(np.asarray(G, dtype=np.float64))
+    h = None if h is None else matrix(np.asarray(h, dtype=np.float64))
 
     sol = solvers.qp(P, q, G, h, A, b)
 
-    return np.array(sol['x'])
+    return np.array(sol['x']).flatten()
+
+
+def mean_var_opt(f:np.ndarray, specific_risk_mat: np.ndarray, factor_mat: np.ndarray, risk_aversion=1,
+                 G: np.ndarray=None, h: np.ndarray=None, per_date=False) -> np.ndarray:
+    """ Solve the quaratic optimization problem
+
+    Maximize f'w - 1/2 risk_aversion * (w'*specific_risk_mat*w)
+    or Minimize 1/2 risk_aversion * (w'*specific_risk_mat*w) - f'w
+    subject to: w'. i = 0, and w'.factor_mat = 0, and G*w <= h when G is given
+
+    With a diagonal specific risk and only the equality constraints the KKT system is solved in
+    closed form, otherwise cvxopt solves the problem.
+
+    :param f: Forecast return, (num_stocks,) or a stack of forecasts (num_dates, num_stocks)
+    :param specific_risk_mat: Matrix (num_stocks, num_stocks) or one per date (num_dates, num_stocks, num_stocks),
+        or its diagonal (num_stocks,), or one diagonal per date (num_dates, num_stocks) with per_date
+    :param factor_mat: Factor matrix (num_stocks, num_factors), or one per date (num_dates, num_stocks, num_factors)
+    :param risk_aversion: Risk Aversion parameter
+    :param G: inequality constraints (num_constraints, num_stocks)
+    :param h: inequality bounds (num_constraints,)
+    :param per_date: a 2-D specific_risk_mat holds one diagonal per date instead of a matrix
+    :return: optimization weights, (adjusted forecast), (num_stocks, 1) for one forecast,
+        (num_dates, num_stocks) for a stack
+    """
+    f = np.asarray(f, dtype=np.float64)
+    factor_mat = np.asarray(factor_mat, dtype=np.float64)
+    batched = f.ndim == 2
+    F = f if batched else f[None, :]
+    num_dates, num_stocks = F.shape
+
+    d, diagonal = _specific_variances(specific_risk_mat, num_stocks, per_date)
+    if G is None and h is None and diagonal:
+        w = _mean_var_opt_kkt(F, d, factor_mat, risk_aversion)
+    else:
+        if not diagonal:
+            risk = np.broadcast_to(np.asarray(specific_risk_mat, dtype=np.float64), (num_dates, num_stocks, num_stocks))
+        else:
+            risk = np.broadcast_to(d, (num_dates, num_stocks))
+        factors = np.broadcast_to(factor_mat, (num_dates,) + factor_mat.shape[-2:])
+        w = np.stack([_mean_var_opt_qp(F[t], risk[t], factors[t], risk_aversion, G, h) for t in range(num_dates)])
+
+    return w if batched else w[0][:, None]
 
 
 def adjusted_return(returns:np.ndarray, specific_risk_mat: np.ndarray, factor_mat: np.ndarray):
@@ -41,11 +115,64 @@ def adjusted_return(returns:np.ndarray, specific_risk_mat: np.ndarray, factor_ma
     :param factor_mat: Factor matrix (num_stocks, num_factors)
     :return:
     """
-    result = LinearRegression().fit(factor_mat, returns)
-    pred = result.predict(factor_mat)
-    d = np.diagonal(specific_risk_mat)
-    ret = (returns - pred)/d
+    return adjusted_return_panel(np.asarray(returns)[None, :], specific_risk_mat, factor_mat)[0]
 
+
+def adjusted_return_panel(returns: np.ndarray, specific_risk_mat: np.ndarray, factor_mat: np.ndarray,
+                          per_date=False) -> np.ndarray:
+    """ Residuals of the cross-sectional regressions of returns on factors with an intercept, divided by
+    the specific risk, all dates are solved at once
+
+    :param returns: (num_dates, num_stocks), NaN where a stock has no return
+    :param specific_risk_mat: see mean_var_opt, only its diagonal is used
+    :param factor_mat: Factor matrix (num_stocks, num_factors), or one per date (num_dates, num_stocks, num_factors)
+    :param per_date: a 2-D specific_risk_mat holds one diagonal per date instead of a matrix
+    :return: adjusted returns (num_dates, num_stocks), NaN where the return, a factor or the specific risk is missing
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    num_dates, num_stocks = returns.shape
+    d, _ = _specific_variances(specific_risk_mat, num_stocks, per_date)
+    d = np.broadcast_to(d, (num_dates, num_stocks))
+    X = np.broadcast_to(np.asarray(factor_mat, dtype=np.float64), (num_dates, num_stocks, np.shape(factor_mat)[-1]))
+    X = np.concatenate([np.ones((num_dates, num_stocks, 1)), X], axis=2)
+
+    mask = np.isfinite(returns) & np.isfinite(X).all(axis=2) & np.isfinite(d) & (d != 0)
+    X = np.where(mask[:, :, None], X, 0)
+    y = np.where(mask, returns, 0)
+
+    # least squares of every date through the SVD of its design matrix, without squaring its condition
+    # number, a rank deficient date, e.g. a constant factor, gets the minimum norm solution like lstsq
+    rcond = np.finfo(np.float64).eps * max(X.shape[1:])
+    beta = np.einsum("tkn,tn->tk", np.linalg.pinv(X, rcond=rcond), y)
+    residuals = y - np.einsum("tnk,tk->tn", X, beta)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = residuals / d
+    ret[~mask] = np.nan
     return ret
 
 
+def risk_adjusted_ic(forecasts: np.ndarray, returns: np.ndarray, specific_risk_mat: np.ndarray,
+                     factor_mat: np.ndarray, per_date=False):
+    """ Information coefficient of forecasts against risk-adjusted returns, per date
+
+    :param specific_risk_mat, factor_mat, per_date: see adjusted_return_panel
+    :param forecasts: (num_dates, num_stocks), NaN where a stock has no forecast
+    :param returns: (num_dates, num_stocks)
+    :return: (adjusted returns (num_dates, num_stocks), IC (num_dates,)), the IC is NaN for a date
+        with less than 2 stocks
+    """
+    forecasts = np.asarray(forecasts, dtype=np.float64)
+    returns = np.where(np.isfinite(forecasts), returns, np.nan)
+    adjusted = adjusted_return_panel(returns, specific_risk_mat, factor_mat, per_date)
+
+    mask = np.isfinite(adjusted)
+    n = mask.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.where(mask, forecasts, 0)
+        y = np.where(mask, adjusted, 0)
+        x = np.where(mask, x - (x.sum(axis=1) / n)[:, None], 0)
+        y = np.where(mask, y - (y.sum(axis=1) / n)[:, None], 0)
+        ic = (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+    ic[n < 2] = np.nan
+    return adjusted, ic
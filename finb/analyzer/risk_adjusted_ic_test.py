@@ -1,6 +1,8 @@
 import unittest
 import numpy as np
-from risk_adjusted_ic import mean_var_opt, adjusted_return
+from cvxopt import solvers
+from sklearn.linear_model import LinearRegression
+from finb.analyzer.risk_adjusted_ic import mean_var_opt, adjusted_return, adjusted_return_panel, risk_adjusted_ic
 
 
 class RiskAdjustedICTestCase(unittest.TestCase):
@@ -29,6 +31,117 @@ class RiskAdjustedICTestCase(unittest.TestCase):
         self.assertEqual((adj_ret[1] - 0.08333333) < 0.00001, True)
         self.assertEqual((adj_ret[2] + 0.16666667) < 0.00001, True)
 
+    def get_random_data(self, num_dates=5, num_stocks=40, num_factors=3):
+        rng = np.random.RandomState(0)
+        f = rng.randn(num_dates, num_stocks) * 0.02
+        factor_mat = rng.randn(num_stocks, num_factors)
+        d = rng.rand(num_stocks) * 0.1 + 0.05
+        return f, factor_mat, d
+
+    def test_closed_form_matches_qp(self):
+        f, factor_mat, d = self.get_random_data()
+        # a non diagonal matrix goes to cvxopt
+        dense = np.diag(d)
+        dense[0, 1] = dense[1, 0] = 1e-12
+        solvers.options["show_progress"] = False
+        try:
+            expected = mean_var_opt(f[0], dense, factor_mat, risk_aversion=2).flatten()
+        finally:
+            solvers.options.pop("show_progress")
+        w = mean_var_opt(f[0], np.diag(d), factor_mat, risk_aversion=2).flatten()
+
+        np.testing.assert_allclose(w, expected, rtol=1e-5, atol=1e-8)
+        np.testing.assert_allclose(factor_mat.T @ w, 0, atol=1e-10)
+        self.assertAlmostEqual(w.sum(), 0)
+
+    def test_batched(self):
+        f, factor_mat, d = self.get_random_data()
+        w = mean_var_opt(f, d, factor_mat)
+
+        self.assertEqual(w.shape, f.shape)
+        for t in range(f.shape[0]):
+            np.testing.assert_allclose(w[t], mean_var_opt(f[t], np.diag(d), factor_mat).flatten())
+
+        # specific risks and factors changing with the date
+        ds = np.stack([d * (t + 1) for t in range(f.shape[0])])
+        factor_mats = np.stack([factor_mat + t for t in range(f.shape[0])])
+        w = mean_var_opt(f, ds, factor_mats, per_date=True)
+        np.testing.assert_allclose(w[3], mean_var_opt(f[3], ds[3], factor_mats[3]).flatten())
+
+    def test_as_many_dates_as_stocks(self):
+        f, factor_mat, d = self.get_random_data(num_dates=40)
+        ds = np.stack([d * (t + 1) for t in range(f.shape[0])])
+        w = mean_var_opt(f, ds, factor_mat, per_date=True)
+        np.testing.assert_allclose(w[3], mean_var_opt(f[3], ds[3], factor_mat).flatten())
+        # without per_date a square array is a matrix
+        w = mean_var_opt(f, np.diag(d), factor_mat)
+        np.testing.assert_allclose(w[3], mean_var_opt(f[3], d, factor_mat).flatten())
+        with self.assertRaises(ValueError):
+            mean_var_opt(f, ds[:5], factor_mat)
+
+    def test_inequality_constraints(self):
+        f, factor_mat, d = self.get_random_data(num_dates=2)
+        n = f.shape[1]
+        G = np.concatenate([np.eye(n), -np.eye(n)])
+        h = np.full(2 * n, 0.05)
+        solvers.options["show_progress"] = False
+        try:
+            w = mean_var_opt(f, d, factor_mat, G=G, h=h)
+        finally:
+            solvers.options.pop("show_progress")
+
+        self.assertEqual(w.shape, f.shape)
+        self.assertTrue(np.all(np.abs(w) <= 0.05 + 1e-6))
+        np.testing.assert_allclose(w.sum(axis=1), 0, atol=1e-8)
+
+
+    def test_adjusted_return_panel(self):
+        f, factor_mat, d = self.get_random_data()
+        returns = f * 3 + np.random.RandomState(1).randn(*f.shape) * 0.01
+        returns[1, :5] = np.nan
+        factor_mats = np.stack([factor_mat] * f.shape[0])
+        factor_mats[2, 7, 0] = np.nan
+
+        adjusted = adjusted_return_panel(returns, d, factor_mats)
+        self.assertTrue(np.isnan(adjusted[1, :5]).all())
+        self.assertTrue(np.isnan(adjusted[2, 7]))
+        for t in range(f.shape[0]):
+            valid = np.isfinite(returns[t]) & np.isfinite(factor_mats[t]).all(axis=1)
+            fit = LinearRegression().fit(factor_mats[t][valid], returns[t][valid])
+            expected = (returns[t][valid] - fit.predict(factor_mats[t][valid])) / d[valid]
+            np.testing.assert_allclose(adjusted[t][valid], expected, atol=1e-10)
+
+    def test_adjusted_return_panel_per_date(self):
+        f, factor_mat, d = self.get_random_data(num_dates=40)
+        returns = f * 3 + np.random.RandomState(1).randn(*f.shape) * 0.01
+        ds = np.stack([d * (t + 1) for t in range(f.shape[0])])
+        # a nearly collinear factor, its normal equations are badly conditioned
+        factor_mat = np.concatenate([factor_mat, factor_mat[:, :1] + 1e-7 * np.random.RandomState(2).randn(40, 1)],
+                                    axis=1)
+
+        adjusted = adjusted_return_panel(returns, ds, factor_mat, per_date=True)
+        X = np.concatenate([np.ones((40, 1)), factor_mat], axis=1)
+        for t in [0, 3, 39]:
+            beta = np.linalg.lstsq(X, returns[t], rcond=None)[0]
+            np.testing.assert_allclose(adjusted[t], (returns[t] - X @ beta) / ds[t], atol=1e-8)
+        np.testing.assert_allclose(adjusted_return_panel(returns, np.diag(d), factor_mat),
+                                   adjusted_return_panel(returns, d, factor_mat))
+
+    def test_risk_adjusted_ic(self):
+        f, factor_mat, d = self.get_random_data()
+        returns = f * 3 + np.random.RandomState(1).randn(*f.shape) * 0.01
+        forecasts = f.copy()
+        forecasts[0, :3] = np.nan
+        forecasts[4, 1:] = np.nan
+
+        adjusted, ic = risk_adjusted_ic(forecasts, returns, d, factor_mat)
+        self.assertEqual(ic.shape, (f.shape[0],))
+        self.assertTrue(np.isnan(adjusted[0, :3]).all())
+        self.assertTrue(np.isnan(ic[4]))
+        valid = np.isfinite(forecasts[0])
+        expected = np.corrcoef(forecasts[0][valid], adjusted[0][valid])[0, 1]
+        self.assertAlmostEqual(ic[0], expected)
+        self.assertTrue(np.all(ic[:4] > 0.5))
 
 
 if __name__ == '__main__':
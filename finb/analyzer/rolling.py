@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from finb.analyzer.process import compute_returns
+from finb.utils.datahub import read_price_df, read_price_panel
+
+# Rolling regression of the returns of many symbols on the returns of an index,
+#   stock_return = alpha + beta * market_return + residual
+# Returns are in percent like process.compute_returns. A symbol uses the sessions of the window where
+# both it and the index have a return.
+
+INDICES = ("VNINDEX", "VN30")
+
+STATS = ("alpha", "beta", "residual_vol", "corr", "n")
+
+
+def _stats(n, sx, sy, sxx, syy, sxy, min_periods):
+    """ Regression statistics from the sums over the windows, arrays of the same shape """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mx = sx / n
+        my = sy / n
+        var_x = sxx / n - mx * mx
+        var_y = syy / n - my * my
+        cov = sxy / n - mx * my
+        beta = cov / var_x
+        alpha = my - beta * mx
+        corr = cov / np.sqrt(var_x * var_y)
+        # residual variance with n - 2 degrees of freedom
+        residual_vol = np.sqrt(np.maximum(var_y - beta * cov, 0) * n / (n - 2))
+
+    ret = {"alpha": alpha, "beta": beta, "residual_vol": residual_vol, "corr": corr}
+    for k in ret:
+        ret[k] = np.where(n >= max(min_periods, 3), ret[k], np.nan)
+    ret["n"] = n
+    return ret
+
+
+def rolling_regression(stock_returns: pd.DataFrame, market_returns: pd.Series, window=60, min_periods=None):
+    """ Rolling alpha, beta, residual volatility and correlation of every column against the market
+
+    :param stock_returns: dates x symbols returns, NaN where a symbol has no return
+    :param market_returns: returns of the index, aligned on the dates of stock_returns
+    :param window: sessions per window
+    :param min_periods: least sessions with a return in a window, default the window
+    :return: dict STATS -> dates x symbols frame, the statistics of the window ending at each date
+    """
+    min_periods = window if min_periods is None else min_periods
+    x = market_returns.reindex(stock_returns.index).to_numpy(dtype=np.float64)[:, None]
+    y = stock_returns.to_numpy(dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+
+    def window_sum(a):
+        cs = np.cumsum(a, axis=0)
+        ret = cs.copy()
+        ret[window:] -= cs[:-window]
+        return ret
+
+    # sums over windows from cumulative sums, one pass for the whole history
+    stats = _stats(window_sum(valid.astype(np.float64)), window_sum(x), window_sum(y),
+                   window_sum(x * x), window_sum(y * y), window_sum(x * y), min_periods)
+    return {k: pd.DataFrame(v, index=stock_returns.index, columns=stock_returns.columns) for k, v in stats.items()}
+
+
+class RollingRegression:
+    """ Rolling regression updated one session at a time
+
+    The last window of returns is kept in a ring buffer with the running sums, append() costs
+    O(1) per symbol. The sums are summed again from the buffer once per window to bound rounding.
+    """
+    def __init__(self, symbols, window=60, min_periods=None):
+        self.symbols = list(symbols)
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        n_symbols = len(self.symbols)
+        self.x = np.zeros((window, 1))
+        self.y = np.zeros((window, n_symbols))
+        self.valid = np.zeros((window, n_symbols), dtype=bool)
+        self.pos = 0
+        self.count = 0
+        self._sums = np.zeros((6, n_symbols))
+
+    @staticmethod
+    def _terms(x, y, valid):
+        x = np.where(valid, x, 0)
+        y = np.where(valid, y, 0)
+        return np.stack([valid.astype(np.float64), x, y, x * x, y * y, x * y])
+
+    def append(self, market_return, stock_returns):
+        """ Add the returns of a session
+
+        :param market_return: return of the index
+        :param stock_returns: returns of self.symbols, NaN where a symbol has no return
+        """
+        x = np.float64(market_return)
+        y = np.asarray(stock_returns, dtype=np.float64)
+        valid = np.isfinite(y) & np.isfinite(x)
+
+        # the oldest session leaves the window
+        self._sums -= self._terms(self.x[self.pos], self.y[self.pos], self.valid[self.pos])
+        self.x[self.pos] = x if np.isfinite(x) else 0
+        self.y[self.pos] = y
+        self.valid[self.pos] = valid
+        self._sums += self._terms(self.x[self.pos], y, valid)
+
+        self.pos = (self.pos + 1) % self.window
+        self.count += 1
+        if self.pos == 0:
+            self._sums = self._terms(self.x, self.y, self.valid).sum(axis=1)
+
+    def stats(self) -> pd.DataFrame:
+        """ symbols x STATS frame of the current window """
+        ret = _stats(*self._sums, min_periods=self.min_periods)
+        return pd.DataFrame(ret, index=pd.Index(self.symbols, name="symbol"), columns=list(STATS))
+
+
+def market_returns(index="VNINDEX", panel=None) -> pd.Series:
+    """ Daily returns of an index in percent """
+    if panel is not None and index in panel.symbols:
+        df = panel.symbol_df(index)
+    else:
+        df = read_price_df(index)
+    return compute_returns(df)["Return"]
+
+
+def panel_returns(panel=None, symbols=None) -> pd.DataFrame:
+    """ dates x symbols daily returns in percent of the price panel, NaN where a symbol has no bar """
+    panel = read_price_panel() if panel is None else panel
+    close = panel.field("Close")
+    if symbols is not None:
+        close = close[symbols]
+    # the previous close of a symbol is the last session it has a bar in
+    prev_close = close.ffill().shift(1)
+    return (close - prev_close) / prev_close * 100
+
+
+def rolling_market_regression(index="VNINDEX", window=60, symbols=None, panel=None, min_periods=None):
+    """ Rolling regression of every symbol of the price panel against VNINDEX or VN30
+
+    :return: dict STATS -> dates x symbols frame
+    """
+    if index not in INDICES:
+        raise ValueError("unknown index %s, expected one of %s" % (index, ", ".join(INDICES)))
+    panel = read_price_panel() if panel is None else panel
+    stock_returns = panel_returns(panel, symbols).drop(columns=list(INDICES), errors="ignore")
+    return rolling_regression(stock_returns, market_returns(index, panel), window=window, min_periods=min_periods)
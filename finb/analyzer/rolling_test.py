@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from finb.analyzer.process import compute_beta, compute_returns
+from finb.analyzer.rolling import rolling_regression, RollingRegression, rolling_market_regression, STATS
+from finb.utils.price_panel import build_panel
+
+
+def make_returns(n=300, n_symbols=4, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range("2020-01-01", periods=n, name="Date")
+    market = pd.Series(rng.randn(n), index=dates)
+    betas = np.linspace(0.5, 1.5, n_symbols)
+    returns = pd.DataFrame(market.to_numpy()[:, None] * betas + 0.1 + rng.randn(n, n_symbols) * 0.5,
+                           index=dates, columns=["S%d" % i for i in range(n_symbols)])
+    returns.iloc[50:60, 1] = np.nan
+    return market, returns
+
+
+class RollingRegressionTestCase(unittest.TestCase):
+    def test_matches_linregress(self):
+        market, returns = make_returns()
+        ret = rolling_regression(returns, market, window=40, min_periods=20)
+
+        self.assertTrue(ret["beta"].iloc[:19].isnull().all().all())
+        for symbol in ["S0", "S1"]:
+            for end in [39, 58, 120]:
+                x = market.iloc[end - 39:end + 1]
+                y = returns[symbol].iloc[end - 39:end + 1]
+                valid = y.notnull()
+                fit = stats.linregress(x[valid], y[valid])
+                residuals = y[valid] - fit.intercept - fit.slope * x[valid]
+                self.assertAlmostEqual(ret["beta"][symbol].iloc[end], fit.slope)
+                self.assertAlmostEqual(ret["alpha"][symbol].iloc[end], fit.intercept)
+                self.assertAlmostEqual(ret["corr"][symbol].iloc[end], fit.rvalue)
+                self.assertAlmostEqual(ret["residual_vol"][symbol].iloc[end], residuals.std(ddof=2))
+                self.assertEqual(ret["n"][symbol].iloc[end], valid.sum())
+
+    def test_incremental(self):
+        market, returns = make_returns()
+        expected = rolling_regression(returns, market, window=40, min_periods=20)
+
+        rolling = RollingRegression(returns.columns, window=40, min_periods=20)
+        for i in range(len(returns)):
+            rolling.append(market.iloc[i], returns.iloc[i].to_numpy())
+            if i in (10, 45, 79, 80, 299):
+                df = rolling.stats()
+                for k in STATS:
+                    np.testing.assert_allclose(df[k].to_numpy(), expected[k].iloc[i].to_numpy(), rtol=1e-9,
+                                               err_msg="%s %d" % (k, i))
+
+    def test_compute_beta(self):
+        market, returns = make_returns()
+        market_returns = market.to_frame("Return")
+        stock_returns = returns[["S3"]].rename(columns={"S3": "Return"})
+        self.assertAlmostEqual(compute_beta(market_returns, stock_returns).slope, 1.5, delta=0.1)
+
+
+class PanelRollingRegressionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patch = mock.patch("finb.utils.price_panel.PROJECT_PATH", self.tmp_dir)
+        self.patch.start()
+
+        market, returns = make_returns(n=120, n_symbols=2)
+        self.frames = {"VNINDEX": 1000 * np.cumprod(1 + market / 100)}
+        for symbol in returns.columns:
+            self.frames[symbol] = 20 * np.cumprod(1 + returns[symbol].dropna() / 100)
+        for symbol, close in self.frames.items():
+            df = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 100})
+            os.makedirs(os.path.join(self.tmp_dir, "market/company", symbol))
+            df.to_csv(os.path.join(self.tmp_dir, "market/company", symbol, "price.csv"))
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_panel(self):
+        panel = build_panel(panel_dir=os.path.join(self.tmp_dir, "market/panel"))
+        ret = rolling_market_regression("VNINDEX", window=30, panel=panel)
+        self.assertEqual(ret["beta"].columns.tolist(), ["S0", "S1"])
+
+        # returns of a symbol over its missing sessions are taken from its last close
+        market = compute_returns(self.frames["VNINDEX"].to_frame("Close"))["Return"]
+        s1 = compute_returns(self.frames["S1"].to_frame("Close"))["Return"]
+        expected = rolling_regression(s1.iloc[1:].to_frame("S1"), market, window=30)
+        self.assertAlmostEqual(ret["beta"]["S1"].iloc[-1], expected["beta"]["S1"].iloc[-1])
+        with self.assertRaises(ValueError):
+            rolling_market_regression("HNXINDEX", panel=panel)
+
+
+if __name__ == "__main__":
+    unittest.main()
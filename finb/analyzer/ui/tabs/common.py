@@ -2,7 +2,7 @@ import os
 import pandas as pd
 import datetime
 from finb.utils.datahub import \
-  read_considered_df, read_balance_sheet_with_year_range, read_income_statement_with_year_range
+  read_considered_df, read_company_registry, read_balance_sheet_with_year_range, read_income_statement_with_year_range
 from finb.utils.visualize import generate_colors_pool
 from finb import PROJECT_PATH
 
@@ -128,10 +128,8 @@ def create_symbol_filter_box_func(title, card_name, content_components, initiali
       if include_vn30:
         options.append({'label': 'VN30', 'value': 'VN30'})
       return options
-    df = companies_df[companies_df["industryName"] == sector].sort_index()
-
-    x = df.index.tolist()
-    name = df["companyName"].tolist()
-    return [{'label': f"{s}-{n}", 'value': s} for s, n in zip(x, name)]
+    registry = read_company_registry(considered=True)
+    return [{'label': f"{s}-{registry.get(s)['companyName']}", 'value': s}
+            for s in sorted(registry.industry(sector))]
 
   return render, filter_symbols_by_sector
\ No newline at end of file
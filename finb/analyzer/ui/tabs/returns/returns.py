@@ -11,7 +11,7 @@ from collections import namedtuple
 from finb.analyzer.ui.tabs.common import \
   create_symbol_filter_box_func, companies_df
 
-from finb.utils.datahub import read_price_df, generate_weekly_quotes
+from finb.utils.datahub import read_resampled_price_df
 from finb.utils.visualize import generate_return_chart
 from finb.analyzer.process import compute_returns, compute_beta
 
@@ -99,9 +99,8 @@ def draw_weekly_returns(symbol):
 
   current_year = datetime.datetime.now().year
   start_date = "%d-01-01" % (current_year - 5)
-  daily_price_df = read_price_df(symbol)
-  daily_price_df = daily_price_df.loc[start_date:]
-  weekly_price_df = generate_weekly_quotes(daily_price_df)
+  weekly_price_df = read_resampled_price_df(symbol, "W", adjusted=True)
+  weekly_price_df = weekly_price_df.loc[start_date:]
 
   returns_df = compute_returns(weekly_price_df)
 
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from finb import PROJECT_PATH
+
+# Content addressed cache of raw responses of finb.crawl.transport
+#   off: the cache is not used, the default so that crawls always see the latest data
+#   read-write: fresh entries are served, misses and expired entries are fetched and stored
+#   replay: every response is served from the cache whatever its age, a miss raises CacheMiss
+# Select a mode with FINB_HTTP_CACHE or cache_mode(), e.g. read-write while developing a crawler.
+
+MODES = ("off", "read-write", "replay")
+
+CACHE_PATH = os.path.join(PROJECT_PATH, "market/.http_cache")
+
+# source -> seconds an entry stays fresh, None never expires
+CACHE_TTL = {
+    "vietstock": 6 * 3600,
+    "bsc": 30 * 86400,
+    "mbs": 7 * 86400,
+    "vndirect": 86400
+}
+
+_mode = os.environ.get("FINB_HTTP_CACHE", "off")
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def get_mode():
+    return _mode
+
+
+def set_mode(mode):
+    global _mode
+    if mode not in MODES:
+        raise ValueError("unknown cache mode %s, expected one of %s" % (mode, ", ".join(MODES)))
+    _mode = mode
+
+
+@contextmanager
+def cache_mode(mode):
+    """ Run a block with another cache mode, e.g. `with cache_mode("replay"): engine.run()` """
+    previous = get_mode()
+    set_mode(mode)
+    try:
+        yield
+    finally:
+        set_mode(previous)
+
+
+def _normalize_params(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        params = params.items()
+    return [(str(k), str(v)) for k, v in params]
+
+
+def cache_key(source, method, url, params=None, data=None, json_body=None):
+    """ sha256 of the method, the endpoint and the sorted query params and body of a request """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True) + _normalize_params(params))
+
+    h = hashlib.sha256()
+    h.update(method.upper().encode())
+    h.update(b"\n")
+    h.update(f"{parts.scheme}://{parts.netloc}{parts.path}".encode())
+    h.update(b"\n")
+    h.update(urlencode(query).encode())
+    h.update(b"\n")
+    if data is not None:
+        h.update(data if isinstance(data, bytes) else urlencode(sorted(_normalize_params(data))).encode())
+    h.update(b"\n")
+    if json_body is not None:
+        h.update(json.dumps(json_body, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _entry_paths(source, key):
+    entry_dir = os.path.join(CACHE_PATH, source, key[:2])
+    return os.path.join(entry_dir, key + ".meta.json"), os.path.join(entry_dir, key + ".body")
+
+
+def lookup(source, key, max_age=None):
+    """ Cached response of a key
+
+    :param max_age: seconds, entries older than this are ignored, None accepts any age
+    :return: requests.Response or None
+    """
+    meta_path, body_path = _entry_paths(source, key)
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if max_age is not None and time.time() - meta["fetched_at"] > max_age:
+            return None
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError, KeyError):
+        return None
+
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.url = meta["url"]
+    response.encoding = meta["encoding"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response._content = body
+    response.from_cache = True
+    return response
+
+
+def store(source, key, response):
+    """ Save the body and the metadata of a response, the metadata is written last so that readers
+    never see a half written entry """
+    meta_path, body_path = _entry_paths(source, key)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    meta = {
+        "url": response.url,
+        "status": response.status_code,
+        "encoding": response.encoding,
+        "headers": {k: response.headers[k] for k in ("Content-Type",) if k in response.headers},
+        "fetched_at": time.time()
+    }
+    suffix = ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+    with open(body_path + suffix, "wb") as f:
+        f.write(response.content)
+    os.replace(body_path + suffix, body_path)
+    with open(meta_path + suffix, "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + suffix, meta_path)
+
+
+def cached_request(source, method, url, fetch, params=None, data=None, json_body=None, cacheable=None):
+    """ Serve a request from the cache according to the current mode
+
+    :param fetch: function without arguments doing the network call, returns a successful response
+    :param cacheable: function response -> bool, a response for which it is False is returned but not stored,
+        e.g. a statement response lacking quarters which are not published yet
+    """
+    mode = get_mode()
+    if mode == "off":
+        return fetch()
+
+    key = cache_key(source, method, url, params=params, data=data, json_body=json_body)
+    if mode == "replay":
+        response = lookup(source, key)
+        if response is None:
+            raise CacheMiss("%s %s %s is not cached" % (source, method, url))
+        return response
+
+    response = lookup(source, key, max_age=CACHE_TTL.get(source))
+    if response is not None:
+        return response
+    response = fetch()
+    if cacheable is not None and not cacheable(response):
+        return response
+    try:
+        store(source, key, response)
+    except OSError as e:
+        print("[cached_request] Warning ", str(e))
+    return response
+
+
+def prune(source=None):
+    """ Remove expired entries
+
+    :return: number of removed entries
+    """
+    sources = [source] if source is not None else list(CACHE_TTL.keys())
+    now = time.time()
+    removed = 0
+    for s in sources:
+        ttl = CACHE_TTL.get(s)
+        source_dir = os.path.join(CACHE_PATH, s)
+        if ttl is None or not os.path.exists(source_dir):
+            continue
+        for root, _, files in os.walk(source_dir):
+            for name in files:
+                if not name.endswith(".meta.json"):
+                    continue
+                meta_path = os.path.join(root, name)
+                try:
+                    with open(meta_path, "r") as f:
+                        fetched_at = json.load(f)["fetched_at"]
+                except (OSError, ValueError, KeyError):
+                    fetched_at = 0
+                if now - fetched_at <= ttl:
+                    continue
+                for path in (meta_path, meta_path[:-len(".meta.json")] + ".body"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                removed += 1
+    return removed
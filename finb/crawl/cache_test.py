@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from finb.crawl import transport, cache
+from finb.crawl.cache import cache_key, cache_mode, CacheMiss
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    count = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        CountingHandler.count += 1
+        data = json.dumps({"path": self.path, "count": CountingHandler.count}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingHandler.count = 0
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/api" % self.server.server_address[1]
+        self.patches = [
+            mock.patch.object(cache, "CACHE_PATH", self.tmp_dir),
+            mock.patch.object(cache, "_mode", "read-write"),
+            mock.patch.dict(transport.RATE_LIMITS, {s: (1000, 1000) for s in transport.RATE_LIMITS}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key_ignores_param_order(self):
+        a = cache_key("vietstock", "GET", self.url, params=(("symbol", "PNJ"), ("from", "1"), ("to", "2")))
+        b = cache_key("vietstock", "get", self.url, params={"to": "2", "from": "1", "symbol": "PNJ"})
+        c = cache_key("vietstock", "GET", self.url, params={"from": "1", "to": "3", "symbol": "PNJ"})
+        self.assertEqual(a, b)
+        # the end of a price range takes part in the key
+        self.assertNotEqual(a, c)
+        self.assertEqual(cache_key("bsc", "GET", self.url + "?b=1&a=2"), cache_key("bsc", "GET", self.url + "?a=2&b=1"))
+
+    def test_read_write_serves_fresh_entries(self):
+        first = transport.request("bsc", self.url + "?symbol=PNJ").json()
+        second = transport.request("bsc", self.url + "?symbol=PNJ").json()
+        other = transport.request("bsc", self.url + "?symbol=FPT").json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(other["count"], 2)
+        self.assertEqual(CountingHandler.count, 2)
+
+    def test_uncacheable_responses_are_not_stored(self):
+        transport.request("bsc", self.url, cacheable=lambda response: False)
+        self.assertEqual(transport.request("bsc", self.url).json()["count"], 2)
+        self.assertEqual(transport.request("bsc", self.url).json()["count"], 2)
+
+    def test_expired_entries_are_fetched_again(self):
+        transport.request("vndirect", self.url)
+        with mock.patch.dict(cache.CACHE_TTL, {"vndirect": 0}):
+            time.sleep(0.01)
+            self.assertEqual(transport.request("vndirect", self.url).json()["count"], 2)
+            self.assertEqual(cache.prune("vndirect"), 1)
+        self.assertEqual(CountingHandler.count, 2)
+
+    def test_replay(self):
+        transport.request("mbs", self.url, params={"code": "PNJ"})
+        self.server.shutdown()
+
+        with mock.patch.dict(cache.CACHE_TTL, {"mbs": 0}), cache_mode("replay"):
+            response = transport.request("mbs", self.url, params={"code": "PNJ"})
+            self.assertEqual(response.json()["count"], 1)
+            self.assertEqual(response.headers["Content-Type"], "application/json; charset=utf-8")
+            with self.assertRaises(CacheMiss):
+                transport.request("mbs", self.url, params={"code": "FPT"})
+        self.assertEqual(cache.get_mode(), "read-write")
+
+
+if __name__ == '__main__':
+    unittest.main()
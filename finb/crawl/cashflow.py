@@ -1,46 +1,37 @@
 from collections import OrderedDict
-import requests
-from urllib3.exceptions import InsecureRequestWarning
 from copy import deepcopy
-from finb.utils.date import current_quarter_and_year
-from finb.utils.vn_lang import VN_COMBINE_ACCENT_REPLACE
+from finb.crawl import transport
+from finb.crawl.planner import plan_statement_requests, statement_response_complete
+from finb.utils.accounts import normalize_label
 
 # http://dulieu.mbs.com.vn/vi/Enterprise/FinancialIndicator?StockCode=PNJ
 # https://www.bsc.com.vn/Companies/Profile/PNJ
 # https://agriseco.com.vn/Companies/FinancialStatements/AAA
 # http://ezsearch.fpts.com.vn/Services/EzData/Default2.aspx?s=465
 
-requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
-def get_cash_flow(symbol, from_year=None, to_year=None):
-    furl = f"https://www.bsc.com.vn/api/Data/Finance/LastestFinancialReports?symbol={symbol}&type=4&year=%d&quarter=4&count=5"
-
-    payload = {}
-    headers = {
-        'Connection': 'keep-alive',
-        'Accept': 'application/json, text/plain, */*',
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/84.0.4147.135 Safari/537.36',
-        'Sec-Fetch-Site': 'same-origin',
-        'Sec-Fetch-Mode': 'cors',
-        'Sec-Fetch-Dest': 'empty',
-        'Referer': f'https://www.bsc.com.vn/Companies/FinancialStatements/{symbol}',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Cookie': 'ASP.NET_SessionId=dsfabbnc0t4pyk5f4xwjhuin; _fbp=fb.2.1600532504137.710301496; _ga=GA1.3.1235247621.1600532505; _gid=GA1.3.1484322541.1600532505; _culture=vi-VN; NSC_XfcTfswfs_443=ffffffff091da14945525d5f4f58455e445a4a42378b; _gat=1; TawkConnectionTime=0; NSC_XfcTfswfs_443=ffffffff091da14945525d5f4f58455e445a4a42378b'
-    }
+
+FINANCE_REPORTS_API = "https://www.bsc.com.vn/api/Data/Finance/LastestFinancialReports"
+
+
+def get_cash_flow(symbol, from_year=None, to_year=None, plan=None):
+    """ Crawl quarterly cash flow statements
+
+    :param plan: list of (year, quarter, count) api calls, see finb.crawl.planner.plan_statement_requests
+    :return: OrderedDict (quarter, year) -> [[field, value], ...]
+    """
+    furl = f"{FINANCE_REPORTS_API}?symbol={symbol}&type=4&year=%d&quarter=%d&count=%d"
+
+    headers = {'Referer': f'https://www.bsc.com.vn/Companies/FinancialStatements/{symbol}'}
 
     ret_dict = OrderedDict()
-    _, cr_year = current_quarter_and_year()
-
-    if from_year is None and to_year is None:
-        from_year = cr_year - 15
-        to_year = cr_year + 1
-    elif from_year is None:
-        from_year = cr_year - 15
-    elif to_year is None:
-        to_year = cr_year + 1
-
-    for year in range(from_year, to_year):
-        url = furl % year
-        response = requests.request("GET", url, headers=headers, data=payload, verify=False)
+
+    if plan is None:
+        plan = plan_statement_requests(from_year, to_year)
+
+    for req_year, req_quarter, count in plan:
+        url = furl % (req_year, req_quarter, count)
+        response = transport.request("bsc", url, headers=headers,
+                                     cacheable=statement_response_complete(req_year, req_quarter, count))
         data = response.json()
 
         if data is None:
@@ -49,9 +40,7 @@ def get_cash_flow(symbol, from_year=None, to_year=None):
         tmp_dict = OrderedDict()
 
         for item in data:
-            name = item["Name"]
-            for k, v in VN_COMBINE_ACCENT_REPLACE.items():
-                name = name.replace(k, v).strip()
+            name = normalize_label(item["Name"])
             values = item["Values"]
             for x in values:
                 quarter = x["Quarter"]
@@ -1,27 +1,56 @@
 import os
 import json
+import threading
 import pandas as pd
 from datetime import datetime
 from finb import PROJECT_PATH
-from finb.crawl.history import get_history_price
-from finb.crawl.events import get_company_events
+from finb.crawl.history import get_history_price, HISTORY_API
+from finb.crawl.events import get_company_events, EVENTS_API
 from finb.crawl.snapshot import get_company_snapshot
-from finb.crawl.income_statement import get_income_statement
+from finb.crawl.income_statement import get_income_statement, FINANCE_REPORTS_API
 from finb.crawl.balance_sheet import get_balance_sheet
 from finb.crawl.cashflow import get_cash_flow
 from finb.crawl.financial_indicators import get_financial_indicators
-from finb.crawl.major_holders import get_major_holders
+from finb.crawl.major_holders import get_major_holders, MAJOR_HOLDERS_API
+from finb.crawl.planner import plan_statement_requests
+from finb.utils.statement_store import stored_store_quarters, update_statement_store, read_statement_store, \
+    store_path, quarter_label
+from finb.utils.price_panel import update_price_panel
+from finb.utils.adjust import update_adjustments
+from finb.utils.catalog import catalog_exists, record_artifacts, frame_entry, statement_entries
 from finb.utils.date import str_to_ts
 
+# api each statement is crawled from, recorded in the catalog
+STATEMENT_SOURCES = {
+    "balance_sheet": FINANCE_REPORTS_API,
+    "income_statement": FINANCE_REPORTS_API,
+    "cashflow": FINANCE_REPORTS_API,
+    "financial_indicators": "http://api.dulieu.mbs.com.vn/api/Enterprise/GetFinanceBalanceSheet"
+}
+
 
 class CrawlCompanyProfile:
     def __init__(self, symbol):
         self.symbol = symbol
         self.symbol_dir = os.path.join(PROJECT_PATH, f"market/company/{symbol}")
-        if not os.path.exists(self.symbol_dir):
-            os.makedirs(self.symbol_dir)
+        os.makedirs(self.symbol_dir, exist_ok=True)
+
+    def get_price_history(self, start_date:str=None, end_date:str=None, incremental=False):
+        """ Crawl daily prices into price.csv
+
+        :param incremental: only request bars from the last stored date and append them to price.csv
+        """
+        price_path = os.path.join(self.symbol_dir, "price.csv")
+
+        stored_df = None
+        if incremental and start_date is None and os.path.exists(price_path):
+            stored_df = pd.read_csv(price_path, index_col=0, parse_dates=True)
+            if len(stored_df) > 0:
+                # the last stored bar is requested again, it may have been crawled during the session
+                start_date = stored_df.index[-1].strftime("%Y-%m-%d")
+            else:
+                stored_df = None
 
-    def get_price_history(self, start_date:str=None, end_date:str=None):
         if start_date is None:
             start_date = "2008-01-01"
         if end_date is None:
@@ -30,7 +59,25 @@ class CrawlCompanyProfile:
                 self.symbol,
                 _from=str_to_ts(start_date),
                 to=str_to_ts(end_date))
-        df.to_csv(os.path.join(self.symbol_dir, "price.csv"))
+
+        if stored_df is not None:
+            df = pd.concat([stored_df, df])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+            df.index.name = "Date"
+            df["Volume"] = df["Volume"].astype(int)
+            # no new or revised bar, e.g. a suspended symbol, nothing to rewrite
+            if df.equals(stored_df):
+                return
+
+        # write to a temporary file first so readers never see a partially written price.csv
+        tmp_path = price_path + ".tmp"
+        df.to_csv(tmp_path)
+        os.replace(tmp_path, price_path)
+        update_price_panel(self.symbol, df)
+        record_artifacts([frame_entry(self.symbol, "price", price_path, df, source=HISTORY_API)])
+        # events whose ex-date was not covered by the prices yet
+        if os.path.exists(os.path.join(self.symbol_dir, "events")):
+            update_adjustments(self.symbol, df)
 
     def get_events(self):
         df_dict = get_company_events(self.symbol)
@@ -39,92 +86,80 @@ class CrawlCompanyProfile:
         if not os.path.exists(events_dir):
             os.makedirs(events_dir)
 
+        entries = []
         for k, v in df_dict.items():
-            v["df"].to_csv(os.path.join(events_dir, f"{v['type']}.csv"), index=False)
-
-    def get_latest_snapshot(self):
-        ret = get_company_snapshot(self.symbol)
+            path = os.path.join(events_dir, f"{v['type']}.csv")
+            # the price job of the symbol may read the events while they are written
+            tmp_path = path + ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+            v["df"].to_csv(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            entries.append(frame_entry(self.symbol, "events", path, v["df"], period=v["type"],
+                                       date_column="effectiveDate", source=EVENTS_API))
+        record_artifacts(entries)
+        update_adjustments(self.symbol)
+
+    def get_latest_snapshot(self, driver=None):
+        ret = get_company_snapshot(self.symbol, driver=driver)
 
         if not os.path.exists(self.symbol_dir):
             os.makedirs(self.symbol_dir)
 
-        with open(os.path.join(self.symbol_dir, "snapshot.json"), "w") as fobj:
+        snapshot_path = os.path.join(self.symbol_dir, "snapshot.json")
+        with open(snapshot_path, "w") as fobj:
             json.dump(ret, fobj)
-
-    def get_income_statement(self, from_year=None, to_year=None):
-        report_dict = get_income_statement(self.symbol, from_year, to_year)
-
-        income_stat_dir = os.path.join(self.symbol_dir, "incomestat")
-        if not os.path.exists(income_stat_dir):
-            os.makedirs( income_stat_dir)
-
-        for k, v in report_dict.items():
-            df = pd.DataFrame(columns=["fields", "values"])
-
-            for field, value in v:
-                df = df.append({
-                    "fields": field,
-                    "values": value
-                }, ignore_index=True)
-            df.set_index("fields", inplace=True)
-            df = df[~df.index.duplicated(keep='first')]
-            df.to_csv(os.path.join(income_stat_dir, f"{k[1]}-Q{k[0]}.csv"))
-
-    def get_balance_sheet(self, from_year=None, to_year=None):
-        balance_sheet_dict = get_balance_sheet(self.symbol, from_year, to_year)
-
-        balansheet_dir = os.path.join(self.symbol_dir, "balansheet")
-        if not os.path.exists(balansheet_dir):
-            os.makedirs(balansheet_dir)
-
-        for k, v in balance_sheet_dict.items():
-            df = pd.DataFrame(columns=["fields", "values"])
-
-            for field, value in v:
-                df = df.append({
-                    "fields": field,
-                    "values": value
-                }, ignore_index=True)
-            df.set_index("fields", inplace=True)
-            df = df[~df.index.duplicated(keep='first')]
-            df.to_csv(os.path.join(balansheet_dir, f"{k[1]}-Q{k[0]}.csv"))
-
-    def get_cashflow(self, from_year=None, to_year=None):
-        cashflow_dict = get_cash_flow(self.symbol, from_year, to_year)
-
-        cashflow_dir = os.path.join(self.symbol_dir, "cashflow")
-        if not os.path.exists(cashflow_dir):
-            os.makedirs(cashflow_dir)
-
-        for k, v in cashflow_dict.items():
-            df = pd.DataFrame(columns=["fields", "values"])
-
-            for field, value in v:
-                df = df.append({
-                    "fields": field,
-                    "values": value
-                }, ignore_index=True)
-            df.set_index("fields", inplace=True)
-            df = df[~df.index.duplicated(keep='first')]
-            df.to_csv(os.path.join(cashflow_dir, f"{k[1]}-Q{k[0]}.csv"))
+        record_artifacts([frame_entry(self.symbol, "snapshot", snapshot_path, None, source="ra.vcsc.com.vn")])
+        return ret
+
+    def get_income_statement(self, from_year=None, to_year=None, refresh=False):
+        """ Crawl the missing quarters, or all quarters of the year range when refresh=True """
+        stored = set() if refresh else stored_store_quarters(self.symbol, "income_statement")
+        plan = plan_statement_requests(from_year, to_year, stored)
+        if len(plan) == 0:
+            return
+        report_dict = get_income_statement(self.symbol, from_year, to_year, plan=plan)
+        self._save_statement("income_statement", report_dict, stored)
+
+    def get_balance_sheet(self, from_year=None, to_year=None, refresh=False):
+        """ Crawl the missing quarters, or all quarters of the year range when refresh=True """
+        stored = set() if refresh else stored_store_quarters(self.symbol, "balance_sheet")
+        plan = plan_statement_requests(from_year, to_year, stored)
+        if len(plan) == 0:
+            return
+        balance_sheet_dict = get_balance_sheet(self.symbol, from_year, to_year, plan=plan)
+        self._save_statement("balance_sheet", balance_sheet_dict, stored)
+
+    def get_cashflow(self, from_year=None, to_year=None, refresh=False):
+        """ Crawl the missing quarters, or all quarters of the year range when refresh=True """
+        stored = set() if refresh else stored_store_quarters(self.symbol, "cashflow")
+        plan = plan_statement_requests(from_year, to_year, stored)
+        if len(plan) == 0:
+            return
+        cashflow_dict = get_cash_flow(self.symbol, from_year, to_year, plan=plan)
+        self._save_statement("cashflow", cashflow_dict, stored)
 
     def get_financial_indicators(self):
         fin_inds_dict = get_financial_indicators(self.symbol)
-        financial_indicators_dir = os.path.join(self.symbol_dir, "fininds")
-
-        if not os.path.exists(financial_indicators_dir):
-            os.makedirs(financial_indicators_dir)
-
-        for k, v in fin_inds_dict.items():
-            df = pd.DataFrame(columns=["fields", "values"])
-            for field, value in v:
-                df = df.append({
-                    "fields": field,
-                    "values": value
-                }, ignore_index=True)
+        self._save_statement("financial_indicators", fin_inds_dict)
+
+    def _save_statement(self, statement, report_dict, stored=()):
+        """ Merge crawled quarters, (quarter, year) -> [[field, value], ...], into the statement store """
+        quarter_frames = dict()
+        for k, v in report_dict.items():
+            if k in stored:
+                continue
+            df = pd.DataFrame(v, columns=["fields", "values"])
             df.set_index("fields", inplace=True)
-            df = df[~df.index.duplicated(keep='first')]
-            df.to_csv(os.path.join(financial_indicators_dir, f"{k[1]}-Q{k[0]}.csv"))
+            # a quarter which is not published yet has no value, it is requested again by the next crawl
+            if pd.to_numeric(df["values"], errors="coerce").isnull().all():
+                continue
+            quarter_frames[k] = df[~df.index.duplicated(keep='first')]
+        update_statement_store(self.symbol, statement, quarter_frames)
+
+        if len(quarter_frames) > 0 and catalog_exists():
+            store_df = read_statement_store(self.symbol, statement, migrate=False)
+            labels = [quarter_label(year, quarter) for quarter, year in quarter_frames]
+            record_artifacts(statement_entries(self.symbol, statement, store_path(self.symbol, statement), store_df,
+                                               quarters=labels, source=STATEMENT_SOURCES[statement]))
 
     def get_major_holders(self):
         ret_dict = get_major_holders(self.symbol)
@@ -139,7 +174,10 @@ class CrawlCompanyProfile:
                 "Reported": item.get("Reported")
             }, ignore_index=True)
 
-        df.to_csv(os.path.join(self.symbol_dir, "major_holders.csv"), index=False)
+        path = os.path.join(self.symbol_dir, "major_holders.csv")
+        df.to_csv(path, index=False)
+        record_artifacts([frame_entry(self.symbol, "major_holders", path, df, date_column=None,
+                                      source=MAJOR_HOLDERS_API)])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from tqdm import tqdm
+from finb.crawl import history, balance_sheet, income_statement, cashflow, events, major_holders
+from finb.crawl.company_profile import CrawlCompanyProfile
+from finb.crawl.planner import plan_price_crawls
+from finb.utils.catalog import catalog_exists, get_catalog
+from finb.utils.datahub import read_companies_df
+
+# dataset -> (CrawlCompanyProfile method, crawl module, name of the module's endpoint constant)
+DATASETS = OrderedDict([
+    ("price", ("get_price_history", history, "HISTORY_API")),
+    ("balance_sheet", ("get_balance_sheet", balance_sheet, "FINANCE_REPORTS_API")),
+    ("income_statement", ("get_income_statement", income_statement, "FINANCE_REPORTS_API")),
+    ("cashflow", ("get_cashflow", cashflow, "FINANCE_REPORTS_API")),
+    ("events", ("get_events", events, "EVENTS_API")),
+    ("major_holders", ("get_major_holders", major_holders, "MAJOR_HOLDERS_API")),
+])
+
+# maximum number of jobs in flight against one host
+HOST_LIMITS = {
+    "api.vietstock.vn": 8,
+    "www.bsc.com.vn": 4,
+    "finfo-api.vndirect.com.vn": 8,
+}
+DEFAULT_HOST_LIMIT = 4
+
+
+def dataset_host(dataset):
+    _, module, endpoint = DATASETS[dataset]
+    return urlparse(getattr(module, endpoint)).netloc
+
+
+class CrawlReport:
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.succeeded = OrderedDict()
+        self.failed = OrderedDict()
+        self.errors = []
+
+    @property
+    def elapsed(self):
+        end = self.finished if self.finished is not None else time.time()
+        return end - self.started
+
+    @property
+    def total(self):
+        return sum(self.succeeded.values()) + sum(self.failed.values())
+
+    @property
+    def throughput(self):
+        """ Finished jobs per second """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.total / self.elapsed
+
+    def add(self, symbol, dataset, error=None):
+        if error is None:
+            self.succeeded[dataset] = self.succeeded.get(dataset, 0) + 1
+        else:
+            self.failed[dataset] = self.failed.get(dataset, 0) + 1
+            self.errors.append((symbol, dataset, error))
+
+    def __str__(self):
+        lines = ["Crawled %d jobs in %.2fs (%.2f jobs/s)" % (self.total, self.elapsed, self.throughput)]
+        for dataset in DATASETS:
+            ok = self.succeeded.get(dataset, 0)
+            ko = self.failed.get(dataset, 0)
+            if ok or ko:
+                lines.append("  %-16s ok=%d failed=%d" % (dataset, ok, ko))
+        return "\n".join(lines)
+
+
+class CrawlEngine:
+    """ Run CrawlCompanyProfile jobs for many symbols concurrently.
+
+    Every (symbol, dataset) pair is one job. Jobs are scheduled on an asyncio loop and executed
+    by a thread pool, the number of jobs in flight against one host is bounded by `host_limits`.
+    Results are written by CrawlCompanyProfile to the usual market/company/<symbol>/ layout.
+    """
+    def __init__(self, symbols, datasets=None, host_limits=None, incremental=True, progress=True):
+        self.symbols = list(symbols)
+        self.datasets = list(DATASETS.keys()) if datasets is None else list(datasets)
+        for dataset in self.datasets:
+            if dataset not in DATASETS:
+                raise ValueError(f"Unknown dataset: {dataset}")
+
+        self.host_limits = dict(HOST_LIMITS)
+        if host_limits is not None:
+            self.host_limits.update(host_limits)
+        self.incremental = incremental
+        self.progress = progress
+
+    def _host_limit(self, host):
+        return self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+
+    def _crawl_job(self, symbol, dataset):
+        method = DATASETS[dataset][0]
+        kwargs = {}
+        if dataset == "price":
+            kwargs["incremental"] = self.incremental
+        getattr(CrawlCompanyProfile(symbol), method)(**kwargs)
+
+    async def _run_job(self, loop, executor, semaphore, symbol, dataset, report, pbar):
+        async with semaphore:
+            try:
+                await loop.run_in_executor(executor, self._crawl_job, symbol, dataset)
+                report.add(symbol, dataset)
+            except Exception as e:
+                report.add(symbol, dataset, error=str(e))
+        if pbar is not None:
+            pbar.update(1)
+
+    async def crawl(self) -> CrawlReport:
+        loop = asyncio.get_running_loop()
+        report = CrawlReport()
+
+        hosts = {dataset: dataset_host(dataset) for dataset in self.datasets}
+        semaphores = {host: asyncio.Semaphore(self._host_limit(host)) for host in set(hosts.values())}
+        max_workers = sum(self._host_limit(host) for host in semaphores)
+
+        pbar = None
+        if self.progress:
+            pbar = tqdm(total=len(self.symbols) * len(self.datasets))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            jobs = [
+                self._run_job(loop, executor, semaphores[hosts[dataset]], symbol, dataset, report, pbar)
+                for symbol in self.symbols for dataset in self.datasets
+            ]
+            await asyncio.gather(*jobs)
+
+        if pbar is not None:
+            pbar.close()
+        report.finished = time.time()
+        return report
+
+    def run(self) -> CrawlReport:
+        return asyncio.run(self.crawl())
+
+
+def crawl_universe(datasets=None, host_limits=None, progress=True, stale_only=False):
+    """ Crawl the given datasets for every listed symbol in market/companies.csv
+
+    :param stale_only: only the symbols whose prices are missing or stale in the catalog, when it has been built
+    :return: CrawlReport, nothing is printed
+    """
+    symbols = read_companies_df().index.tolist()
+    if stale_only and catalog_exists():
+        missing, stale = plan_price_crawls(symbols, get_catalog())
+        missing = set(missing)
+        symbols = [s for s in symbols if s in missing or s in stale]
+    engine = CrawlEngine(symbols, datasets=datasets, host_limits=host_limits, progress=progress)
+    return engine.run()
+
+
+if __name__ == "__main__":
+    print(crawl_universe())
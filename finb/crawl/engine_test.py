@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from finb.crawl import engine, transport, cache, history, balance_sheet, income_statement, cashflow, events, major_holders
+from finb.crawl.engine import CrawlEngine
+from finb.crawl.company_profile import CrawlCompanyProfile
+from finb.utils.statement_store import read_statement_store
+from finb.utils.catalog import Catalog
+from finb.utils.adjust import read_adjustments, update_adjustments
+from finb.utils.date import str_to_ts
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """ Serve minimal vietstock/BSC/VNDirect style responses """
+    in_flight = 0
+    max_in_flight = 0
+    requests_count = 0
+    history_params = []
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self, path, params):
+        symbol = (params.get("symbol") or params.get("symbols") or [""])[0]
+        if path == "/ta/history":
+            StandInHandler.history_params.append(params)
+            _from, to = int(params["from"][0]), int(params["to"][0])
+            ts = [t for t in range(1577923200, 1577923200 + 86400 * 5, 86400) if _from <= t <= to]
+            n = len(ts)
+            history_dict = {
+                "t": ts, "o": [10000.0] * n, "h": [11000.0] * n,
+                "l": [9000.0] * n, "c": [10500.0] * n, "v": [1000] * n
+            }
+            return json.dumps(json.dumps(history_dict))
+        if path == "/api/Data/Finance/LastestFinancialReports":
+            end = int(params["year"][0]) * 4 + int(params["quarter"][0]) - 1
+            count = int(params["count"][0])
+            values = [{"Quarter": i % 4 + 1, "Year": i // 4, "Value": i} for i in range(end - count + 1, end + 1)]
+            return json.dumps([
+                {"Name": "TỔNG CỘNG TÀI SẢN", "Values": values},
+                {"Name": "A. Nợ phải trả", "Values": values}
+            ])
+        if path == "/events":
+            return json.dumps({"data": [{
+                "type": "DIVIDEND", "typeDesc": "Cash dividend", "effectiveDate": "2020-06-01",
+                "disclosuredDate": "2020-05-01", "expiredDate": "2020-06-02",
+                "content": f"{symbol} pays dividend", "ratio": 0.1, "dividend": 1000
+            }]})
+        if path == "/api/Data/Companies/MajorHolders":
+            return json.dumps([{
+                "Name": "Nguyễn Văn A", "Position": "CEO", "Shares": 1000,
+                "Ownership": 0.1, "Reported": "2020-06-30"
+            }])
+        return None
+
+    def do_GET(self):
+        cls = StandInHandler
+        with cls.lock:
+            cls.in_flight += 1
+            cls.requests_count += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.005)
+            url = urlparse(self.path)
+            body = self._body(url.path, parse_qs(url.query))
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+class CrawlEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        StandInHandler.in_flight = 0
+        StandInHandler.max_in_flight = 0
+        StandInHandler.requests_count = 0
+        StandInHandler.history_params = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.host = "127.0.0.1:%d" % self.server.server_address[1]
+        base = "http://" + self.host
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(history, "HISTORY_API", base + "/ta/history"),
+            mock.patch.object(balance_sheet, "FINANCE_REPORTS_API", base + "/api/Data/Finance/LastestFinancialReports"),
+            mock.patch.object(income_statement, "FINANCE_REPORTS_API", base + "/api/Data/Finance/LastestFinancialReports"),
+            mock.patch.object(cashflow, "FINANCE_REPORTS_API", base + "/api/Data/Finance/LastestFinancialReports"),
+            mock.patch.object(events, "EVENTS_API", base + "/events"),
+            mock.patch.object(major_holders, "MAJOR_HOLDERS_API", base + "/api/Data/Companies/MajorHolders"),
+            mock.patch("finb.crawl.company_profile.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.statement_store.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.adjust.PROJECT_PATH", self.tmp_dir),
+            mock.patch.dict(transport.RATE_LIMITS, {s: (1000, 1000) for s in transport.RATE_LIMITS}),
+            mock.patch.object(cache, "_mode", "off"),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_crawl_writes_company_layout(self):
+        symbols = ["AAA", "BBB", "CCC"]
+        report = CrawlEngine(symbols, progress=False).run()
+
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.total, len(symbols) * len(engine.DATASETS))
+        self.assertGreater(report.throughput, 0)
+
+        for symbol in symbols:
+            symbol_dir = os.path.join(self.tmp_dir, "market/company", symbol)
+            self.assertTrue(os.path.exists(os.path.join(symbol_dir, "price.csv")))
+            self.assertIn("2020-Q1", read_statement_store(symbol, "balance_sheet").columns)
+            self.assertIn("2020-Q4", read_statement_store(symbol, "income_statement").columns)
+            self.assertIn("2019-Q2", read_statement_store(symbol, "cashflow").columns)
+            self.assertTrue(os.path.exists(os.path.join(symbol_dir, "events", "dividend.csv")))
+            self.assertTrue(os.path.exists(os.path.join(symbol_dir, "major_holders.csv")))
+
+    def test_crawl_records_catalog(self):
+        catalog_path = os.path.join(self.tmp_dir, "market/catalog.sqlite")
+        with mock.patch("finb.utils.catalog.PROJECT_PATH", self.tmp_dir), \
+                mock.patch("finb.utils.catalog.CATALOG_PATH", catalog_path):
+            catalog = Catalog(catalog_path)
+            report = CrawlEngine(["AAA"], progress=False).run()
+            self.assertEqual(report.errors, [])
+
+            price_df = pd.read_csv(os.path.join(self.tmp_dir, "market/company/AAA/price.csv"), index_col=0)
+            price = catalog.get("AAA", "price")
+            self.assertEqual(price["rows"], len(price_df))
+            self.assertEqual(price["last_date"], price_df.index[-1][:10])
+            self.assertIn("/ta/history", price["source"])
+            self.assertIn("2020-Q1", catalog.periods("balance_sheet", "AAA"))
+            self.assertIsNotNone(catalog.get("AAA", "events", "dividend"))
+            self.assertIsNotNone(catalog.get("AAA", "major_holders"))
+            self.assertEqual(catalog.verify(), [])
+
+    def test_host_limit_bounds_concurrency(self):
+        symbols = ["S%02d" % i for i in range(12)]
+        report = CrawlEngine(
+            symbols, datasets=["price", "events", "major_holders"],
+            host_limits={self.host: 2}, progress=False).run()
+
+        self.assertEqual(report.errors, [])
+        self.assertEqual(StandInHandler.requests_count, len(symbols) * 3)
+        self.assertLessEqual(StandInHandler.max_in_flight, 2)
+
+    def test_incremental_price_requests_missing_range(self):
+        crawler = CrawlCompanyProfile("AAA")
+        crawler.get_price_history()
+        price_path = os.path.join(self.tmp_dir, "market/company/AAA/price.csv")
+        full_df = pd.read_csv(price_path, index_col=0, parse_dates=True)
+        mtime = os.stat(price_path).st_mtime_ns
+
+        crawler.get_price_history(incremental=True)
+        incremental_df = pd.read_csv(price_path, index_col=0, parse_dates=True)
+
+        last_date = full_df.index[-1].strftime("%Y-%m-%d")
+        self.assertEqual(int(StandInHandler.history_params[-1]["from"][0]), int(str_to_ts(last_date)))
+        self.assertTrue(full_df.equals(incremental_df))
+        # no new bar, price.csv is not rewritten
+        self.assertEqual(os.stat(price_path).st_mtime_ns, mtime)
+        self.assertFalse(os.path.exists(price_path + ".tmp"))
+
+    def test_price_and_events_of_a_symbol_run_concurrently(self):
+        crawler = CrawlCompanyProfile("AAA")
+        crawler.get_events()
+        errors = []
+
+        def job(method, barrier):
+            barrier.wait()
+            try:
+                method()
+            except Exception as e:
+                errors.append(e)
+
+        for _ in range(15):
+            barrier = threading.Barrier(2)
+            threads = [threading.Thread(target=job, args=(method, barrier))
+                       for method in [crawler.get_price_history, crawler.get_events]]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(errors, [])
+        symbol_dir = os.path.join(self.tmp_dir, "market/company/AAA")
+        self.assertEqual([name for name in os.listdir(symbol_dir) + os.listdir(os.path.join(symbol_dir, "events"))
+                          if name.endswith(".tmp")], [])
+        pd.testing.assert_frame_equal(read_adjustments("AAA"), update_adjustments("AAA"))
+
+    def test_failures_are_isolated(self):
+        with mock.patch.object(events, "EVENTS_API", "http://" + self.host + "/missing"):
+            report = CrawlEngine(["AAA", "BBB"], datasets=["price", "events"], progress=False).run()
+
+        self.assertEqual(report.succeeded["price"], 2)
+        self.assertEqual(report.failed["events"], 2)
+        self.assertEqual(len(report.errors), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
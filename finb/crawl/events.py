@@ -1,5 +1,7 @@
-import requests
 import pandas as pd
+from finb.crawl import transport
+
+EVENTS_API = "https://finfo-api.vndirect.com.vn/events"
 
 
 def dividend_event(e):
@@ -106,10 +108,8 @@ _convert_dict = {
 }
 
 def get_company_events(symbol):
-    url = f"https://finfo-api.vndirect.com.vn/events?symbols={symbol}"
-    payload = {}
-    headers = {}
-    resp = requests.request("GET", url, headers=headers, data=payload)
+    url = f"{EVENTS_API}?symbols={symbol}"
+    resp = transport.request("vndirect", url)
 
     events = resp.json()["data"]
 
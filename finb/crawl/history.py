@@ -1,72 +1,88 @@
-import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import json
 import math
+from finb.crawl import transport
 
 HISTORY_API = "https://api.vietstock.vn/ta/history"
 
+# timestamps of the history api are shifted by the resolution of bars
+RESOLUTION_OFFSETS = {
+    "D": timedelta(hours=7),
+    "60": timedelta(hours=8),
+    "120": timedelta(hours=9)
+}
+
+# Vietnam does not observe daylight saving time
+VN_UTC_OFFSET = timedelta(hours=7)
+
+# prices of indices are not scaled to thousand VND
+INDEX_SYMBOLS = {"VNINDEX", "VN30"}
+
 
 def generate_payload(symbol, _from, to, resolution="D"):
     return (("symbol", symbol),("from", str(int(_from))),("to", str(int(to))),("resolution", resolution))
 
 
 def get_history_price(symbol, _from, to, resolution="D"):
-    headers = {
-      'Connection': 'keep-alive',
-      'Accept': '*/*',
-      'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/84.0.4147.105 Safari/537.36',
-      'Content-Type': 'text/plain',
-      'Origin': 'https://ta.vietstock.vn',
-      'Sec-Fetch-Site': 'same-site',
-      'Sec-Fetch-Mode': 'cors',
-      'Sec-Fetch-Dest': 'empty',
-      'Accept-Language': 'en-US,en;q=0.9'
-    }
     payload = generate_payload(symbol, _from, to, resolution="D")
-    r = requests.get(HISTORY_API, params=payload, headers=headers)
+    r = transport.request("vietstock", HISTORY_API, params=payload)
     
     history_dict = json.loads(json.loads(r.text))
 
-    if resolution == "D":
-        offset = timedelta(hours=7)
-    if resolution == "60":
-        offset = timedelta(hours=8)
-    if resolution == "120":
-        offset = timedelta(hours=9)
-
-    df = pd.DataFrame(columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
-
-    ts = history_dict['t']
-    os = history_dict['o']
-    hs = history_dict['h']
-    ls = history_dict['l']
-    cs = history_dict['c']
-    vs = history_dict['v']
-
-    for t,o,h,l,c,v in reversed(list(zip(ts, os, hs, ls, cs, vs))):
-        t = pd.Timestamp(datetime.fromtimestamp(t)-offset)
-        if symbol not in {"VNINDEX", "VN30"}:
-            o = round(o/1000, 2)
-            h = round(h/1000, 2)
-            l = round(l/1000, 2)
-            c = round(c/1000, 2)
-        else:
-            o = round(o, 2)
-            h = round(h, 2)
-            l = round(l, 2)
-            c = round(c, 2)
-
-        row = [t, o, h, l, c, v]
-        df.loc[-1] = row
-        df.index = df.index + 1
-        df = df.sort_index()
-    df = df.set_index('Date')
-    df['Volume'] = df['Volume'].astype(int)
+    return decode_history(history_dict, symbol, resolution=resolution)
+
+
+def decode_history(history_dict, symbol, resolution="D"):
+    """ Decode the t/o/h/l/c/v arrays of a history response into a price frame in one pass
+
+    :param history_dict: decoded json of the history api
+    :param symbol: stock symbol, prices of stocks are scaled to thousand VND, indices are kept
+    :param resolution: resolution of bars, used to shift the timestamps
+    :return: DataFrame indexed by Date with columns Open, High, Low, Close (float) and Volume (int)
+    """
+    offset = RESOLUTION_OFFSETS[resolution]
+
+    # no bars in the requested range
+    ts = np.asarray(history_dict.get('t', []), dtype=np.int64)
+
+    # same as datetime.fromtimestamp(t) - offset for every bar, taken in Vietnam local time
+    dates = pd.to_datetime(ts, unit="s") + VN_UTC_OFFSET - offset
+
+    scale = 1 if symbol in INDEX_SYMBOLS else 1000
+    df = pd.DataFrame({
+        'Open': np.round(np.asarray(history_dict.get('o', []), dtype=np.float64) / scale, 2),
+        'High': np.round(np.asarray(history_dict.get('h', []), dtype=np.float64) / scale, 2),
+        'Low': np.round(np.asarray(history_dict.get('l', []), dtype=np.float64) / scale, 2),
+        'Close': np.round(np.asarray(history_dict.get('c', []), dtype=np.float64) / scale, 2),
+        'Volume': np.asarray(history_dict.get('v', []), dtype=np.float64).astype(np.int64)
+    }, index=pd.DatetimeIndex(dates, name='Date'))
     return df
 
+def benchmark_decode(n_bars=3500, repeat=20):
+    """ Mean time in ms to decode a synthetic response of n_bars daily bars, about 14 years of prices """
+    import time
+    rng = np.random.RandomState(0)
+    close = 10000 + np.cumsum(rng.randn(n_bars) * 100)
+    history_dict = {
+        "t": (1199145600 + 86400 * np.arange(n_bars)).tolist(),
+        "o": close.tolist(), "h": (close + 200).tolist(), "l": (close - 200).tolist(), "c": close.tolist(),
+        "v": rng.randint(0, 1000000, n_bars).tolist()
+    }
+    decode_history(history_dict, "PNJ")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode_history(history_dict, "PNJ")
+    return (time.perf_counter() - start) / repeat * 1000
+
 from finb.utils.date import str_to_ts
 if __name__ == "__main__":
+    import sys
+    # python -m finb.crawl.history bench
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        print("[decode_history] 3500 bars decoded in %.2f ms" % benchmark_decode())
+        sys.exit(0)
 
     start_date = "2008-01-01"
 
@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from finb.crawl.history import decode_history
+from finb.utils.date import tz
+
+
+def local_time(t):
+    return datetime.fromtimestamp(t, tz).replace(tzinfo=None)
+
+
+def make_history_dict(n, start_ts=1199145600):
+    rng = np.random.RandomState(0)
+    close = 10000 + np.cumsum(rng.randn(n) * 100)
+    return {
+        "t": [start_ts + 86400 * i for i in range(n)],
+        "o": (close + rng.randn(n) * 10).tolist(),
+        "h": (close + 200).tolist(),
+        "l": (close - 200).tolist(),
+        "c": close.tolist(),
+        "v": rng.randint(0, 1000000, n).tolist()
+    }
+
+
+class DecodeHistoryTestCase(unittest.TestCase):
+    def test_decode_matches_row_by_row(self):
+        history_dict = make_history_dict(50)
+        df = decode_history(history_dict, "PNJ")
+
+        self.assertEqual(df.columns.tolist(), ['Open', 'High', 'Low', 'Close', 'Volume'])
+        self.assertEqual(df.index.name, 'Date')
+        self.assertEqual(df["Volume"].dtype, np.int64)
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+        for i, t in enumerate(history_dict["t"]):
+            self.assertEqual(df.index[i], pd.Timestamp(local_time(t) - timedelta(hours=7)))
+            self.assertAlmostEqual(df["Close"].iloc[i], round(history_dict["c"][i] / 1000, 2))
+            self.assertAlmostEqual(df["Open"].iloc[i], round(history_dict["o"][i] / 1000, 2))
+            self.assertEqual(df["Volume"].iloc[i], history_dict["v"][i])
+
+    def test_decode_index_is_not_scaled(self):
+        history_dict = make_history_dict(10)
+        df = decode_history(history_dict, "VNINDEX", resolution="60")
+
+        self.assertAlmostEqual(df["High"].iloc[3], round(history_dict["h"][3], 2))
+        self.assertEqual(df.index[0], pd.Timestamp(local_time(history_dict["t"][0]) - timedelta(hours=8)))
+
+    def test_decode_empty_response(self):
+        df = decode_history({"s": "no_data"}, "PNJ")
+
+        self.assertEqual(len(df), 0)
+        self.assertEqual(df.columns.tolist(), ['Open', 'High', 'Low', 'Close', 'Volume'])
+
+    def test_decode_full_history(self):
+        history_dict = make_history_dict(3500)
+        df = decode_history(history_dict, "PNJ")
+
+        self.assertEqual(len(df), 3500)
+        self.assertTrue(df.index.is_unique)
+        np.testing.assert_allclose(df["Close"].to_numpy(), np.round(np.array(history_dict["c"]) / 1000, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
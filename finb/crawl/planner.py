@@ -0,0 +1,111 @@
+import os
+import re
+from datetime import datetime
+from finb.utils.date import current_quarter_and_year, convert_quarter_to_end_date
+from finb.utils.trading_calendar import latest_closed_session
+
+# The BSC finance api returns `count` quarters ending at (year, quarter)
+MAX_QUARTERS_PER_REQUEST = 5
+
+_QUARTER_FILE_RE = re.compile(r"^(\d{4})-Q([1-4])\.csv$")
+
+
+def statement_year_range(from_year=None, to_year=None):
+    """ Default year range of statement crawls, to_year is exclusive """
+    _, cr_year = current_quarter_and_year()
+    if from_year is None:
+        from_year = cr_year - 15
+    if to_year is None:
+        to_year = cr_year + 1
+    return from_year, to_year
+
+
+def stored_quarters(statement_dir):
+    """ Quarters stored as {year}-Q{quarter}.csv in a statement directory
+
+    :return: set of (quarter, year)
+    """
+    ret = set()
+    if not os.path.exists(statement_dir):
+        return ret
+    for name in os.listdir(statement_dir):
+        m = _QUARTER_FILE_RE.match(name)
+        if m is not None:
+            ret.add((int(m.group(2)), int(m.group(1))))
+    return ret
+
+
+def plan_statement_requests(from_year=None, to_year=None, stored=(), max_count=MAX_QUARTERS_PER_REQUEST, now=None):
+    """ Plan the minimal list of api calls which fill the quarters missing from `stored`
+
+    Quarters which have not ended yet are never requested.
+
+    :param from_year: first year (inclusive)
+    :param to_year: last year (exclusive)
+    :param stored: quarters already on disk, iterable of (quarter, year)
+    :param max_count: maximum number of quarters returned by one call
+    :param now: reference time, default is datetime.now()
+    :return: list of (year, quarter, count), each call covers `count` quarters ending at (year, quarter)
+    """
+    from_year, to_year = statement_year_range(from_year, to_year)
+    if now is None:
+        now = datetime.now()
+    stored = set(stored)
+
+    # quarters are numbered year*4 + quarter-1 so that a call covers a contiguous range
+    missing = []
+    for year in range(from_year, to_year):
+        for quarter in range(1, 5):
+            if (quarter, year) in stored:
+                continue
+            if convert_quarter_to_end_date(year, quarter) >= now:
+                continue
+            missing.append(year * 4 + quarter - 1)
+    missing.sort(reverse=True)
+
+    # greedy from the latest missing quarter, optimal for windows of a fixed maximum length
+    plan = []
+    i = 0
+    while i < len(missing):
+        end = missing[i]
+        start = end
+        while i < len(missing) and missing[i] > end - max_count:
+            start = missing[i]
+            i += 1
+        plan.append((end // 4, end % 4 + 1, end - start + 1))
+    return plan
+
+
+def requested_quarters(year, quarter, count):
+    """ (quarter, year) of the `count` quarters ending at (year, quarter) """
+    end = year * 4 + quarter - 1
+    return {(q % 4 + 1, q // 4) for q in range(end - count + 1, end + 1)}
+
+
+def statement_response_complete(year, quarter, count):
+    """ Whether a response of the BSC finance api has values for every quarter of its call,
+    a response missing quarters which are not published yet must not be cached """
+    expected = requested_quarters(year, quarter, count)
+
+    def complete(response):
+        try:
+            data = response.json()
+        except ValueError:
+            return False
+        if not data:
+            return False
+        found = {(x["Quarter"], x["Year"]) for item in data for x in item["Values"] if x["Value"] is not None}
+        return expected <= found
+    return complete
+
+
+def plan_price_crawls(symbols, catalog, now=None):
+    """ Symbols whose prices are missing or lack the bar of the last closed session,
+    answered by the catalog without reading the price files
+
+    :param catalog: finb.utils.catalog.Catalog
+    :return: (missing symbols, dict stale symbol -> date of its last bar)
+    """
+    missing = catalog.missing(symbols, "price")
+    stale = catalog.stale("price", latest_closed_session(now), symbols=symbols)
+    return missing, stale
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from finb.crawl.planner import plan_statement_requests, stored_quarters, statement_response_complete
+
+
+def covered_quarters(plan):
+    ret = set()
+    for year, quarter, count in plan:
+        end = year * 4 + quarter - 1
+        for i in range(end - count + 1, end + 1):
+            ret.add((i % 4 + 1, i // 4))
+    return ret
+
+
+class PlannerTestCase(unittest.TestCase):
+    now = datetime(2020, 8, 15)
+
+    def test_plan_full_range(self):
+        plan = plan_statement_requests(2005, 2021, now=self.now)
+
+        wanted = {(q, y) for y in range(2005, 2020) for q in range(1, 5)} | {(1, 2020), (2, 2020)}
+        self.assertEqual(covered_quarters(plan), wanted)
+        # 62 quarters in calls of at most 5 quarters, the legacy loop made one call per year, 16 calls
+        self.assertEqual(len(plan), 13)
+        self.assertEqual(plan[0], (2020, 2, 5))
+
+    def test_plan_only_missing_quarters(self):
+        stored = {(q, y) for y in range(2005, 2020) for q in range(1, 5)} | {(1, 2020)}
+        plan = plan_statement_requests(2005, 2021, stored=stored, now=self.now)
+
+        self.assertEqual(plan, [(2020, 2, 1)])
+
+    def test_plan_gaps(self):
+        stored = {(q, y) for y in range(2015, 2020) for q in range(1, 5)}
+        stored -= {(3, 2017), (1, 2016)}
+        plan = plan_statement_requests(2015, 2020, stored=stored, now=self.now)
+
+        self.assertEqual(covered_quarters(plan) & {(3, 2017), (1, 2016)}, {(3, 2017), (1, 2016)})
+        self.assertEqual(plan, [(2017, 3, 1), (2016, 1, 1)])
+
+    def test_nothing_to_plan(self):
+        stored = {(q, 2019) for q in range(1, 5)}
+        self.assertEqual(plan_statement_requests(2019, 2020, stored=stored, now=self.now), [])
+        self.assertEqual(plan_statement_requests(2021, 2022, now=self.now), [])
+
+    def test_statement_response_complete(self):
+        complete = statement_response_complete(2020, 2, 2)
+        published = [{"Name": "x", "Values": [{"Quarter": 1, "Year": 2020, "Value": 1},
+                                              {"Quarter": 2, "Year": 2020, "Value": 2}]}]
+        pending = [{"Name": "x", "Values": [{"Quarter": 1, "Year": 2020, "Value": 1},
+                                            {"Quarter": 2, "Year": 2020, "Value": None}]}]
+        self.assertTrue(complete(mock.Mock(json=lambda: published)))
+        self.assertFalse(complete(mock.Mock(json=lambda: pending)))
+        self.assertFalse(complete(mock.Mock(json=lambda: None)))
+
+    def test_stored_quarters(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for name in ["2019-Q1.csv", "2019-Q4.csv", "notes.txt"]:
+                open(os.path.join(tmp_dir, name), "w").close()
+            self.assertEqual(stored_quarters(tmp_dir), {(1, 2019), (4, 2019)})
+            self.assertEqual(stored_quarters(os.path.join(tmp_dir, "missing")), set())
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,15 @@
 import os
 import pandas as pd
-import requests
 import json
 from finb import PROJECT_PATH
-from tqdm import tqdm
-from finb.crawl.company_profile import CrawlCompanyProfile
+from finb.crawl import transport
+from finb.crawl.snapshot_pool import SnapshotPool
 
 
 def get_all_stock_company(save_csv=None):
   url = "https://finfo-api.vndirect.com.vn/stocks?status=all"
 
-  stocks = requests.get(url).json()
+  stocks = transport.request("vndirect", url).json()
   df = pd.DataFrame(columns=['symbol', 'company', 'companyName', 'status', 'listedDate', 'delistedDate', 'floor', 'industryName'])
 
   i = 0
@@ -39,7 +38,7 @@ def get_all_stock_company(save_csv=None):
   return df
 
 
-def filter_companies_by_vol_and_mc():
+def filter_companies_by_vol_and_mc(n_workers=None):
   companies_csv = os.path.join(PROJECT_PATH, "market/companies.csv")
   if not os.path.exists(companies_csv):
     get_all_stock_company(companies_csv)
@@ -47,14 +46,7 @@ def filter_companies_by_vol_and_mc():
   companies_df.set_index("symbol", inplace=True)
   companies_df = companies_df[companies_df['delistedDate'].isnull()]
 
-  with tqdm(total=len(companies_df)) as pbar:
-    for symbol, r in companies_df.iterrows():
-      crawler = CrawlCompanyProfile(symbol)
-      try:
-        crawler.get_latest_snapshot()
-      except:
-        continue
-      pbar.update(1)
+  SnapshotPool(n_workers=n_workers).run(companies_df.index.tolist())
   filter_df = pd.DataFrame(columns=['symbol', 'Market_Capital', '10-day_Average_Volume'])
   for symbol, r in companies_df.iterrows():
     symbol_dir = os.path.join(PROJECT_PATH, "market/company", symbol)
@@ -2,10 +2,11 @@ from finb.crawl.web_driver import make_driver
 
 # https://stackoverflow.com/questions/17975471/selenium-with-scrapy-for-dynamic-page
 
-def get_company_snapshot(symbol):
+def get_company_snapshot(symbol, driver=None):
     url = f"http://ra.vcsc.com.vn/?lang=vi-VN&ticker={symbol}"
 
-    driver = make_driver()
+    if driver is None:
+        driver = make_driver()
     driver.get(url)
 
     snapshot_div = driver.find_element_by_id("FinancialOverview")
@@ -0,0 +1,176 @@
+import os
+import time
+import signal
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from tqdm import tqdm
+from finb.crawl.web_driver import new_driver
+from finb.crawl.company_profile import CrawlCompanyProfile
+
+
+def crawl_snapshot(symbol, driver):
+    """ Default job of SnapshotPool, scrape and save snapshot.json of a symbol """
+    return CrawlCompanyProfile(symbol).get_latest_snapshot(driver=driver)
+
+
+def _close_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _snapshot_worker(task_queue, conn, driver_factory, job, page_timeout, pages_per_driver):
+    # own process group, so that the browser processes die with the worker when it is killed
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    driver = None
+    pages = 0
+    while True:
+        symbol = task_queue.get()
+        if symbol is None:
+            break
+
+        conn.send(("start", symbol, None, None))
+        try:
+            if driver is None:
+                driver = driver_factory(page_timeout)
+                pages = 0
+            ret = job(symbol, driver)
+        except Exception as e:
+            conn.send(("done", symbol, None, str(e)))
+            # the browser may be broken after a crash or a page timeout, start a new one
+            if driver is not None:
+                _close_driver(driver)
+            driver = None
+            continue
+
+        conn.send(("done", symbol, ret, None))
+        pages += 1
+        if pages >= pages_per_driver:
+            _close_driver(driver)
+            driver = None
+
+    if driver is not None:
+        _close_driver(driver)
+    conn.close()
+
+
+class SnapshotPool:
+    """ Scrape snapshots with N browsers living in separate processes
+
+    Symbols are dispatched through a work queue. Every worker owns one driver, the driver is
+    recycled after `pages_per_driver` pages or when a page fails. A worker which does not finish
+    a page within `hard_timeout` seconds is killed together with its browser and replaced.
+    """
+    def __init__(self, n_workers=None, pages_per_driver=50, page_timeout=30, hard_timeout=None,
+                 driver_factory=new_driver, job=crawl_snapshot):
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.pages_per_driver = pages_per_driver
+        self.page_timeout = page_timeout
+        self.hard_timeout = 3 * page_timeout if hard_timeout is None else hard_timeout
+        self.driver_factory = driver_factory
+        self.job = job
+
+    def _spawn(self, task_queue):
+        # a pipe per worker, messages sent before a worker dies are never lost
+        reader, writer = mp.Pipe(duplex=False)
+        p = mp.Process(
+            target=_snapshot_worker,
+            args=(task_queue, writer, self.driver_factory, self.job, self.page_timeout, self.pages_per_driver),
+            daemon=True)
+        p.start()
+        writer.close()
+        return p, reader
+
+    @staticmethod
+    def _kill(p):
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        p.terminate()
+        p.join()
+
+    def run(self, symbols, progress=True):
+        """ Run the job for every symbol
+
+        :return: (dict symbol -> job result, dict symbol -> error message)
+        """
+        symbols = list(symbols)
+        results = dict()
+        errors = dict()
+        if len(symbols) == 0:
+            return results, errors
+
+        task_queue = mp.Queue()
+        for symbol in symbols:
+            task_queue.put(symbol)
+        n_workers = max(1, min(self.n_workers, len(symbols)))
+        for _ in range(n_workers):
+            task_queue.put(None)
+
+        workers = {i: self._spawn(task_queue) for i in range(n_workers)}
+        in_flight = dict()
+        pending = set(symbols)
+        pbar = tqdm(total=len(pending)) if progress else None
+
+        def finish(symbol, ret, err):
+            if symbol not in pending:
+                return
+            pending.discard(symbol)
+            if err is None:
+                results[symbol] = ret
+            else:
+                errors[symbol] = err
+            if pbar is not None:
+                pbar.update(1)
+
+        while len(pending) > 0:
+            readers = {reader: worker_id for worker_id, (_, reader) in workers.items() if not reader.closed}
+            if len(readers) == 0:
+                break
+
+            for reader in wait(list(readers.keys()), timeout=0.2):
+                worker_id = readers[reader]
+                try:
+                    kind, symbol, ret, err = reader.recv()
+                except EOFError:
+                    # the worker is gone, the watchdog below decides whether to replace it
+                    reader.close()
+                    workers[worker_id][0].join()
+                    continue
+                if kind == "start":
+                    in_flight[worker_id] = (symbol, time.time())
+                else:
+                    in_flight.pop(worker_id, None)
+                    finish(symbol, ret, err)
+
+            # watchdog, replace hanging or crashed workers
+            now = time.time()
+            for worker_id, (p, reader) in list(workers.items()):
+                task = in_flight.get(worker_id)
+                if task is not None and now - task[1] > self.hard_timeout:
+                    self._kill(p)
+                    finish(task[0], None, "page did not finish in %ds" % self.hard_timeout)
+                elif reader.closed and p.exitcode is not None and p.exitcode != 0:
+                    if task is not None:
+                        finish(task[0], None, "worker exited with code %s" % p.exitcode)
+                else:
+                    continue
+                reader.close()
+                in_flight.pop(worker_id, None)
+                workers[worker_id] = self._spawn(task_queue)
+
+        for symbol in list(pending):
+            finish(symbol, None, "not processed")
+        for p, reader in workers.values():
+            p.join(timeout=self.hard_timeout)
+            if p.is_alive():
+                self._kill(p)
+            reader.close()
+        if pbar is not None:
+            pbar.close()
+        return results, errors
@@ -0,0 +1,63 @@
+import os
+import time
+import itertools
+import unittest
+from finb.crawl.snapshot_pool import SnapshotPool
+
+_serials = itertools.count(1)
+
+
+class FakeDriver:
+    def __init__(self, page_timeout):
+        self.serial = next(_serials)
+        self.page_timeout = page_timeout
+
+    def quit(self):
+        pass
+
+
+def fake_job(symbol, driver):
+    if symbol == "CRASH":
+        raise RuntimeError("page crashed")
+    if symbol == "HANG":
+        time.sleep(60)
+    if symbol == "EXIT":
+        os._exit(3)
+    return {"symbol": symbol, "driver": (os.getpid(), driver.serial)}
+
+
+class SnapshotPoolTestCase(unittest.TestCase):
+    def test_dispatch_to_workers(self):
+        symbols = ["S%02d" % i for i in range(20)]
+        results, errors = SnapshotPool(
+            n_workers=3, driver_factory=FakeDriver, job=fake_job).run(symbols, progress=False)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(results.keys()), symbols)
+        self.assertLessEqual(len({r["driver"][0] for r in results.values()}), 3)
+
+    def test_driver_recycling(self):
+        symbols = ["A", "B", "CRASH", "C", "D", "E"]
+        results, errors = SnapshotPool(
+            n_workers=1, pages_per_driver=2, driver_factory=FakeDriver, job=fake_job).run(symbols, progress=False)
+
+        self.assertEqual(list(errors.keys()), ["CRASH"])
+        drivers = [results[s]["driver"] for s in ["A", "B", "C", "D", "E"]]
+        # A, B share a driver, the crash recycles the third one, then C, D share and E gets a new one
+        self.assertEqual(drivers[0], drivers[1])
+        self.assertNotEqual(drivers[1], drivers[2])
+        self.assertEqual(drivers[2], drivers[3])
+        self.assertNotEqual(drivers[3], drivers[4])
+
+    def test_hanging_and_dead_workers_are_replaced(self):
+        symbols = ["A", "HANG", "B", "EXIT", "C", "D"]
+        results, errors = SnapshotPool(
+            n_workers=2, page_timeout=0.5, hard_timeout=1, driver_factory=FakeDriver, job=fake_job).run(
+            symbols, progress=False)
+
+        self.assertEqual(sorted(errors.keys()), ["EXIT", "HANG"])
+        self.assertEqual(sorted(results.keys()), ["A", "B", "C", "D"])
+
+
+if __name__ == '__main__':
+    unittest.main()
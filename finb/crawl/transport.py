@@ -0,0 +1,178 @@
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
+from finb.crawl import cache
+
+# Shared transport of finb.crawl: one pooled session, rate limits per source, retries and timeouts
+
+requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/84.0.4147.135 Safari/537.36'
+
+BSC_COOKIE = 'ASP.NET_SessionId=dsfabbnc0t4pyk5f4xwjhuin; _fbp=fb.2.1600532504137.710301496; _ga=GA1.3.1235247621.1600532505; _gid=GA1.3.1484322541.1600532505; _culture=vi-VN; NSC_XfcTfswfs_443=ffffffff091da14945525d5f4f58455e445a4a42378b; _gat=1; TawkConnectionTime=0; NSC_XfcTfswfs_443=ffffffff091da14945525d5f4f58455e445a4a42378b'
+
+SOURCES = {
+    "vietstock": {
+        "headers": {
+            'Connection': 'keep-alive',
+            'Accept': '*/*',
+            'User-Agent': USER_AGENT,
+            'Content-Type': 'text/plain',
+            'Origin': 'https://ta.vietstock.vn',
+            'Sec-Fetch-Site': 'same-site',
+            'Sec-Fetch-Mode': 'cors',
+            'Sec-Fetch-Dest': 'empty',
+            'Accept-Language': 'en-US,en;q=0.9'
+        },
+        "verify": True
+    },
+    "bsc": {
+        "headers": {
+            'Connection': 'keep-alive',
+            'Accept': 'application/json, text/plain, */*',
+            'User-Agent': USER_AGENT,
+            'Sec-Fetch-Site': 'same-origin',
+            'Sec-Fetch-Mode': 'cors',
+            'Sec-Fetch-Dest': 'empty',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Cookie': BSC_COOKIE
+        },
+        "verify": False
+    },
+    "mbs": {
+        "headers": {
+            'Connection': 'keep-alive',
+            'Accept': '*/*',
+            'User-Agent': USER_AGENT,
+            'Origin': 'http://dulieu.mbs.com.vn',
+            'Accept-Language': 'en-US,en;q=0.9'
+        },
+        "verify": True
+    },
+    "vndirect": {
+        "headers": {},
+        "verify": True
+    }
+}
+
+# source -> (requests per second, burst)
+RATE_LIMITS = {
+    "vietstock": (10, 20),
+    "bsc": (5, 10),
+    "mbs": (5, 10),
+    "vndirect": (10, 20)
+}
+
+# seconds, (connect, read)
+TIMEOUT = (10, 60)
+
+MAX_RETRIES = 4
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# connections kept alive per host
+POOL_MAXSIZE = 32
+
+
+class TokenBucket:
+    """ Thread safe token bucket, `rate` tokens are added per second up to `burst` """
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_lock = threading.Lock()
+_session = None
+_buckets = dict()
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(SOURCES) * 2, pool_maxsize=POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def _bucket(source):
+    rate, burst = RATE_LIMITS[source]
+    with _lock:
+        bucket = _buckets.get(source)
+        if bucket is None or bucket.rate != rate or bucket.burst != burst:
+            bucket = TokenBucket(rate, burst)
+            _buckets[source] = bucket
+    return bucket
+
+
+def backoff_delay(attempt, response=None):
+    """ Exponential backoff with full jitter, Retry-After of the response is respected """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            return min(BACKOFF_MAX, int(retry_after))
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(source, url, method="GET", params=None, headers=None, timeout=TIMEOUT, cacheable=None,
+            **kwargs) -> requests.Response:
+    """ Send a request to one of SOURCES
+
+    :param source: key of SOURCES, selects default headers and the rate limit
+    :param headers: headers updating the default headers of the source
+    :param cacheable: see finb.crawl.cache.cached_request
+    :return: response with a successful status, HTTPError is raised otherwise.
+        Responses may come from finb.crawl.cache depending on its mode
+    """
+    return cache.cached_request(
+        source, method, url,
+        lambda: _send(source, url, method, params, headers, timeout, **kwargs),
+        params=params, data=kwargs.get("data"), json_body=kwargs.get("json"), cacheable=cacheable)
+
+
+def _send(source, url, method, params, headers, timeout, **kwargs):
+    config = SOURCES[source]
+    req_headers = dict(config["headers"])
+    if headers is not None:
+        req_headers.update(headers)
+
+    for attempt in range(MAX_RETRIES + 1):
+        _bucket(source).acquire()
+        try:
+            response = get_session().request(
+                method, url, params=params, headers=req_headers, timeout=timeout,
+                verify=config["verify"], **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if response.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+            time.sleep(backoff_delay(attempt, response))
+            continue
+
+        response.raise_for_status()
+        return response
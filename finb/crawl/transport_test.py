@@ -0,0 +1,94 @@
+import time
+import threading
+import unittest
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from finb.crawl import transport, cache
+from finb.crawl.transport import TokenBucket
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """ Fail with `status` for the first `failures` requests """
+    failures = 0
+    status = 503
+    count = 0
+    seen_headers = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        cls = FlakyHandler
+        cls.count += 1
+        cls.seen_headers = dict(self.headers)
+        if cls.count <= cls.failures:
+            self.send_response(cls.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TransportTestCase(unittest.TestCase):
+    def setUp(self):
+        FlakyHandler.count = 0
+        FlakyHandler.failures = 0
+        FlakyHandler.status = 503
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/api" % self.server.server_address[1]
+        self.patches = [
+            mock.patch.object(transport, "BACKOFF_BASE", 0.01),
+            mock.patch.dict(transport.RATE_LIMITS, {s: (1000, 1000) for s in transport.RATE_LIMITS}),
+            mock.patch.object(cache, "_mode", "off"),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_until_success(self):
+        FlakyHandler.failures = 2
+        response = transport.request("bsc", self.url, headers={"Referer": "https://www.bsc.com.vn/"})
+
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(FlakyHandler.count, 3)
+        self.assertEqual(FlakyHandler.seen_headers["Referer"], "https://www.bsc.com.vn/")
+        self.assertEqual(FlakyHandler.seen_headers["Cookie"], transport.BSC_COOKIE)
+
+    def test_give_up_after_max_retries(self):
+        FlakyHandler.failures = 100
+        with self.assertRaises(requests.HTTPError):
+            transport.request("vndirect", self.url)
+        self.assertEqual(FlakyHandler.count, transport.MAX_RETRIES + 1)
+
+    def test_client_errors_are_not_retried(self):
+        FlakyHandler.failures = 1
+        FlakyHandler.status = 404
+        with self.assertRaises(requests.HTTPError):
+            transport.request("vndirect", self.url)
+        self.assertEqual(FlakyHandler.count, 1)
+
+    def test_token_bucket_rate(self):
+        bucket = TokenBucket(rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        # 5 tokens of burst, then 10 tokens at 50 per second
+        self.assertGreaterEqual(elapsed, 0.18)
+        self.assertLess(elapsed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,26 +8,38 @@ chrome_driver_path = os.path.join(PROJECT_PATH, "chromedriver")
 
 gdriver = None
 
+
+def new_driver(page_timeout=None):
+    """ Create a headless Chrome driver which is not shared with other callers
+
+    :param page_timeout: seconds to wait for a page load before raising TimeoutException
+    """
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument("--disable-notifications")
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--verbose')
+    chrome_options.add_experimental_option("prefs", {
+        "download.default_directory": os.path.join(PROJECT_PATH, "tmp"),
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing_for_trusted_sources_enabled": False,
+        "safebrowsing.enabled": False
+    })
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-software-rasterizer')
+    driver = webdriver.Chrome(
+        executable_path=chrome_driver_path, options=chrome_options
+    )
+    if page_timeout is not None:
+        driver.set_page_load_timeout(page_timeout)
+    return driver
+
+
 def make_driver():
     global gdriver
     if gdriver is None:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument("--disable-notifications")
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--verbose')
-        chrome_options.add_experimental_option("prefs", {
-            "download.default_directory": os.path.join(PROJECT_PATH, "tmp"),
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing_for_trusted_sources_enabled": False,
-            "safebrowsing.enabled": False
-        })
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-software-rasterizer')
-        gdriver = webdriver.Chrome(
-            executable_path=chrome_driver_path, options=chrome_options
-        )
+        gdriver = new_driver()
     return gdriver
 
 def close_driver():
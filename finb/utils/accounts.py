@@ -0,0 +1,273 @@
+import re
+import zlib
+import unicodedata
+import numpy as np
+import pandas as pd
+from finb.utils.vn_lang import VN_COMBINE_ACCENT_REPLACE
+
+# Chart of accounts of the statements, every row label maps to an integer id
+#   id = statement base * ID_SPAN + n
+#   n < HASHED_START for the accounts of ACCOUNTS, which also have a short code
+#   n >= HASHED_START for other labels, taken from the crc32 of the normalized label so that the id
+#   of a label is the same for every company and every process without a shared registry.
+#   Labels of one statement whose hashes collide get the next free ids, see account_ids, a store keeps
+#   the labels of these rows so that its ids are always resolved from its own labels.
+# Labels are matched after normalize_label and case folding, VARIANTS maps the other spellings of BSC
+# and MBS to the label of the table. Only ACCOUNTS have a short code, they cover the standard lines of
+# the VAS statements as BSC labels them, the MBS indicators are not tabled yet.
+
+ID_SPAN = 10 ** 8
+HASHED_START = 10 ** 6
+
+STATEMENT_BASES = {
+    "balance_sheet": 1,
+    "income_statement": 2,
+    "cashflow": 3,
+    "financial_indicators": 4
+}
+
+# statement -> [(n, code, label)], never renumber an account
+ACCOUNTS = {
+    "balance_sheet": [
+        (1, "assets_header", "TÀI SẢN"),
+        (2, "current_assets", "A. Tài sản lưu động và đầu tư ngắn hạn"),
+        (3, "cash", "I. Tiền và các khoản tương đương tiền"),
+        (4, "short_term_investments", "II. Các khoản đầu tư tài chính ngắn hạn"),
+        (5, "short_term_receivables", "III. Các khoản phải thu ngắn hạn"),
+        (6, "inventories", "IV. Tổng hàng tồn kho"),
+        (7, "long_term_receivables", "I. Các khoản phải thu dài hạn"),
+        (8, "fixed_assets", "II. Tài sản cố định"),
+        (9, "long_term_work_in_progress", "1. Chi phí sản xuất, kinh doanh dở dang dài hạn"),
+        (10, "construction_in_progress", "2. chi phí xây dựng cơ bản dở dang"),
+        (11, "long_term_prepaid_expenses", "1. Chi phí trả trước dài hạn"),
+        (12, "goodwill", "VII. Lợi thế thương mại"),
+        (13, "total_assets", "TỔNG CỘNG TÀI SẢN"),
+        (14, "capital_header", "NGUỒN VỐN"),
+        (15, "liabilities", "A. Nợ phải trả"),
+        (16, "trade_payables", "3. Phải trả người bán ngắn hạn"),
+        (17, "advances_from_customers", "4. Người mua trả tiền trước"),
+        (18, "payables_to_employees", "6. Phải trả người lao động"),
+        (19, "accrued_expenses", "7. Chi phí phải trả ngắn hạn"),
+        (20, "unearned_revenue", "10. Doanh thu chưa thực hiện ngắn hạn"),
+        (21, "other_payables", "11. Phải trả ngắn hạn khác"),
+        (22, "short_term_borrowings", "1. Vay và nợ thuê tài chính ngắn hạn"),
+        (23, "owner_capital", "1. Vốn đầu tư của chủ sở hữu"),
+        (24, "total_capital", "TỔNG CỘNG NGUỒN VỐN"),
+        (25, "cash_on_hand", "1. Tiền"),
+        (26, "cash_equivalents", "2. Các khoản tương đương tiền"),
+        (27, "receivables_from_customers", "1. Phải thu ngắn hạn của khách hàng"),
+        (28, "prepayments_to_suppliers", "2. Trả trước cho người bán ngắn hạn"),
+        (29, "other_current_assets", "V. Tài sản ngắn hạn khác"),
+        (30, "non_current_assets", "B. Tài sản cố định và đầu tư dài hạn"),
+        (31, "investment_property", "III. Bất động sản đầu tư"),
+        (32, "long_term_assets_in_progress", "IV. Tài sản dở dang dài hạn"),
+        (33, "long_term_investments", "V. Đầu tư tài chính dài hạn"),
+        (34, "other_long_term_assets", "VI. Tài sản dài hạn khác"),
+        (35, "current_liabilities", "I. Nợ ngắn hạn"),
+        (36, "long_term_liabilities", "II. Nợ dài hạn"),
+        (37, "taxes_payable", "5. Thuế và các khoản phải nộp Nhà nước"),
+        (38, "long_term_borrowings", "8. Vay và nợ thuê tài chính dài hạn"),
+        (39, "equity", "B. Nguồn vốn chủ sở hữu"),
+        (40, "owner_equity", "I. Vốn chủ sở hữu"),
+        (41, "share_premium", "2. Thặng dư vốn cổ phần"),
+        (42, "treasury_shares", "5. Cổ phiếu quỹ"),
+        (43, "retained_earnings", "11. Lợi nhuận sau thuế chưa phân phối"),
+        (44, "non_controlling_interests", "C. Lợi ích của cổ đông thiểu số"),
+    ],
+    "income_statement": [
+        (1, "total_revenue", "1. Tổng doanh thu hoạt động kinh doanh"),
+        (2, "revenue_deductions", "2. Các khoản giảm trừ doanh thu"),
+        (3, "net_revenue", "3. Doanh thu thuần (1)-(2)"),
+        (4, "cogs", "4. Giá vốn hàng bán"),
+        (5, "gross_profit", "5. Lợi nhuận gộp (3)-(4)"),
+        (6, "selling_expenses", "9. Chi phí bán hàng"),
+        (7, "admin_expenses", "10. Chi phí quản lý doanh nghiệp"),
+        (8, "pretax_profit", "15. Tổng lợi nhuận kế toán trước thuế (11)+(14)"),
+        (9, "interest_expense", "-Trong đó: Chi phí lãi vay"),
+        (10, "net_income", "19. Lợi nhuận sau thuế thu nhập doanh nghiệp (15)-(18)"),
+        (11, "parent_net_income", "21. Lợi nhuận sau thuế của cổ đông của công ty mẹ (19)-(20)"),
+        (12, "financial_income", "6. Doanh thu hoạt động tài chính"),
+        (13, "financial_expenses", "7. Chi phí tài chính"),
+        (14, "share_of_associates", "8. Phần lãi lỗ hoặc lỗ trong công ty liên doanh, liên kết"),
+        (15, "operating_profit", "11. Lợi nhuận thuần từ hoạt động kinh doanh"),
+        (16, "other_income", "12. Thu nhập khác"),
+        (17, "other_expenses", "13. Chi phí khác"),
+        (18, "other_profit", "14. Lợi nhuận khác (12)-(13)"),
+        (19, "current_income_tax", "16. Chi phí thuế TNDN hiện hành"),
+        (20, "deferred_income_tax", "17. Chi phí thuế TNDN hoãn lại"),
+        (21, "income_tax", "18. Chi phí thuế TNDN (16)+(17)"),
+        (22, "minority_interest", "20. Lợi ích của cổ đông thiểu số"),
+        (23, "basic_eps", "22. Lãi cơ bản trên cổ phiếu"),
+    ],
+    "cashflow": [
+        (1, "cfo", "Lưu chuyển tiền thuần từ hoạt động kinh doanh"),
+        (2, "depreciation", "- Khấu hao TSCĐ"),
+        (3, "cf_interest_expense", "- Chi phí lãi vay"),
+        (4, "operating_profit_before_working_capital",
+         "3. Lợi nhuận từ hoạt động kinh doanh trước thay đổi vốn lưu động"),
+        (5, "change_in_receivables", "- Tăng, giảm các khoản phải thu"),
+        (6, "change_in_inventories", "- Tăng, giảm hàng tồn kho"),
+        (7, "change_in_payables",
+         "- Tăng, giảm các khoản phải trả (Không kể lãi vay phải trả, thuế thu nhập doanh nghiệp phải nộp)"),
+        (8, "change_in_prepaid_expenses", "- Tăng giảm chi phí trả trước"),
+        (9, "change_in_other_current_assets", "- Tăng giảm tài sản ngắn hạn khác"),
+        (10, "interest_paid", "- Tiền lãi vay phải trả"),
+        (11, "income_tax_paid", "- Thuế thu nhập doanh nghiệp đã nộp"),
+        (12, "other_operating_receipts", "- Tiền thu khác từ hoạt động kinh doanh"),
+        (13, "other_operating_payments", "- Tiền chi khác từ hoạt động kinh doanh"),
+        (14, "capex", "1. Tiền chi để mua sắm, xây dựng TSCĐ và các tài sản dài hạn khác"),
+        (15, "asset_disposals", "2. Tiền thu từ thanh lý, nhượng bán TSCĐ và các tài sản dài hạn khác"),
+        (16, "investments_in_associates", "5. Đầu tư góp vốn vào công ty liên doanh liên kết"),
+        (17, "short_term_investment_payments", "6. Chi đầu tư ngắn hạn"),
+        (18, "investments_in_other_entities", "7. Tiền chi đầu tư góp vốn vào đơn vị khác"),
+        (19, "share_issues", "1. Tiền thu từ phát hành cổ phiếu, nhận vốn góp của chủ sở hữu"),
+        (20, "share_buybacks",
+         "2. Tiền chi trả vốn góp cho các chủ sở hữu, mua lại cổ phiếu của doanh nghiệp đã phát hành"),
+        (21, "borrowings_received", "3. Tiền vay ngắn hạn, dài hạn nhận được"),
+        (22, "loan_repayments", "4. Tiền chi trả nợ gốc vay"),
+        (23, "lease_repayments", "5. Tiền chi trả nợ thuê tài chính"),
+        (24, "dividends_paid", "8. Cổ tức, lợi nhuận đã trả cho chủ sở hữu"),
+        (25, "profit_before_tax", "1. Lợi nhuận trước thuế"),
+        (26, "cf_adjustments", "2. Điều chỉnh cho các khoản"),
+        (27, "provisions", "- Các khoản dự phòng"),
+        (28, "unrealized_fx", "- Lãi, lỗ chênh lệch tỷ giá hối đoái chưa thực hiện"),
+        (29, "investment_gains", "- Lãi, lỗ từ hoạt động đầu tư"),
+        (30, "loans_granted", "3. Tiền chi cho vay, mua các công cụ nợ của đơn vị khác"),
+        (31, "loans_collected", "4. Tiền thu hồi cho vay, bán lại các công cụ nợ của đơn vị khác"),
+        (32, "interest_and_dividends_received", "7. Tiền thu lãi cho vay, cổ tức và lợi nhuận được chia"),
+        (33, "cfi", "Lưu chuyển tiền thuần từ hoạt động đầu tư"),
+        (34, "cff", "Lưu chuyển tiền thuần từ hoạt động tài chính"),
+        (35, "net_cash_flow", "Lưu chuyển tiền thuần trong kỳ"),
+        (36, "cash_beginning", "Tiền và tương đương tiền đầu kỳ"),
+        (37, "cash_ending", "Tiền và tương đương tiền cuối kỳ"),
+    ],
+    "financial_indicators": [],
+}
+
+# statement -> {other spelling: label of ACCOUNTS}
+VARIANTS = {
+    "balance_sheet": {
+        "IV. Hàng tồn kho": "IV. Tổng hàng tồn kho",
+    },
+    "income_statement": {
+        "- Trong đó: Chi phí lãi vay": "-Trong đó: Chi phí lãi vay",
+    },
+    "cashflow": {
+        "- Khấu hao tài sản cố định": "- Khấu hao TSCĐ",
+    },
+    "financial_indicators": {},
+}
+
+# typos of the MBS labels
+_TYPOS = {
+    "ngoại tệchưa": "ngoại tệ chưa",
+    "hoat động": "hoạt động",
+}
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_label(label):
+    """ Label as stored, precomposed accents, typos fixed and spaces collapsed """
+    label = str(label)
+    for k, v in VN_COMBINE_ACCENT_REPLACE.items():
+        label = label.replace(k, v)
+    label = unicodedata.normalize("NFC", label)
+    for k, v in _TYPOS.items():
+        label = label.replace(k, v)
+    return _SPACES.sub(" ", label).strip()
+
+
+def _key(label):
+    return normalize_label(label).casefold()
+
+
+def _build():
+    by_key = dict()
+    labels = dict()
+    codes = dict()
+    for statement, accounts in ACCOUNTS.items():
+        base = STATEMENT_BASES[statement] * ID_SPAN
+        by_key[statement] = dict()
+        for n, code, label in accounts:
+            account = base + n
+            if code in codes:
+                raise ValueError(f"duplicated account code {code}")
+            codes[code] = account
+            labels[account] = (code, label)
+            by_key[statement][_key(label)] = account
+        for variant, label in VARIANTS[statement].items():
+            by_key[statement][_key(variant)] = by_key[statement][_key(label)]
+    return by_key, labels, codes
+
+
+# code -> id of the accounts of the table, e.g. ACCOUNT["total_assets"]
+_BY_KEY, _LABELS, ACCOUNT = _build()
+
+
+def _hashed_id(statement, key, probe=0):
+    n = HASHED_START + (zlib.crc32(key.encode("utf-8")) + probe) % (ID_SPAN - HASHED_START)
+    return STATEMENT_BASES[statement] * ID_SPAN + n
+
+
+def account_id(statement, label) -> int:
+    """ Id of a row label of a statement, the id of a label outside the table is its hashed id,
+    use account_ids for the rows of a statement """
+    key = _key(label)
+    account = _BY_KEY[statement].get(key)
+    if account is None:
+        account = _hashed_id(statement, key)
+    return account
+
+
+def account_ids(statement, labels) -> np.ndarray:
+    """ int64 ids of the rows of a statement, distinct labels always get distinct ids.
+    Labels outside the table whose hashed ids collide are given the next free ids in the order of their keys.
+    """
+    keys = [_key(label) for label in labels]
+    ids = [_BY_KEY[statement].get(key) for key in keys]
+    hashed = dict()
+    for i, key in enumerate(keys):
+        if ids[i] is None:
+            hashed.setdefault(_hashed_id(statement, key), set()).add(key)
+    resolved = dict()
+    taken = set(hashed)
+    for account, colliding in hashed.items():
+        colliding = sorted(colliding)
+        resolved[colliding[0]] = account
+        for key in colliding[1:]:
+            probe = 1
+            while _hashed_id(statement, key, probe) in taken:
+                probe += 1
+            resolved[key] = _hashed_id(statement, key, probe)
+            taken.add(resolved[key])
+    return np.array([resolved[key] if account is None else account for key, account in zip(keys, ids)],
+                    dtype=np.int64)
+
+
+def is_listed(account):
+    """ Whether an id belongs to an account of the table """
+    return int(account) in _LABELS
+
+
+def account_code(account):
+    """ Short code of an id, None for a label outside the table """
+    ret = _LABELS.get(int(account))
+    return None if ret is None else ret[0]
+
+
+def account_label(account):
+    """ Label of an id of the table """
+    return _LABELS[int(account)][1]
+
+
+def account_statement(account):
+    base = int(account) // ID_SPAN
+    return next(s for s, b in STATEMENT_BASES.items() if b == base)
+
+
+def account_key(index, code):
+    """ Row key of an account in a statement frame indexed either by ids or by labels """
+    if pd.api.types.is_integer_dtype(index):
+        return ACCOUNT[code]
+    return account_label(ACCOUNT[code])
@@ -0,0 +1,50 @@
+import unittest
+import unicodedata
+import pandas as pd
+from finb.utils.accounts import ACCOUNT, ACCOUNTS, ID_SPAN, HASHED_START, normalize_label, account_id, \
+    account_ids, account_code, account_label, account_statement, account_key, is_listed
+
+
+class AccountsTestCase(unittest.TestCase):
+    def test_normalize_label(self):
+        decomposed = unicodedata.normalize("NFD", "I. Tiền và các khoản tương đương tiền")
+        self.assertEqual(normalize_label(" " + decomposed + "  "), "I. Tiền và các khoản tương đương tiền")
+        self.assertEqual(normalize_label("Lưu chuyển tiền từ hoat động  kinh doanh"),
+                         "Lưu chuyển tiền từ hoạt động kinh doanh")
+
+    def test_listed_accounts(self):
+        total_assets = account_id("balance_sheet", "TỔNG CỘNG TÀI SẢN")
+        self.assertEqual(total_assets, ACCOUNT["total_assets"])
+        self.assertEqual(account_id("balance_sheet", " tổng cộng tài sản"), total_assets)
+        self.assertEqual(account_id("balance_sheet", "IV. Hàng tồn kho"), ACCOUNT["inventories"])
+        self.assertEqual(account_code(total_assets), "total_assets")
+        self.assertEqual(account_label(total_assets), "TỔNG CỘNG TÀI SẢN")
+        self.assertEqual(account_statement(ACCOUNT["cfo"]), "cashflow")
+        self.assertEqual(len(ACCOUNT), sum(len(accounts) for accounts in ACCOUNTS.values()))
+
+    def test_other_labels(self):
+        account = account_id("cashflow", "9. Tiền thu khác")
+        self.assertFalse(is_listed(account))
+        self.assertIsNone(account_code(account))
+        self.assertEqual(account // ID_SPAN, 3)
+        self.assertGreaterEqual(account % ID_SPAN, HASHED_START)
+        # the same id for the same label, whatever the statement row order
+        self.assertEqual(account_ids("cashflow", ["x", "9. Tiền thu khác"])[1], account)
+        self.assertNotEqual(account_id("balance_sheet", "9. Tiền thu khác"), account)
+
+    def test_colliding_labels(self):
+        # both labels hash to the same id
+        self.assertEqual(account_id("cashflow", "Khoản mục 3824"), account_id("cashflow", "Khoản mục 6607"))
+        ids = account_ids("cashflow", ["Khoản mục 6607", "Khoản mục 3824", "khoản mục 3824"])
+        self.assertEqual(ids[1], account_id("cashflow", "Khoản mục 3824"))
+        self.assertEqual(ids[1], ids[2])
+        self.assertNotEqual(ids[0], ids[1])
+        self.assertFalse(is_listed(ids[0]))
+
+    def test_account_key(self):
+        self.assertEqual(account_key(pd.Index(["a"]), "cogs"), "4. Giá vốn hàng bán")
+        self.assertEqual(account_key(pd.Index([1]), "cogs"), ACCOUNT["cogs"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from finb import PROJECT_PATH
+from finb.utils.constant import PAR_VALUE
+
+# Backward adjustment of prices for corporate actions crawled into market/company/{symbol}/events
+#   cash: cash dividend DIVIDEND, prices before the ex-date are multiplied by 1 - dividend / previous close
+#   stock: stock dividend STOCKDIV and bonus shares KINDDIV, prices before the ex-date are divided by
+#          1 + new shares per share, volumes multiplied by it
+# The factor of every applied event is kept in market/company/{symbol}/adjustments.csv, a new event
+# only adds its row. Share issues (sched_issue.csv) have no issue price and are not applied.
+
+ADJUSTMENT_COLUMNS = ["exDate", "kind", "value", "factor"]
+
+# the price and the events jobs of a symbol both update its adjustments, one update at a time per symbol
+_locks = dict()
+_locks_lock = threading.Lock()
+
+
+def _symbol_lock(symbol):
+    with _locks_lock:
+        if symbol not in _locks:
+            _locks[symbol] = threading.Lock()
+        return _locks[symbol]
+
+
+def adjustments_path(symbol):
+    return os.path.join(PROJECT_PATH, "market/company", symbol, "adjustments.csv")
+
+
+def _events_path(symbol, name):
+    return os.path.join(PROJECT_PATH, "market/company", symbol, "events", name + ".csv")
+
+
+def parse_ratio(value):
+    """ Ratio of an event, NaN when it can not be parsed
+    The ratio field of the events is a fraction, 0.15 or "0.15", a percent is only read with its sign, "15%",
+    and a share ratio as old:new, "100:15". A fraction above 1, e.g. a 150% stock dividend, is kept.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            if ":" in value:
+                old, new = value.split(":")
+                return float(new) / float(old)
+            if value.endswith("%"):
+                return float(value[:-1]) / 100
+        except (ValueError, ZeroDivisionError):
+            return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def read_events(symbol) -> pd.DataFrame:
+    """ Events changing the price of a symbol, rows (exDate, kind, value) sorted by exDate.
+    value is the dividend in thousand VND per share for cash events, new shares per share for stock events.
+    """
+    frames = []
+    path = _events_path(symbol, "dividend")
+    if os.path.exists(path):
+        df = pd.read_csv(path)
+        ratio = df["ratio"].map(parse_ratio)
+        dividend = pd.to_numeric(df["dividend"], errors="coerce")
+        is_cash = df["type"].str.upper() == "DIVIDEND"
+        # the dividend in VND per share, or a ratio of the par value
+        cash = dividend.where(dividend > 0, ratio * PAR_VALUE) / 1000
+        frames.append(pd.DataFrame({
+            "exDate": df["effectiveDate"],
+            "kind": np.where(is_cash, "cash", "stock"),
+            "value": np.where(is_cash, cash, ratio)
+        }))
+    path = _events_path(symbol, "kind_div")
+    if os.path.exists(path):
+        df = pd.read_csv(path)
+        frames.append(pd.DataFrame({"exDate": df["effectiveDate"], "kind": "stock",
+                                    "value": df["ratio"].map(parse_ratio)}))
+
+    if len(frames) == 0:
+        return _typed(pd.DataFrame(columns=["exDate", "kind", "value"]))
+    events = pd.concat(frames, ignore_index=True)
+    events["exDate"] = pd.to_datetime(events["exDate"], errors="coerce").dt.normalize()
+    events["value"] = pd.to_numeric(events["value"], errors="coerce").round(6)
+    events = events[events["exDate"].notnull() & (events["value"] > 0)]
+    return _typed(events.drop_duplicates().sort_values(["exDate", "kind"]).reset_index(drop=True))
+
+
+def event_factors(events: pd.DataFrame, price_df: pd.DataFrame) -> np.ndarray:
+    """ Price factor of every event, NaN when the prices do not cover its ex-date yet """
+    dates = price_df.index.to_numpy(dtype="datetime64[ns]")
+    close = price_df["Close"].to_numpy(dtype=np.float64)
+    ex_dates = events["exDate"].to_numpy(dtype="datetime64[ns]")
+    values = events["value"].to_numpy(dtype=np.float64)
+    positions = np.searchsorted(dates, ex_dates, side="left")
+
+    factors = np.full(len(events), np.nan)
+    covered = (positions > 0) & (positions < len(dates))
+    prev_close = close[np.maximum(positions - 1, 0)]
+    is_cash = (events["kind"] == "cash").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cash = 1 - values / prev_close
+    factors[covered & is_cash] = cash[covered & is_cash]
+    factors[covered & ~is_cash] = 1 / (1 + values[covered & ~is_cash])
+    # a dividend larger than the price is a wrong event
+    factors[(factors <= 0) | (factors > 1)] = np.nan
+    return factors
+
+
+def _typed(df):
+    df["exDate"] = pd.to_datetime(df["exDate"])
+    df["kind"] = df["kind"].astype(object)
+    for col in ["value", "factor"]:
+        if col in df.columns:
+            df[col] = df[col].astype(np.float64)
+    return df
+
+
+def read_adjustments(symbol) -> pd.DataFrame:
+    path = adjustments_path(symbol)
+    if not os.path.exists(path):
+        return _typed(pd.DataFrame(columns=ADJUSTMENT_COLUMNS))
+    return _typed(pd.read_csv(path))
+
+
+def update_adjustments(symbol, price_df=None) -> pd.DataFrame:
+    """ Add the factors of new events, factors of applied events are kept
+
+    :param price_df: raw prices, default price.csv
+    :return: the adjustments of the symbol
+    """
+    with _symbol_lock(symbol):
+        return _update_adjustments(symbol, price_df)
+
+
+def _update_adjustments(symbol, price_df):
+    if price_df is None:
+        price_path = os.path.join(PROJECT_PATH, "market/company", symbol, "price.csv")
+        if not os.path.exists(price_path):
+            return read_adjustments(symbol)
+        price_df = pd.read_csv(price_path, index_col=0, parse_dates=True)
+
+    stored = read_adjustments(symbol)
+    events = read_events(symbol)
+    keys = ["exDate", "kind", "value"]
+    merged = events.merge(stored, on=keys, how="left")
+    new = merged["factor"].isnull().to_numpy()
+    # a symbol without events gets an empty file so that readers do not look for its events again
+    if not new.any() and len(merged) == len(stored) and os.path.exists(adjustments_path(symbol)):
+        return stored
+
+    merged.loc[new, "factor"] = event_factors(merged[new], price_df.sort_index())
+    # events not covered by the prices yet are added by a later update
+    adjustments = merged[merged["factor"].notnull()][ADJUSTMENT_COLUMNS].reset_index(drop=True)
+    if os.path.exists(adjustments_path(symbol)) and adjustments.equals(stored):
+        return stored
+
+    path = adjustments_path(symbol)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+    adjustments.to_csv(tmp_path, index=False, date_format="%Y-%m-%d")
+    os.replace(tmp_path, path)
+    return adjustments
+
+
+def adjust_prices(price_df: pd.DataFrame, adjustments: pd.DataFrame) -> pd.DataFrame:
+    """ Adjusted OHLCV with the cumulative price factor of every row in a Factor column """
+    dates = price_df.index.to_numpy(dtype="datetime64[ns]")
+    positions = np.searchsorted(dates, adjustments["exDate"].to_numpy(dtype="datetime64[ns]"), side="left")
+    factors = adjustments["factor"].to_numpy(dtype=np.float64)
+    is_stock = (adjustments["kind"] == "stock").to_numpy()
+
+    # the factor of an event applies to every row before its ex-date
+    price_factor = np.ones(len(dates) + 1)
+    share_factor = np.ones(len(dates) + 1)
+    np.multiply.at(price_factor, positions, factors)
+    np.multiply.at(share_factor, positions[is_stock], factors[is_stock])
+    price_factor = np.cumprod(price_factor[::-1])[::-1][1:]
+    share_factor = np.cumprod(share_factor[::-1])[::-1][1:]
+
+    df = price_df.copy()
+    for col in ["Open", "High", "Low", "Close"]:
+        df[col] = df[col] * price_factor
+    df["Volume"] = df["Volume"] / share_factor
+    df["Factor"] = price_factor
+    return df
+
+
+def total_return(adjusted_df: pd.DataFrame) -> pd.Series:
+    """ Daily total returns in percent, dividends reinvested at the close of the ex-date """
+    return (adjusted_df["Close"].pct_change() * 100).fillna(0).rename("Return")
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.utils import datahub
+from finb.utils.datahub import FileCache, read_adjusted_price_df, read_total_return
+from finb.utils.adjust import parse_ratio, read_events, update_adjustments, read_adjustments, adjust_prices
+
+DIVIDEND_COLUMNS = ['type', 'typeDesc', 'effectiveDate', 'disclosuredDate', 'expiredDate', 'content', 'dividend',
+                    'ratio', 'actualDate', 'divPeriod', 'divYear', 'numberOfShares']
+
+
+def dividend_row(type, effective_date, dividend, ratio):
+    return [type, "", effective_date, effective_date, "", "", dividend, ratio, "", "", "", ""]
+
+
+class AdjustTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch("finb.utils.adjust.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.datahub.PROJECT_PATH", self.tmp_dir),
+            mock.patch.object(datahub, "file_cache", FileCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.symbol_dir = os.path.join(self.tmp_dir, "market/company/AAA")
+        os.makedirs(os.path.join(self.symbol_dir, "events"))
+        dates = pd.date_range("2020-01-01", pd.Timestamp.now().normalize(), name="Date")
+        close = np.full(len(dates), 40.)
+        # ex-dates of a 2000 VND dividend and of a 25% stock dividend
+        close[dates >= "2020-03-02"] -= 2
+        close[dates >= "2020-06-01"] /= 1.25
+        self.price_df = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                                      "Volume": 1000}, index=dates)
+        self.price_df.to_csv(os.path.join(self.symbol_dir, "price.csv"))
+        self.write_dividends([dividend_row("DIVIDEND", "2020-03-02", 2000, 0.2),
+                              dividend_row("STOCKDIV", "2020-06-01", "", 0.25)])
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_dividends(self, rows):
+        pd.DataFrame(rows, columns=DIVIDEND_COLUMNS).to_csv(
+            os.path.join(self.symbol_dir, "events/dividend.csv"), index=False)
+
+    def test_parse_ratio(self):
+        self.assertEqual(parse_ratio(0.15), 0.15)
+        self.assertEqual(parse_ratio("15%"), 0.15)
+        self.assertEqual(parse_ratio("100:15"), 0.15)
+        self.assertEqual(parse_ratio("0.15"), 0.15)
+        # a 150% stock dividend
+        self.assertEqual(parse_ratio(1.5), 1.5)
+        self.assertTrue(np.isnan(parse_ratio("n/a")))
+
+    def test_adjust_prices(self):
+        adjustments = update_adjustments("AAA")
+        self.assertEqual(adjustments["kind"].tolist(), ["cash", "stock"])
+        np.testing.assert_allclose(adjustments["factor"], [1 - 2 / 40, 0.8])
+
+        df = adjust_prices(self.price_df, adjustments)
+        # no jump left on the ex-dates
+        np.testing.assert_allclose(df["Close"], df["Close"].iloc[-1])
+        self.assertEqual(df.loc["2020-01-10", "Factor"], 0.95 * 0.8)
+        self.assertEqual(df.loc["2020-05-10", "Volume"], 1250)
+        self.assertEqual(df.loc["2020-06-01", "Factor"], 1)
+
+    def test_incremental(self):
+        update_adjustments("AAA")
+        # a stored factor is kept, a new event adds its row, an event after the last price waits
+        self.price_df.loc["2020-02-28", "Close"] = 80
+        future = (pd.Timestamp.now() + pd.Timedelta(days=30)).strftime("%Y-%m-%d")
+        self.write_dividends([dividend_row("DIVIDEND", "2020-03-02", 2000, 0.2),
+                              dividend_row("STOCKDIV", "2020-06-01", "", 0.25),
+                              dividend_row("DIVIDEND", "2020-09-01", 1000, 0.1),
+                              dividend_row("DIVIDEND", future, 1000, 0.1)])
+        adjustments = update_adjustments("AAA", self.price_df)
+        np.testing.assert_allclose(adjustments["factor"], [1 - 2 / 40, 0.8, 1 - 1 / 30.4])
+        self.assertEqual(len(read_events("AAA")), 4)
+        pd.testing.assert_frame_equal(read_adjustments("AAA"), adjustments)
+
+    def test_symbol_without_events(self):
+        os.remove(os.path.join(self.symbol_dir, "events/dividend.csv"))
+        with mock.patch.object(datahub, "update_adjustments", wraps=datahub.update_adjustments) as update:
+            read_adjusted_price_df("AAA")
+            read_adjusted_price_df("AAA")
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(len(read_adjustments("AAA")), 0)
+
+    def test_readers(self):
+        df = read_adjusted_price_df("AAA")
+        np.testing.assert_allclose(df["Close"], 30.4)
+        returns = read_total_return("AAA")
+        self.assertTrue((returns.abs() < 1e-9).all())
+
+        misses = datahub.file_cache.stats()["misses"]
+        read_adjusted_price_df("AAA")
+        self.assertEqual(datahub.file_cache.stats()["misses"], misses)
+
+        self.write_dividends([dividend_row("DIVIDEND", "2020-03-02", 2000, 0.2)])
+        update_adjustments("AAA")
+        df = read_adjusted_price_df("AAA")
+        self.assertEqual(df.loc["2020-06-01", "Close"], 30.4)
+        self.assertEqual(df.loc["2020-05-29", "Close"], 38)
+
+
+if __name__ == "__main__":
+    unittest.main()
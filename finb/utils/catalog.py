@@ -0,0 +1,295 @@
+import os
+import sqlite3
+import hashlib
+from contextlib import closing
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from finb import PROJECT_PATH
+
+# Catalog of the market data stored under market/company in market/catalog.sqlite
+#   artifacts: one row per (symbol, dataset, period) with the file holding it, its row count,
+#              the dates it covers, the api it was crawled from, when and the checksum of its content
+# period is WHOLE for files holding the full history of a dataset, e.g. price.csv, the quarter label
+# "2020-Q3" for statement quarters and the event type for events.
+# rebuild_catalog() builds the catalog from the tree, the crawlers then record what they write.
+
+CATALOG_PATH = os.path.join(PROJECT_PATH, "market/catalog.sqlite")
+
+WHOLE = ""
+
+COLUMNS = ["symbol", "dataset", "period", "path", "rows", "first_date", "last_date", "source", "fetched_at",
+           "checksum"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    symbol TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    period TEXT NOT NULL,
+    path TEXT NOT NULL,
+    rows INTEGER,
+    first_date TEXT,
+    last_date TEXT,
+    source TEXT,
+    fetched_at TEXT NOT NULL,
+    checksum TEXT,
+    PRIMARY KEY (symbol, dataset, period)
+);
+CREATE INDEX IF NOT EXISTS artifacts_dataset ON artifacts (dataset, period, last_date);
+"""
+
+# dataset -> file under market/company/{symbol} and the column of its dates, index for the index
+FILE_DATASETS = {
+    "price": ("price.csv", "index"),
+    "major_holders": ("major_holders.csv", None),
+    "snapshot": ("snapshot.json", None),
+}
+
+
+def file_checksum(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as fobj:
+        for chunk in iter(lambda: fobj.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _date(value):
+    if value is None or pd.isnull(value):
+        return None
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+def _date_range(dates):
+    dates = pd.to_datetime(pd.Series(dates), errors="coerce").dropna()
+    if len(dates) == 0:
+        return None, None
+    return _date(dates.min()), _date(dates.max())
+
+
+def _relative(path):
+    return os.path.relpath(path, PROJECT_PATH)
+
+
+class Catalog:
+    """ SQLite catalog of the stored market data """
+    def __init__(self, path=None):
+        self.path = CATALOG_PATH if path is None else path
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        # crawler threads write concurrently, a writer waits for the lock
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, symbol, dataset, path, period=WHOLE, rows=None, first_date=None, last_date=None,
+               source=None, fetched_at=None, checksum=None):
+        """ Add or replace the entry of an artifact
+
+        :param path: file holding the artifact, stored relative to PROJECT_PATH
+        :param fetched_at: default now
+        :param checksum: default the sha1 of the file
+        """
+        self.record_many([(symbol, dataset, period, path, rows, first_date, last_date, source, fetched_at,
+                           checksum)])
+
+    def record_many(self, entries):
+        """ Add or replace many entries in one transaction, tuples in the order of COLUMNS """
+        now = datetime.now().isoformat(timespec="seconds")
+        checksums = dict()
+        rows = []
+        for symbol, dataset, period, path, n, first_date, last_date, source, fetched_at, checksum in entries:
+            if checksum is None and os.path.exists(path):
+                if path not in checksums:
+                    checksums[path] = file_checksum(path)
+                checksum = checksums[path]
+            rows.append((symbol, dataset, period, _relative(path), None if n is None else int(n),
+                         _date(first_date), _date(last_date), source, fetched_at or now, checksum))
+        with closing(self.connect()) as conn:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def remove(self, symbol, dataset=None):
+        with closing(self.connect()) as conn:
+            with conn:
+                if dataset is None:
+                    conn.execute("DELETE FROM artifacts WHERE symbol = ?", (symbol,))
+                else:
+                    conn.execute("DELETE FROM artifacts WHERE symbol = ? AND dataset = ?", (symbol, dataset))
+
+    def entries(self, dataset=None, symbol=None, period=None) -> pd.DataFrame:
+        """ Entries matching the given keys, all entries by default """
+        where = [(k, v) for k, v in [("dataset", dataset), ("symbol", symbol), ("period", period)] if v is not None]
+        sql = "SELECT * FROM artifacts"
+        if len(where) > 0:
+            sql += " WHERE " + " AND ".join(f"{k} = ?" for k, _ in where)
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query(sql + " ORDER BY symbol, dataset, period", conn,
+                                     params=[v for _, v in where])
+
+    def get(self, symbol, dataset, period=WHOLE):
+        """ Entry of an artifact as a dict, None when it is not stored """
+        with closing(self.connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM artifacts WHERE symbol = ? AND dataset = ? AND period = ?",
+                               (symbol, dataset, period)).fetchone()
+        return None if row is None else dict(row)
+
+    def periods(self, dataset, symbol):
+        """ Stored periods of a dataset for a symbol, e.g. the quarter labels of a statement """
+        with closing(self.connect()) as conn:
+            return {p for p, in conn.execute("SELECT period FROM artifacts WHERE dataset = ? AND symbol = ?",
+                                             (dataset, symbol))}
+
+    def missing(self, symbols, dataset, period=WHOLE):
+        """ Symbols without an entry of the dataset """
+        with closing(self.connect()) as conn:
+            stored = {s for s, in conn.execute("SELECT symbol FROM artifacts WHERE dataset = ? AND period = ?",
+                                               (dataset, period))}
+        return [s for s in symbols if s not in stored]
+
+    def stale(self, dataset, before, period=WHOLE, symbols=None):
+        """ Symbols whose data of the dataset ends before a date, with the date it ends
+
+        :return: dict symbol -> last date
+        """
+        with closing(self.connect()) as conn:
+            ret = dict(conn.execute(
+                "SELECT symbol, last_date FROM artifacts WHERE dataset = ? AND period = ? AND "
+                "(last_date IS NULL OR last_date < ?)", (dataset, period, _date(before))))
+        if symbols is not None:
+            symbols = set(symbols)
+            ret = {s: d for s, d in ret.items() if s in symbols}
+        return ret
+
+    def verify(self, symbol=None):
+        """ Entries whose file is gone or has changed since it was recorded, list of (symbol, dataset, period) """
+        ret = []
+        checksums = dict()
+        for row in self.entries(symbol=symbol).itertuples(index=False):
+            path = os.path.join(PROJECT_PATH, row.path)
+            if not os.path.exists(path):
+                ret.append((row.symbol, row.dataset, row.period))
+                continue
+            # statement quarters are checksummed on their values, their file is checked by rebuild_catalog
+            if row.dataset in FILE_DATASETS or row.dataset == "events":
+                if path not in checksums:
+                    checksums[path] = file_checksum(path)
+                if checksums[path] != row.checksum:
+                    ret.append((row.symbol, row.dataset, row.period))
+        return ret
+
+
+_catalogs = dict()
+
+
+def get_catalog(path=None) -> Catalog:
+    """ Catalog of a path opened once per process """
+    path = CATALOG_PATH if path is None else path
+    if path not in _catalogs:
+        _catalogs[path] = Catalog(path)
+    return _catalogs[path]
+
+
+def frame_entry(symbol, dataset, path, df, period=WHOLE, date_column="index", source=None, fetched_at=None):
+    """ Entry of an artifact stored from a frame, tuple in the order of COLUMNS
+
+    :param date_column: column of the dates, "index" for the index, None when the rows have no date
+    """
+    first_date, last_date = None, None
+    if df is not None and date_column is not None:
+        dates = df.index if date_column == "index" else df[date_column] if date_column in df.columns else []
+        first_date, last_date = _date_range(dates)
+    return (symbol, dataset, period, path, None if df is None else len(df), first_date, last_date, source,
+            fetched_at, None)
+
+
+def statement_entries(symbol, statement, path, df, quarters=None, source=None, fetched_at=None):
+    """ Entries of the quarters of a fields x quarters statement frame, checksums of their values
+
+    :param quarters: labels to record, default every column
+    """
+    entries = []
+    for label in (df.columns if quarters is None else quarters):
+        values = pd.to_numeric(df[label], errors="coerce").dropna()
+        year, quarter = label.split("-Q")
+        start = pd.Timestamp(int(year), 3 * int(quarter) - 2, 1)
+        end = start + pd.offsets.QuarterEnd(0)
+        h = hashlib.sha1()
+        h.update("\n".join(str(i) for i in values.index).encode())
+        h.update(values.to_numpy(dtype=np.float64).tobytes())
+        entries.append((symbol, statement, label, path, len(values), start, end, source, fetched_at, h.hexdigest()))
+    return entries
+
+
+def catalog_exists(path=None):
+    return os.path.exists(CATALOG_PATH if path is None else path)
+
+
+def record_artifacts(entries, path=None):
+    """ Record entries when the catalog has been built, a failing catalog never fails the crawl writing the data """
+    if not catalog_exists(path):
+        return
+    try:
+        get_catalog(path).record_many(entries)
+    except Exception as e:
+        print("[record_artifacts] Warning ", str(e))
+
+
+def rebuild_catalog(symbols=None, catalog=None):
+    """ Record every artifact stored under market/company, source and fetch time are taken from the files
+
+    :return: the catalog
+    """
+    from finb.utils.statement_store import STATEMENT_DIRS, store_path, read_statement_store
+
+    catalog = get_catalog() if catalog is None else catalog
+    company_dir = os.path.join(PROJECT_PATH, "market/company")
+    if symbols is None:
+        symbols = sorted(os.listdir(company_dir)) if os.path.exists(company_dir) else []
+
+    for symbol in symbols:
+        symbol_dir = os.path.join(company_dir, symbol)
+        entries = []
+        try:
+            for dataset, (name, date_column) in FILE_DATASETS.items():
+                path = os.path.join(symbol_dir, name)
+                if not os.path.exists(path):
+                    continue
+                df = None
+                if name.endswith(".csv"):
+                    df = pd.read_csv(path, index_col=0 if date_column == "index" else None,
+                                     parse_dates=date_column == "index")
+                mtime = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+                entries.append(frame_entry(symbol, dataset, path, df, date_column=date_column, source="disk",
+                                           fetched_at=mtime))
+
+            events_dir = os.path.join(symbol_dir, "events")
+            if os.path.exists(events_dir):
+                for name in sorted(os.listdir(events_dir)):
+                    if not name.endswith(".csv"):
+                        continue
+                    path = os.path.join(events_dir, name)
+                    mtime = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+                    entries.append(frame_entry(symbol, "events", path, pd.read_csv(path), period=name[:-4],
+                                               date_column="effectiveDate", source="disk", fetched_at=mtime))
+
+            for statement in STATEMENT_DIRS:
+                df = read_statement_store(symbol, statement)
+                if df is None:
+                    continue
+                path = store_path(symbol, statement)
+                mtime = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+                entries += statement_entries(symbol, statement, path, df, source="disk", fetched_at=mtime)
+        except Exception as e:
+            print("[rebuild_catalog] Warning ", symbol, str(e))
+
+        catalog.remove(symbol)
+        catalog.record_many(entries)
+    return catalog
+
+
+if __name__ == "__main__":
+    rebuild_catalog()
@@ -0,0 +1,85 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.crawl.planner import plan_price_crawls
+from finb.utils.catalog import Catalog, rebuild_catalog, record_artifacts, frame_entry
+from finb.utils.statement_store import write_statement_store
+
+
+class CatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalog_path = os.path.join(self.tmp_dir, "market/catalog.sqlite")
+        self.patches = [
+            mock.patch("finb.utils.catalog.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.catalog.CATALOG_PATH", self.catalog_path),
+            mock.patch("finb.utils.statement_store.PROJECT_PATH", self.tmp_dir),
+        ]
+        for p in self.patches:
+            p.start()
+
+        for symbol, end in [("AAA", "2024-02-16"), ("BBB", "2024-02-07")]:
+            symbol_dir = os.path.join(self.tmp_dir, "market/company", symbol)
+            os.makedirs(os.path.join(symbol_dir, "events"))
+            dates = pd.bdate_range("2024-01-02", end, name="Date")
+            pd.DataFrame({"Close": np.arange(len(dates)), "Volume": 100}, index=dates).to_csv(
+                os.path.join(symbol_dir, "price.csv"))
+        pd.DataFrame({"type": ["DIVIDEND"], "effectiveDate": ["2023-06-01"]}).to_csv(
+            os.path.join(self.tmp_dir, "market/company/AAA/events/dividend.csv"), index=False)
+        with open(os.path.join(self.tmp_dir, "market/company/AAA/snapshot.json"), "w") as fobj:
+            json.dump({}, fobj)
+        write_statement_store("AAA", "balance_sheet", pd.DataFrame(
+            {"2023-Q3": [1.0, np.nan], "2023-Q4": [2.0, 3.0]}, index=pd.Index(["a", "b"], name="fields")))
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_rebuild_and_query(self):
+        # nothing is recorded before the catalog is built
+        record_artifacts([frame_entry("AAA", "price", "price.csv", None)])
+        self.assertFalse(os.path.exists(self.catalog_path))
+
+        catalog = rebuild_catalog(catalog=Catalog(self.catalog_path))
+        price = catalog.get("AAA", "price")
+        self.assertEqual((price["rows"], price["first_date"], price["last_date"]), (34, "2024-01-02", "2024-02-16"))
+        self.assertEqual(price["path"], os.path.join("market", "company", "AAA", "price.csv"))
+        self.assertEqual(catalog.get("AAA", "events", "dividend")["last_date"], "2023-06-01")
+        self.assertEqual(catalog.periods("balance_sheet", "AAA"), {"2023-Q3", "2023-Q4"})
+        self.assertEqual(catalog.get("AAA", "balance_sheet", "2023-Q3")["rows"], 1)
+        self.assertEqual(catalog.get("AAA", "balance_sheet", "2023-Q4")["last_date"], "2023-12-31")
+        self.assertIsNone(catalog.get("BBB", "snapshot"))
+
+        self.assertEqual(catalog.missing(["AAA", "BBB", "CCC"], "price"), ["CCC"])
+        self.assertEqual(catalog.stale("price", "2024-02-15"), {"BBB": "2024-02-07"})
+        missing, stale = plan_price_crawls(["AAA", "BBB", "CCC"], catalog, now="2024-02-19 16:00")
+        self.assertEqual((missing, stale), (["CCC"], {"AAA": "2024-02-16", "BBB": "2024-02-07"}))
+        missing, stale = plan_price_crawls(["AAA", "BBB"], catalog, now="2024-02-18 10:00")
+        self.assertEqual(list(stale), ["BBB"])
+
+        self.assertEqual(catalog.verify(), [])
+        with open(os.path.join(self.tmp_dir, "market/company/AAA/price.csv"), "a") as fobj:
+            fobj.write("2024-02-19,1,100\n")
+        os.remove(os.path.join(self.tmp_dir, "market/company/BBB/price.csv"))
+        self.assertEqual(catalog.verify(), [("AAA", "price", ""), ("BBB", "price", "")])
+
+    def test_record(self):
+        catalog = Catalog(self.catalog_path)
+        path = os.path.join(self.tmp_dir, "market/company/AAA/price.csv")
+        df = pd.read_csv(path, index_col=0, parse_dates=True)
+        record_artifacts([frame_entry("AAA", "price", path, df, source="api")])
+
+        entries = catalog.entries(dataset="price")
+        self.assertEqual(entries["symbol"].tolist(), ["AAA"])
+        self.assertEqual(entries["source"].iloc[0], "api")
+        self.assertEqual(len(entries["checksum"].iloc[0]), 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,15 @@
-import os
-import pandas as pd
-from finb import PROJECT_PATH
 import unidecode
+from finb.utils.registry import COMPANIES_PATH, get_registry
 
 
 def cafef_company_url(symbol):
-    companies_df = pd.read_csv(os.path.join(PROJECT_PATH, "market/companies.csv"), index_col="symbol")
-
-    name = companies_df.loc[symbol]["company"]
+    registry = get_registry()
+    if registry is None:
+        raise FileNotFoundError(f"{COMPANIES_PATH} does not exist, no company name for {symbol}")
+    company = registry.get(symbol)
+    if company is None:
+        raise KeyError(f"{symbol} is not in {registry.path}")
+    name = company["company"]
 
     unaccented_name = unidecode.unidecode(name).strip().lower()
 
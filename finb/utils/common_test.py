@@ -1,9 +1,37 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+import pandas as pd
+from finb.utils import registry
 from finb.utils.common import cafef_company_url
 
 
 class CommonTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "companies.csv")
+        self.patches = [
+            mock.patch.object(registry, "COMPANIES_PATH", self.path),
+            mock.patch.object(registry, "_registries", dict()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
     def test_cafef_company_url(self):
+        pd.DataFrame({
+            "symbol": ["PNJ", "HPG", "DTD"],
+            "company": ["Công ty Cổ phần Vàng bạc Đá quý Phú Nhuận", "Công ty Cổ phần Tập đoàn Hòa Phát",
+                        "Công ty Cổ phần Đầu tư Phát triển Thành Đạt"],
+            "delistedDate": None
+        }).to_csv(self.path, index=False)
+
         ret = cafef_company_url("PNJ")
         self.assertEqual(ret, "cong-ty-co-phan-vang-bac-da-quy-phu-nhuan")
 
@@ -13,6 +41,13 @@ class CommonTestCase(unittest.TestCase):
         ret = cafef_company_url("DTD")
         self.assertEqual(ret, "cong-ty-co-phan-dau-tu-phat-trien-thanh-dat")
 
+        with self.assertRaises(KeyError):
+            cafef_company_url("XXX")
+
+    def test_missing_companies(self):
+        with self.assertRaises(FileNotFoundError):
+            cafef_company_url("PNJ")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,137 @@
 import os
 import pandas as pd
 import json
-from datetime import datetime, timedelta
+import threading
+from copy import deepcopy
+from collections import OrderedDict
+from datetime import datetime
 from typing import List
 from finb import PROJECT_PATH
 from finb.crawl.sectors import get_all_stock_company
 from finb.crawl.company_profile import CrawlCompanyProfile
 from finb.utils.date import convert_quarter_to_end_date
+from finb.utils.trading_calendar import latest_closed_session
+from finb.utils.statement_store import read_statement_store, read_derived_store, quarter_label, store_path
+from finb.utils.price_panel import PricePanel, build_panel, panel_exists, FIELDS
+from finb.utils.resample import resample_ohlcv, resample_panel
+from finb.utils.adjust import adjustments_path, read_adjustments, update_adjustments, adjust_prices, total_return
+from finb.utils.catalog import catalog_exists, get_catalog
+from finb.utils.accounts import account_key
+from finb.utils.registry import get_registry
+
+
+# bytes of parsed files kept by the process wide cache of the readers
+FILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class FileCache:
+	""" LRU cache of parsed files bounded by the size of the parsed values
+
+	An entry is served while the mtime and the size of its file are unchanged,
+	callers get a copy so that they may modify it.
+	"""
+	def __init__(self, max_bytes=FILE_CACHE_MAX_BYTES):
+		self.max_bytes = max_bytes
+		self.entries = OrderedDict()
+		self.nbytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.lock = threading.Lock()
+
+	def get(self, path, loader, key=None):
+		""" Parsed content of path, loader() parses it on a miss """
+		key = path if key is None else key
+		try:
+			st = os.stat(path)
+		except OSError:
+			return loader()
+		stamp = (st.st_mtime_ns, st.st_size)
+
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is not None and entry[0] == stamp:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return _copy(entry[2])
+			self.misses += 1
+
+		value = loader()
+		nbytes = _sizeof(value)
+		with self.lock:
+			old = self.entries.pop(key, None)
+			if old is not None:
+				self.nbytes -= old[1]
+			if nbytes <= self.max_bytes:
+				self.entries[key] = (stamp, nbytes, value)
+				self.nbytes += nbytes
+			while self.nbytes > self.max_bytes:
+				_, (_, n, _) = self.entries.popitem(last=False)
+				self.nbytes -= n
+				self.evictions += 1
+		return _copy(value)
+
+	def stats(self):
+		with self.lock:
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"entries": len(self.entries),
+				"bytes": self.nbytes,
+				"max_bytes": self.max_bytes
+			}
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.nbytes = 0
+			self.hits = 0
+			self.misses = 0
+			self.evictions = 0
+
+
+def _copy(value):
+	if isinstance(value, (pd.DataFrame, pd.Series)):
+		return value.copy()
+	return deepcopy(value)
+
+
+def _sizeof(value):
+	if isinstance(value, pd.DataFrame):
+		return int(value.memory_usage(deep=True).sum()) + int(value.index.memory_usage(deep=True))
+	if value is None:
+		return 0
+	return len(json.dumps(value, default=str))
+
+
+file_cache = FileCache()
+
+
+def file_cache_stats():
+	""" Hit, miss and eviction counts of the reader cache """
+	return file_cache.stats()
+
+
+def _read_csv_cached(path, **kwargs):
+	key = (path, "csv", tuple(sorted(kwargs.items())))
+	return file_cache.get(path, lambda: pd.read_csv(path, **kwargs), key=key)
+
+
+def _read_json_cached(path):
+	def load():
+		with open(path) as fobj:
+			return json.load(fobj)
+	return file_cache.get(path, load, key=(path, "json"))
+
+
+def _read_statement_store_cached(symbol, statement, by_id=False):
+	path = store_path(symbol, statement)
+	if not os.path.exists(path):
+		# migrates the csv tree when there is one
+		return read_statement_store(symbol, statement, by_id=by_id)
+	return file_cache.get(
+		path, lambda: read_statement_store(symbol, statement, migrate=False, by_id=by_id), key=(path, "store", by_id))
 
 
 def read_price_df(symbol, renew=False):
@@ -14,13 +139,13 @@ def read_price_df(symbol, renew=False):
 		path = os.path.join(PROJECT_PATH, "market/company", symbol, "price.csv")
 		if not os.path.exists(path) or renew:
 			CrawlCompanyProfile(symbol).get_price_history()
-		df = pd.read_csv(path, index_col=0, parse_dates=True)
+		df = _read_csv_cached(path, index_col=0, parse_dates=True)
 		df.index.name = 'Date'
 
-		x = datetime.now() - timedelta(hours=24+15)
-		if df.index[-1] <= x:
-			CrawlCompanyProfile(symbol).get_price_history()
-			df = pd.read_csv(path, index_col=0, parse_dates=True)
+		# the bar of the last closed session is missing, holidays and weekends have no bar
+		if df.index[-1] < latest_closed_session():
+			CrawlCompanyProfile(symbol).get_price_history(incremental=True)
+			df = _read_csv_cached(path, index_col=0, parse_dates=True)
 			df.index.name = 'Date'
 		return df
 	except Exception as e:
@@ -29,43 +154,111 @@ def read_price_df(symbol, renew=False):
 	return None
 
 
+def read_price_panel(renew=False):
+	""" Market wide OHLCV panel mapped from market/panel, built from the price.csv files when missing """
+	try:
+		if renew or not panel_exists():
+			build_panel()
+		return PricePanel()
+	except Exception as e:
+		print("[read_price_panel] Warning ", str(e))
+
+	return None
+
+
+def read_catalog(dataset=None, symbol=None):
+	""" Entries of the market data catalog, e.g. read_catalog("price") for the date range of every price.csv.
+	None when the catalog has not been built, see finb.utils.catalog
+	"""
+	if not catalog_exists():
+		return None
+	return get_catalog().entries(dataset=dataset, symbol=symbol)
+
+
 def generate_weekly_quotes(df):
-	df_copy = df.copy()
-	dates = df_copy.index.to_series()
-	df_copy["Date"] = dates
-	df_copy["Week"] = df_copy["Date"] - pd.to_timedelta(df_copy["Date"].dt.dayofweek, unit='d')
-
-	cols = ["Week", "Open", "High", "Low", "Close", "Volume"]
-	df_w = pd.DataFrame(columns=cols)
-
-	for w in df_copy.Week.unique():
-		df_iw = df_copy[df_copy["Week"] == w]
-		open_w = df_iw.iloc[0]["Open"]
-		high_w = df_iw["High"].max()
-		low_w = df_iw["Low"].min()
-		close_w = df_iw.iloc[-1]["Close"]
-		vol_w = df_iw["Volume"].sum()
-
-		df_w.loc[-1] = [w, open_w, high_w, low_w, close_w, vol_w]
-		df_w.index = df_w.index + 1
-		df_w = df_w.sort_index()
-
-	df_w.set_index("Week", inplace=True)
-	df_w = df_w.iloc[::-1]
+	""" Weekly bars labelled by their Monday """
+	df_w = resample_ohlcv(df, "W")
+	df_w.index.name = "Week"
 	return df_w
 
 
+def _adjustments_stamp(symbol):
+	path = adjustments_path(symbol)
+	if not os.path.exists(path):
+		return None
+	st = os.stat(path)
+	return st.st_mtime_ns, st.st_size
+
+
+def read_adjusted_price_df(symbol, renew=False):
+	""" Prices adjusted for dividends, stock dividends and bonus shares, see finb.utils.adjust.
+	The Factor column holds the cumulative price factor of every row. Cached until price.csv or
+	the adjustments change.
+	"""
+	df = read_price_df(symbol, renew=renew)
+	if df is None:
+		return None
+	path = os.path.join(PROJECT_PATH, "market/company", symbol, "price.csv")
+	if not os.path.exists(adjustments_path(symbol)):
+		update_adjustments(symbol, df)
+	key = (path, "adjusted", _adjustments_stamp(symbol))
+	return file_cache.get(path, lambda: adjust_prices(df, read_adjustments(symbol)), key=key)
+
+
+def read_total_return(symbol, renew=False):
+	""" Daily total returns in percent, dividends reinvested """
+	df = read_adjusted_price_df(symbol, renew=renew)
+	if df is None:
+		return None
+	return total_return(df)
+
+
+def read_resampled_price_df(symbol, freq="W", renew=False, adjusted=False):
+	""" OHLCV bars of a symbol over periods of freq, see finb.utils.resample.
+	Bars are cached until price.csv changes.
+
+	:param adjusted: bars of the prices adjusted for corporate actions
+	"""
+	if adjusted:
+		df = read_adjusted_price_df(symbol, renew=renew)
+	else:
+		df = read_price_df(symbol, renew=renew)
+	if df is None:
+		return None
+	path = os.path.join(PROJECT_PATH, "market/company", symbol, "price.csv")
+	key = (path, "resample", freq, _adjustments_stamp(symbol) if adjusted else None)
+	bars = file_cache.get(path, lambda: resample_ohlcv(df, freq), key=key)
+	bars.index.name = "Date"
+	return bars
+
+
+def read_resampled_price_panel(freq="W"):
+	""" OHLCV bars of every symbol of the price panel over periods of freq, cached until the panel changes
+
+	:return: frame indexed by period with (field, symbol) columns, e.g. df["Close"] is periods x symbols
+	"""
+	panel = read_price_panel()
+	if panel is None:
+		return None
+
+	def load():
+		labels, values = resample_panel(panel, freq)
+		columns = pd.MultiIndex.from_product([list(FIELDS), panel.symbols], names=["field", "symbol"])
+		# symbols x periods x fields -> periods x (fields, symbols)
+		data = values.transpose(1, 2, 0).reshape(len(labels), -1)
+		return pd.DataFrame(data, index=pd.DatetimeIndex(labels, name="Date"), columns=columns)
+
+	path = os.path.join(panel.panel_dir, "values.npy")
+	return file_cache.get(path, load, key=(path, "resample", freq))
+
+
 def read_companies_df(filter_delisted=True):
 	try:
 		companies_csv = os.path.join(PROJECT_PATH, "market/companies.csv")
 		if not os.path.exists(companies_csv):
 			get_all_stock_company(companies_csv)
 
-		companies_df = pd.read_csv(companies_csv)
-		companies_df.set_index("symbol", inplace=True)
-		if filter_delisted:
-			companies_df = companies_df[companies_df['delistedDate'].isnull()]
-		return companies_df
+		return get_registry(companies_csv).frame(filter_delisted)
 	except Exception as e:
 		print("[read_companies_df] Warning ", str(e))
 	return None
@@ -77,62 +270,207 @@ def read_considered_df():
 	if not os.path.exists(considered_csv_path):
 		return None
 
-	considered_df = pd.read_csv(considered_csv_path)
-	considered_df.set_index("symbol", inplace=True)
+	return get_registry(considered_csv_path).frame()
+
+
+def read_company_registry(considered=False):
+	""" Hash indexes of companies.csv, or of considered.csv, None when the file does not exist
 
-	return considered_df
+	The registry is shared and must not be modified, it is reloaded when its file changes.
+	"""
+	if considered:
+		return get_registry(os.path.join(PROJECT_PATH, "market/considered.csv"))
+	companies_csv = os.path.join(PROJECT_PATH, "market/companies.csv")
+	if not os.path.exists(companies_csv):
+		get_all_stock_company(companies_csv)
+	return get_registry(companies_csv)
 
 
 def read_snapshot(symbol):
 	snapshot_path = os.path.join(PROJECT_PATH, "market/company", symbol, "snapshot.json")
-	with open(snapshot_path) as fobj:
-		ret = json.load(fobj)
-	return ret
+	return _read_json_cached(snapshot_path)
 
 
-def read_balance_sheet(symbol, year, quarter, format="raw") -> [pd.DataFrame, List[pd.DataFrame]]:
+def _crawl_statement(symbol, statement, from_year, to_year):
+	crawler = CrawlCompanyProfile(symbol)
+	if statement == "balance_sheet":
+		crawler.get_balance_sheet(from_year=from_year, to_year=to_year)
+	elif statement == "income_statement":
+		crawler.get_income_statement(from_year=from_year, to_year=to_year)
+	elif statement == "cashflow":
+		crawler.get_cashflow(from_year=from_year, to_year=to_year)
+	else:
+		crawler.get_financial_indicators()
+
+
+def read_statement_with_year_range(symbol, statement, from_year, to_year):
+	""" Read the statement store of a symbol once, quarters of the range which are missing are crawled first
+
+	:return: DataFrame indexed by fields with one column per stored quarter, None when nothing is stored
+	"""
+	now = datetime.now()
+	labels = [quarter_label(y, q) for y in range(from_year, to_year + 1) for q in range(1, 5)
+			  if convert_quarter_to_end_date(y, q) < now]
+	df = _read_statement_store_cached(symbol, statement)
+	if df is None or any(label not in df.columns for label in labels):
+		try:
+			_crawl_statement(symbol, statement, from_year, to_year + 1)
+		except Exception as e:
+			print("[read_statement_with_year_range] Warning ", str(e))
+		df = _read_statement_store_cached(symbol, statement)
+	return df
+
+
+def _read_statement_quarter(symbol, statement, year, quarter, statement_df=None, by_id=False):
+	""" One quarter of a statement as a frame indexed by fields with a "values" column
+
+	:param statement_df: frame of read_statement_with_year_range, the store is read (and crawled) when None
+	:param by_id: index the rows by account ids, see finb.utils.accounts
+	"""
+	label = quarter_label(year, quarter)
+	if statement_df is None:
+		statement_df = _read_statement_store_cached(symbol, statement, by_id)
+		if statement_df is None or label not in statement_df.columns:
+			_crawl_statement(symbol, statement, year - 1, year + 1)
+			statement_df = _read_statement_store_cached(symbol, statement, by_id)
+	if statement_df is None or label not in statement_df.columns:
+		raise KeyError(f"{symbol} {statement} {label} is not stored")
+	return statement_df[[label]].rename(columns={label: "values"})
+
+
+def balance_sheet_common_size(df):
+	""" Common-size balance sheet, asset and capital rows divided by TỔNG CỘNG TÀI SẢN
+
+	:param df: raw balance sheet, fields x one or many quarters
+	:return: percent frame with the same columns, the TÀI SẢN and NGUỒN VỐN header rows are 0
+	"""
+	fields = df.index.to_list()
+	asset_first_row = fields.index(account_key(df.index, "current_assets"))
+	total_asset_row = fields.index(account_key(df.index, "total_assets"))
+	capital_first_row = fields.index(account_key(df.index, "liabilities"))
+	total_capital_row = fields.index(account_key(df.index, "total_capital"))
+
+	total_asset = df.iloc[total_asset_row]
+	percent_df = pd.concat([
+		pd.DataFrame(0.0, index=[account_key(df.index, "assets_header")], columns=df.columns),
+		df.iloc[asset_first_row:total_asset_row+1].div(total_asset, axis=1),
+		pd.DataFrame(0.0, index=[account_key(df.index, "capital_header")], columns=df.columns),
+		df.iloc[capital_first_row:total_capital_row+1].div(total_asset, axis=1)
+	])
+	percent_df.index.name = df.index.name
+	return percent_df.fillna(0)
+
+
+def income_statement_common_size(df):
+	""" Common-size income statement, rows from revenue to net income divided by total revenue
+
+	:param df: raw income statement, fields x one or many quarters
+	"""
+	fields = df.index.to_list()
+	first_row = fields.index(account_key(df.index, "total_revenue"))
+	last_row = fields.index(account_key(df.index, "parent_net_income"))
+
+	percent_df = df.iloc[first_row:last_row+1].div(df.iloc[first_row], axis=1)
+	percent_df.index.name = df.index.name
+	return percent_df
+
+
+def _prepare_balance_sheet(df):
+	return df.fillna(0)
+
+
+def _prepare_income_statement(df):
+	""" Total revenue is rebuilt from net revenue and deductions where it is below net revenue """
+	df = df.fillna(0)
+	total_key = account_key(df.index, "total_revenue")
+	total = df.loc[total_key]
+	net = df.loc[account_key(df.index, "net_revenue")]
+	deduction = df.loc[account_key(df.index, "revenue_deductions")]
+	mask = total < net
+	df.loc[total_key, mask] = net[mask] + deduction[mask]
+	return df
+
+
+def _read_common_size_cached(symbol, statement, prepare, common_size):
+	""" Percent frame of every stored quarter, saved next to the raw store """
+	path = store_path(symbol, statement)
+	build = lambda raw_df: _prepare_by_quarter(raw_df, lambda df: common_size(prepare(df)))
+	# validated against the raw store, the percent store is derived from it
+	return file_cache.get(
+		path, lambda: read_derived_store(symbol, statement, "percent", build), key=(path, "percent"))
+
+
+def _prepare_by_quarter(df, prepare):
+	""" prepare(df) of many quarters, quarters which can not be prepared are left out as in the quarterly readers
+
+	:return: DataFrame, None when no quarter can be prepared
+	"""
+	if df is None:
+		return None
+	try:
+		return prepare(df)
+	except KeyError:
+		columns = []
+		for label in df.columns:
+			try:
+				columns.append(prepare(df[[label]]))
+			except KeyError:
+				pass
+		if len(columns) == 0:
+			return None
+		return pd.concat(columns, axis=1)
+
+
+def _select_quarters(df, from_year, to_year):
+	""" Columns {year}-Q{quarter} of the year range, quarters which are not stored or not ended yet are "" """
+	now = datetime.now()
+	index = df.index if df is not None else pd.Index([], name="fields")
+	columns = OrderedDict()
+	for y in range(from_year, to_year+1):
+		for q in range(1, 5):
+			label = quarter_label(y, q)
+			if df is not None and label in df.columns and convert_quarter_to_end_date(y, q) < now:
+				columns[label] = df[label]
+			else:
+				columns[label] = ""
+	return pd.DataFrame(columns, index=index)
+
+
+def _read_statement_with_year_range_format(symbol, statement, from_year, to_year, format, prepare, common_size):
+	statement_df = read_statement_with_year_range(symbol, statement, from_year, to_year)
+
+	def raw_df():
+		return _select_quarters(_prepare_by_quarter(statement_df, prepare), from_year, to_year)
+
+	def percent_df():
+		try:
+			df = _read_common_size_cached(symbol, statement, prepare, common_size)
+		except Exception as e:
+			print("[read_statement_with_year_range] Warning ", str(e))
+			df = None
+		return _select_quarters(df, from_year, to_year)
+
+	if format == "raw":
+		return raw_df()
+
+	if format == "percent":
+		return percent_df()
+
+	return raw_df(), percent_df()
+
+
+def read_balance_sheet(symbol, year, quarter, format="raw", statement_df=None, by_id=False) -> [pd.DataFrame, List[pd.DataFrame]]:
 	if convert_quarter_to_end_date(year, quarter) >= datetime.now():
 		if format == "both":
 			return None, None
 		return None
 	try:
-		balance_sheet_path = os.path.join(
-			PROJECT_PATH, "market/company", symbol, "balansheet", f"{year}-Q{quarter}.csv")
-
-		if not os.path.exists(balance_sheet_path):
-			CrawlCompanyProfile(symbol).get_balance_sheet(from_year=year-1, to_year=year+1)
-
-		df = pd.read_csv(balance_sheet_path, header=0)
-		df.set_index("fields", inplace=True)
-		df.fillna(0, inplace=True)
+		df = _read_statement_quarter(symbol, "balance_sheet", year, quarter, statement_df, by_id)
+		df = _prepare_balance_sheet(df)
 
 		if format == "raw":
 			return df
-		# return percent format
-		asset_first_row = df.index.to_list().index("A. Tài sản lưu động và đầu tư ngắn hạn")
-		total_assset_row = df.index.to_list().index("TỔNG CỘNG TÀI SẢN")
-
-		total_asset = df.loc["TỔNG CỘNG TÀI SẢN"]["values"]
-		percent_df = pd.DataFrame(columns=["fields", "values"])
-		percent_df = percent_df.append({"fields": "TÀI SẢN", "values": None}, ignore_index=True)
-
-		for z in range(asset_first_row, total_assset_row+1):
-			percent_df = percent_df.append({
-				"fields": df.index[z],
-				"values": df.iloc[z]["values"]/total_asset
-			}, ignore_index=True)
-		percent_df = percent_df.append({"fields": "NGUỒN VỐN", "values": None}, ignore_index=True)
-
-		capital_first_row = df.index.to_list().index("A. Nợ phải trả")
-		total_capital_row = df.index.to_list().index("TỔNG CỘNG NGUỒN VỐN")
-		for z in range(capital_first_row, total_capital_row+1):
-			percent_df = percent_df.append({
-				"fields": df.index[z],
-				"values": df.iloc[z]["values"]/total_asset
-			}, ignore_index=True)
-
-		percent_df.set_index("fields", inplace=True)
-		percent_df.fillna(0, inplace=True)
+		percent_df = balance_sheet_common_size(df)
 		if format == "percent":
 			return percent_df
 
@@ -146,93 +484,22 @@ def read_balance_sheet(symbol, year, quarter, format="raw") -> [pd.DataFrame, Li
 
 
 def read_balance_sheet_with_year_range(symbol, from_year, to_year, format="raw"):
-	list_raw_df = []
-	list_percent_df = []
+	return _read_statement_with_year_range_format(
+		symbol, "balance_sheet", from_year, to_year, format, _prepare_balance_sheet, balance_sheet_common_size)
 
-	index = None
-	for y in range(from_year, to_year+1):
-		for q in range(1, 5):
-			if format == "raw":
-				df = read_balance_sheet(symbol, year=y, quarter=q, format=format)
-				list_raw_df.append((f"{y}-Q{q}", df))
-				if df is not None and index is None:
-					index = df.index
-			elif format == "percent":
-				percent_df = read_balance_sheet(symbol, year=y, quarter=q, format=format)
-				list_percent_df.append((f"{y}-Q{q}", percent_df))
-				if percent_df is not None and index is None:
-					index = percent_df.index
-			else:
-				df, percent_df = read_balance_sheet(symbol, year=y, quarter=q, format=format)
-				if df is not None and index is None:
-					index = df.index
-				list_raw_df.append((f"{y}-Q{q}",df))
-				list_percent_df.append((f"{y}-Q{q}",percent_df))
-
-	def concat_raw_df():
-		ret_raw_df = pd.DataFrame()
-		ret_raw_df["fields"] = index
-		for (q, df) in list_raw_df:
-			if df is not None:
-				ret_raw_df[q] = df["values"].tolist()
-			else:
-				ret_raw_df[q] = ""
-		ret_raw_df.set_index("fields", inplace=True)
-		return ret_raw_df
-
-	def concat_percent_df():
-		ret_percent_df = pd.DataFrame()
-		ret_percent_df["fields"] = index
-		for q, df in list_percent_df:
-			if df is not None:
-				ret_percent_df[q] = df["values"].tolist()
-			else:
-				ret_percent_df[q] = ""
-		ret_percent_df.set_index("fields", inplace=True)
-		return ret_percent_df
 
-	if format == "raw":
-		return concat_raw_df()
-
-	if format == "percent":
-		return concat_percent_df()
-
-	return concat_raw_df(), concat_percent_df()
-
-
-def read_income_statement(symbol, year, quarter, format="raw"):
+def read_income_statement(symbol, year, quarter, format="raw", statement_df=None, by_id=False):
 	if convert_quarter_to_end_date(year, quarter) >= datetime.now():
 		if format == "both":
 			return None, None
 		return None
 	try:
-		income_statement_path = os.path.join(
-			PROJECT_PATH, "market/company", symbol, "incomestat", f"{year}-Q{quarter}.csv")
-
-		if not os.path.exists(income_statement_path):
-			CrawlCompanyProfile(symbol).get_income_statement(from_year=year-1, to_year=year+1)
-
-		df = pd.read_csv(income_statement_path, header=0)
-		df.set_index("fields", inplace=True)
-		df.fillna(0, inplace=True)
-
-		if df.loc["1. Tổng doanh thu hoạt động kinh doanh"]["values"] < df.loc["3. Doanh thu thuần (1)-(2)"]["values"]:
-			df.loc["1. Tổng doanh thu hoạt động kinh doanh"]["values"] = df.loc["3. Doanh thu thuần (1)-(2)"]["values"] + \
-																		 df.loc["2. Các khoản giảm trừ doanh thu"]["values"]
+		df = _read_statement_quarter(symbol, "income_statement", year, quarter, statement_df, by_id)
+		df = _prepare_income_statement(df)
 
 		if format == "raw":
 			return df
-		percent_df = pd.DataFrame(columns=["fields", "values"])
-		first_row = df.index.to_list().index("1. Tổng doanh thu hoạt động kinh doanh")
-		last_row = df.index.to_list().index("21. Lợi nhuận sau thuế của cổ đông của công ty mẹ (19)-(20)")
-		revenue = df.loc["1. Tổng doanh thu hoạt động kinh doanh"]["values"]
-
-		for z in range(first_row, last_row+1):
-			percent_df = percent_df.append({
-				"fields": df.index[z],
-				"values": df.iloc[z]["values"]/revenue
-			}, ignore_index=True)
-		percent_df.set_index("fields", inplace=True)
+		percent_df = income_statement_common_size(df)
 		if format == "percent":
 			return percent_df
 		return df, percent_df
@@ -245,87 +512,42 @@ def read_income_statement(symbol, year, quarter, format="raw"):
 
 
 def read_income_statement_with_year_range(symbol, from_year, to_year, format="raw"):
-	list_raw_df = []
-	list_percent_df = []
-
-	index = None
-	for y in range(from_year, to_year+1):
-		for q in range(1, 5):
-			if format == "raw":
-				df = read_income_statement(symbol, year=y, quarter=q, format=format)
-				list_raw_df.append((f"{y}-Q{q}", df))
-				if df is not None and index is None:
-					index = df.index
-			elif format == "percent":
-				percent_df = read_income_statement(symbol, year=y, quarter=q, format=format)
-				list_percent_df.append((f"{y}-Q{q}", percent_df))
-				if percent_df is not None and index is None:
-					index = percent_df.index
-			else:
-				df, percent_df = read_income_statement(symbol, year=y, quarter=q, format=format)
-				if df is not None and index is None:
-					index = df.index
-				list_raw_df.append((f"{y}-Q{q}",df))
-				list_percent_df.append((f"{y}-Q{q}",percent_df))
-
-	def concat_raw_df():
-		ret_raw_df = pd.DataFrame()
-		ret_raw_df["fields"] = index
-		for (q, df) in list_raw_df:
-			if df is not None:
-				ret_raw_df[q] = df["values"].tolist()
-			else:
-				ret_raw_df[q] = ""
-		ret_raw_df.set_index("fields", inplace=True)
-		return ret_raw_df
-
-	def concat_percent_df():
-		ret_percent_df = pd.DataFrame()
-		ret_percent_df["fields"] = index
-		for q, df in list_percent_df:
-			if df is not None:
-				ret_percent_df[q] = df["values"].tolist()
-			else:
-				ret_percent_df[q] = ""
-		ret_percent_df.set_index("fields", inplace=True)
-		return ret_percent_df
-
-	if format == "raw":
-		return concat_raw_df()
-
-	if format == "percent":
-		return concat_percent_df()
-
-	return concat_raw_df(), concat_percent_df()
+	return _read_statement_with_year_range_format(
+		symbol, "income_statement", from_year, to_year, format, _prepare_income_statement, income_statement_common_size)
+
+
+# account codes of the operating cash flow, see finb.utils.accounts
+CFO_COMPONENTS = [
+	"operating_profit_before_working_capital",
+	"change_in_receivables",
+	"change_in_inventories",
+	"change_in_payables",
+	"change_in_prepaid_expenses",
+	"change_in_other_current_assets",
+	"interest_paid",
+	"income_tax_paid",
+	"other_operating_receipts",
+	"other_operating_payments"
+]
+
+
+def _prepare_cashflow(df):
+	""" Operating cash flow is rebuilt from its components where it is 0 """
+	df = df.fillna(0)
+	cfo_key = account_key(df.index, "cfo")
+	mask = df.loc[cfo_key] == 0
+	if mask.any():
+		components = [account_key(df.index, code) for code in CFO_COMPONENTS]
+		df.loc[cfo_key, mask] = df.loc[components, mask].sum()
+	return df
 
 
-def read_cashflow(symbol, year, quarter):
+def read_cashflow(symbol, year, quarter, statement_df=None, by_id=False):
 	if convert_quarter_to_end_date(year, quarter) >= datetime.now():
 		return None
 	try:
-		cashflow_path = os.path.join(
-			PROJECT_PATH, "market/company", symbol, "cashflow", f"{year}-Q{quarter}.csv")
-
-		if not os.path.exists(cashflow_path):
-			CrawlCompanyProfile(symbol).get_cashflow(from_year=year-1, to_year=year+1)
-
-		df = pd.read_csv(cashflow_path, header=0)
-		df.set_index("fields", inplace=True)
-		df.fillna(0, inplace=True)
-
-		if df.loc["Lưu chuyển tiền thuần từ hoạt động kinh doanh"]["values"] == 0:
-			df.loc["Lưu chuyển tiền thuần từ hoạt động kinh doanh"] = \
-				df.loc["3. Lợi nhuận từ hoạt động kinh doanh trước thay đổi vốn lưu động"]["values"] + \
-				df.loc["- Tăng, giảm các khoản phải thu"]["values"] + \
-				df.loc["- Tăng, giảm hàng tồn kho"]["values"] + \
-				df.loc["- Tăng, giảm các khoản phải trả (Không kể lãi vay phải trả, thuế thu nhập doanh nghiệp phải nộp)"]["values"] + \
-				df.loc["- Tăng giảm chi phí trả trước"]["values"] +\
-				df.loc["- Tăng giảm tài sản ngắn hạn khác"]["values"]+\
-				df.loc["- Tiền lãi vay phải trả"]["values"]+\
-				df.loc["- Thuế thu nhập doanh nghiệp đã nộp"]["values"]+\
-				df.loc["- Tiền thu khác từ hoạt động kinh doanh"]["values"]+\
-				df.loc["- Tiền chi khác từ hoạt động kinh doanh"]["values"]
-		return df
+		df = _read_statement_quarter(symbol, "cashflow", year, quarter, statement_df, by_id)
+		return _prepare_cashflow(df)
 	except Exception as e:
 		print("[read_cashflow] Warning ", str(e))
 
@@ -334,10 +556,11 @@ def read_cashflow(symbol, year, quarter):
 
 def read_cashflow_by_year_range(symbol, from_year, to_year):
 	list_raw_df = []
+	statement_df = read_statement_with_year_range(symbol, "cashflow", from_year, to_year)
 	index = None
 	for y in range(from_year, to_year + 1):
 		for q in range(1, 5):
-			df = read_cashflow(symbol, year=y, quarter=q)
+			df = read_cashflow(symbol, year=y, quarter=q, statement_df=statement_df)
 			list_raw_df.append((f"{y}-Q{q}", df))
 			if df is not None and index is None:
 				index = df.index
@@ -356,18 +579,25 @@ def read_cashflow_by_year_range(symbol, from_year, to_year):
 	return concat_raw_df()
 
 
-def read_financial_indicators(symbol, year, quarter):
-	try:
-		financial_indicators_path = os.path.join(
-			PROJECT_PATH, "market/company", symbol, "fininds", f"{year}-Q{quarter}.csv")
+STATEMENT_PREPARERS = {
+	"balance_sheet": _prepare_balance_sheet,
+	"income_statement": _prepare_income_statement,
+	"cashflow": _prepare_cashflow
+}
 
-		if not os.path.exists(financial_indicators_path):
-			CrawlCompanyProfile(symbol).get_financial_indicators()
 
-		df = pd.read_csv(financial_indicators_path, header=0)
-		df.set_index("fields", inplace=True)
+def read_statement(symbol, statement, by_id=False):
+	""" Every stored quarter of a statement with the adjustments of the quarterly readers, nothing is crawled
 
-		return df
+	:param by_id: index the rows by account ids, see finb.utils.accounts
+	:return: DataFrame fields x quarters, None when nothing is stored
+	"""
+	return _prepare_by_quarter(_read_statement_store_cached(symbol, statement, by_id), STATEMENT_PREPARERS[statement])
+
+
+def read_financial_indicators(symbol, year, quarter):
+	try:
+		return _read_statement_quarter(symbol, "financial_indicators", year, quarter)
 	except Exception as e:
 		print("[read_financial_indicators] Warning ", str(e))
 
@@ -380,20 +610,15 @@ def read_major_holders(symbol):
 	if not os.path.exists(major_holders_path):
 		CrawlCompanyProfile(symbol).get_major_holders()
 
-	df = pd.read_csv(major_holders_path)
+	df = _read_csv_cached(major_holders_path)
 
 	return df
 
 
 def get_same_industry(symbol, using_considered=True):
-	if using_considered:
-		filter_df = pd.read_csv(os.path.join(PROJECT_PATH, "market/considered.csv"))
-	else:
-		filter_df = read_companies_df()
-	filter_df.set_index("symbol", inplace=True)
-
-	industry_name = filter_df.loc[symbol].industryName
-	df = filter_df[filter_df["industryName"] == industry_name]
+	registry = read_company_registry(considered=using_considered)
+	industry_name = registry.get(symbol)["industryName"]
+	symbols = registry.industry(industry_name, listed_only=not using_considered)
 
-	return df
+	return registry.df.loc[symbols].copy()
 
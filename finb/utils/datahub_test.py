@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from finb.utils import datahub
+from finb.utils.datahub import FileCache, read_price_df, balance_sheet_common_size, \
+    read_balance_sheet_with_year_range, read_balance_sheet, read_income_statement_with_year_range, \
+    read_income_statement
+from finb.utils.statement_store import update_statement_store, store_path
+
+BALANCE_SHEET_FIELDS = [
+    "TÀI SẢN", "A. Tài sản lưu động và đầu tư ngắn hạn", "B. Tài sản dài hạn", "TỔNG CỘNG TÀI SẢN",
+    "NGUỒN VỐN", "A. Nợ phải trả", "B. Vốn chủ sở hữu", "TỔNG CỘNG NGUỒN VỐN"
+]
+
+
+def balance_sheet_df(current, long_term, debt):
+    total = current + long_term
+    return pd.DataFrame(
+        {"values": [None, current, long_term, total, None, debt, total - debt, total]},
+        index=pd.Index(BALANCE_SHEET_FIELDS, name="fields"))
+
+
+class FileCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "a.csv")
+        pd.DataFrame({"x": [1, 2, 3]}).to_csv(self.path, index=False)
+        self.loads = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self, path):
+        self.loads += 1
+        return pd.read_csv(path)
+
+    def test_hit_miss_and_copies(self):
+        cache = FileCache()
+        df = cache.get(self.path, lambda: self.load(self.path))
+        df["x"] = 0
+        df = cache.get(self.path, lambda: self.load(self.path))
+
+        self.assertEqual(df["x"].tolist(), [1, 2, 3])
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_invalidated_when_file_changes(self):
+        cache = FileCache()
+        cache.get(self.path, lambda: self.load(self.path))
+        pd.DataFrame({"x": [1, 2, 3, 4]}).to_csv(self.path, index=False)
+
+        df = cache.get(self.path, lambda: self.load(self.path))
+        self.assertEqual(len(df), 4)
+        self.assertEqual(self.loads, 2)
+
+    def test_evicts_least_recently_used(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp_dir, f"{i}.csv")
+            pd.DataFrame({"x": range(100)}).to_csv(path, index=False)
+            paths.append(path)
+        size = datahub._sizeof(pd.read_csv(paths[0]))
+        cache = FileCache(max_bytes=2 * size)
+
+        cache.get(paths[0], lambda: self.load(paths[0]))
+        cache.get(paths[1], lambda: self.load(paths[1]))
+        cache.get(paths[0], lambda: self.load(paths[0]))
+        cache.get(paths[2], lambda: self.load(paths[2]))
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertLessEqual(cache.stats()["bytes"], 2 * size)
+        # paths[1] was the least recently used
+        cache.get(paths[0], lambda: self.load(paths[0]))
+        self.assertEqual(self.loads, 3)
+        cache.get(paths[1], lambda: self.load(paths[1]))
+        self.assertEqual(self.loads, 4)
+
+    def test_read_price_df_is_cached(self):
+        symbol_dir = os.path.join(self.tmp_dir, "market/company/AAA")
+        os.makedirs(symbol_dir)
+        dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=5)
+        pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 10},
+                     index=pd.DatetimeIndex(dates, name="Date")).to_csv(os.path.join(symbol_dir, "price.csv"))
+
+        with mock.patch("finb.utils.datahub.PROJECT_PATH", self.tmp_dir), \
+                mock.patch.object(datahub, "file_cache", FileCache()):
+            for _ in range(5):
+                df = read_price_df("AAA")
+            self.assertEqual(len(df), 5)
+            self.assertEqual(datahub.file_cache_stats()["misses"], 1)
+            self.assertEqual(datahub.file_cache_stats()["hits"], 4)
+
+
+class CommonSizeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch("finb.utils.statement_store.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.crawl.company_profile.PROJECT_PATH", self.tmp_dir),
+            mock.patch.object(datahub, "file_cache", FileCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_common_size_all_quarters(self):
+        raw_df = pd.concat([balance_sheet_df(30, 70, 40)["values"].rename("2020-Q1"),
+                            balance_sheet_df(50, 150, 20)["values"].rename("2020-Q2")], axis=1).fillna(0)
+        percent_df = balance_sheet_common_size(raw_df)
+
+        self.assertEqual(percent_df.index.tolist(), BALANCE_SHEET_FIELDS)
+        self.assertEqual(percent_df["2020-Q1"].tolist(), [0, 0.3, 0.7, 1, 0, 0.4, 0.6, 1])
+        self.assertEqual(percent_df["2020-Q2"].tolist(), [0, 0.25, 0.75, 1, 0, 0.1, 0.9, 1])
+
+    def test_percent_store_follows_raw_store(self):
+        update_statement_store("AAA", "balance_sheet", {(q, 2019): balance_sheet_df(10 * q, 100, 50) for q in range(1, 5)})
+
+        percent_df = read_balance_sheet_with_year_range("AAA", 2019, 2019, "percent")
+        self.assertTrue(os.path.exists(store_path("AAA", "balance_sheet", "percent")))
+        self.assertAlmostEqual(percent_df.loc["A. Tài sản lưu động và đầu tư ngắn hạn", "2019-Q2"], 20 / 120)
+        pd.testing.assert_series_equal(
+            percent_df["2019-Q3"].rename("values"), read_balance_sheet("AAA", 2019, 3, "percent")["values"])
+
+        update_statement_store("AAA", "balance_sheet", {(2, 2019): balance_sheet_df(100, 100, 50)})
+        percent_df = read_balance_sheet_with_year_range("AAA", 2019, 2019, "percent")
+        self.assertAlmostEqual(percent_df.loc["A. Tài sản lưu động và đầu tư ngắn hạn", "2019-Q2"], 0.5)
+
+    def test_missing_account(self):
+        # no revenue deductions, the income statements can not be prepared
+        fields = ["1. Tổng doanh thu hoạt động kinh doanh", "3. Doanh thu thuần (1)-(2)", "4. Giá vốn hàng bán"]
+        update_statement_store("AAA", "income_statement", {
+            (q, 2019): pd.DataFrame({"values": [100.0, 90, 60]}, index=pd.Index(fields, name="fields"))
+            for q in range(1, 5)})
+
+        raw_df, percent_df = read_income_statement_with_year_range("AAA", 2019, 2019, "both")
+        self.assertEqual(raw_df.columns.tolist(), [f"2019-Q{q}" for q in range(1, 5)])
+        self.assertTrue((raw_df == "").all().all())
+        self.assertTrue((percent_df == "").all().all())
+        self.assertIsNone(read_income_statement("AAA", 2019, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone, timedelta
 import pytz
+from finb.utils.trading_calendar import previous_session
 
 tz = pytz.timezone('Asia/Ho_Chi_Minh')
 
@@ -32,11 +33,8 @@ def current_day():
 
 
 def latest_working_day():
-	cr_d = current_day()
-
-	while cr_d.weekday() >= 5:
-		cr_d = cr_d - timedelta(days=1)
-	return cr_d
+	""" Today or the last session before, exchange holidays are skipped """
+	return previous_session(current_day(), inclusive=True).to_pydatetime()
 
 def prev_quarter(year, quarter):
 	if quarter == 1:
@@ -0,0 +1,224 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from finb import PROJECT_PATH
+from finb.utils.trading_calendar import sessions
+
+# Market wide OHLCV panel memory-mapped from market/panel
+#   values.npy: float64 array symbols x dates x FIELDS, NaN where a symbol has no bar,
+#               the date axis keeps headroom so that new bars are written in place
+#   dates.npy: datetime64[D] of the date axis, same capacity as values.npy
+#   symbols.npy: symbols of the first axis
+#   meta.json: number of dates in use, written last on every update
+# Many processes may read the panel, one process writes it.
+
+PANEL_PATH = os.path.join(PROJECT_PATH, "market/panel")
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# about one year of sessions
+DATE_HEADROOM = 260
+
+_write_lock = threading.Lock()
+
+
+def _paths(panel_dir):
+    return (os.path.join(panel_dir, "values.npy"), os.path.join(panel_dir, "dates.npy"),
+            os.path.join(panel_dir, "symbols.npy"), os.path.join(panel_dir, "meta.json"))
+
+
+def _to_days(index):
+    return pd.DatetimeIndex(index).normalize().values.astype("datetime64[D]")
+
+
+def _write_panel(panel_dir, symbols, dates, values, headroom=DATE_HEADROOM):
+    """ Write a full panel, values is symbols x dates x FIELDS """
+    os.makedirs(panel_dir, exist_ok=True)
+    values_path, dates_path, symbols_path, meta_path = _paths(panel_dir)
+    n_dates = len(dates)
+    capacity = n_dates + headroom
+
+    tmp_values = np.lib.format.open_memmap(
+        values_path + ".tmp", mode="w+", dtype=np.float64, shape=(len(symbols), capacity, len(FIELDS)))
+    tmp_values[:] = np.nan
+    tmp_values[:, :n_dates] = values
+    tmp_values.flush()
+    del tmp_values
+
+    all_dates = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[D]")
+    all_dates[:n_dates] = dates
+    with open(dates_path + ".tmp", "wb") as fobj:
+        np.save(fobj, all_dates)
+    with open(symbols_path + ".tmp", "wb") as fobj:
+        np.save(fobj, np.array(list(symbols), dtype=str))
+
+    os.replace(values_path + ".tmp", values_path)
+    os.replace(dates_path + ".tmp", dates_path)
+    os.replace(symbols_path + ".tmp", symbols_path)
+    _write_meta(meta_path, n_dates)
+
+
+def _write_meta(meta_path, n_dates):
+    with open(meta_path + ".tmp", "w") as fobj:
+        json.dump({"n_dates": int(n_dates), "fields": list(FIELDS)}, fobj)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+class PricePanel:
+    """ Memory-mapped symbols x dates x OHLCV panel
+
+    values, field() and cross_section() are views on the mapped file, nothing is copied
+    """
+    def __init__(self, panel_dir=None, mode="r"):
+        """
+        :param mode: "r" to read, "r+" to update the panel in place with append()
+        """
+        self.panel_dir = PANEL_PATH if panel_dir is None else panel_dir
+        self.mode = mode
+        self.reload()
+
+    def reload(self):
+        """ Map the files again, picks up bars written by another process """
+        values_path, dates_path, symbols_path, meta_path = _paths(self.panel_dir)
+        with open(meta_path, "r") as fobj:
+            self.n_dates = json.load(fobj)["n_dates"]
+        self.symbols = pd.Index(np.load(symbols_path).tolist(), name="symbol")
+        self._values = np.load(values_path, mmap_mode=self.mode)
+        self._dates = np.load(dates_path, mmap_mode=self.mode)
+
+    @property
+    def capacity(self):
+        return self._values.shape[1]
+
+    @property
+    def values(self) -> np.ndarray:
+        """ symbols x dates x FIELDS view """
+        return self._values[:, :self.n_dates]
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self._dates[:self.n_dates], name="Date")
+
+    def field(self, name, on_sessions=False) -> pd.DataFrame:
+        """ dates x symbols frame of one field, e.g. panel.field("Close").pct_change()
+
+        :param on_sessions: reindex on the trading sessions from the first to the last date, a copy.
+                            Sessions no symbol has a bar for are NaN rows, bars off the sessions are dropped
+        """
+        k = FIELDS.index(name)
+        df = pd.DataFrame(self.values[:, :, k].T, index=self.dates, columns=self.symbols, copy=False)
+        if on_sessions and self.n_dates > 0:
+            df = df.reindex(sessions(self.dates[0], self.dates[-1]))
+        return df
+
+    def cross_section(self, date) -> pd.DataFrame:
+        """ symbols x FIELDS frame of one session """
+        j = self.dates.get_loc(pd.Timestamp(date))
+        return pd.DataFrame(self.values[:, j, :], index=self.symbols, columns=list(FIELDS), copy=False)
+
+    def symbol_df(self, symbol) -> pd.DataFrame:
+        """ Bars of one symbol, same layout as datahub.read_price_df """
+        i = self.symbols.get_loc(symbol)
+        df = pd.DataFrame(self.values[i], index=self.dates, columns=list(FIELDS))
+        return df.dropna(how="all")
+
+    def append(self, symbol, df):
+        """ Write the bars of a symbol, bars after the last date are appended in place.
+        The panel is rewritten when the symbol is new, a bar falls between known dates
+        or the headroom is used up.
+
+        :param df: price frame indexed by date with FIELDS columns
+        """
+        if self.mode != "r+":
+            raise ValueError("panel is opened read only")
+        if len(df) == 0:
+            return
+        bar_days = _to_days(df.index)
+        bars = df[list(FIELDS)].to_numpy(dtype=np.float64)
+
+        with _write_lock:
+            self.reload()
+            days = self._dates[:self.n_dates]
+            appended = bar_days > days[-1] if self.n_dates > 0 else np.ones(len(bar_days), dtype=bool)
+            new_days = np.unique(bar_days[appended])
+            known = appended | np.isin(bar_days, days)
+
+            if symbol not in self.symbols or not known.all() or self.n_dates + len(new_days) > self.capacity:
+                # after a rewrite every bar date is on the date axis
+                self._rewrite(symbol, bar_days)
+                new_days = new_days[:0]
+
+            n = self.n_dates + len(new_days)
+            self._dates[self.n_dates:n] = new_days
+            positions = np.searchsorted(self._dates[:n], bar_days)
+            self._values[self.symbols.get_loc(symbol), positions] = bars
+            self._values.flush()
+            self._dates.flush()
+            if n != self.n_dates:
+                _write_meta(_paths(self.panel_dir)[3], n)
+                self.n_dates = n
+
+    def _rewrite(self, symbol, bar_days):
+        symbols = self.symbols.tolist()
+        if symbol not in self.symbols:
+            symbols.append(symbol)
+        dates = np.union1d(self._dates[:self.n_dates], bar_days)
+        values = np.full((len(symbols), len(dates), len(FIELDS)), np.nan)
+        positions = np.searchsorted(dates, self._dates[:self.n_dates])
+        values[:len(self.symbols), positions] = self.values
+        _write_panel(self.panel_dir, symbols, dates, values)
+        self.reload()
+
+
+def build_panel(symbols=None, panel_dir=None, headroom=DATE_HEADROOM):
+    """ Build the panel from market/company/{symbol}/price.csv
+
+    :param symbols: symbols to include, default every symbol with a price.csv
+    :return: PricePanel opened for update
+    """
+    company_dir = os.path.join(PROJECT_PATH, "market/company")
+    if symbols is None:
+        symbols = sorted(os.listdir(company_dir)) if os.path.exists(company_dir) else []
+
+    frames = dict()
+    for symbol in symbols:
+        price_path = os.path.join(company_dir, symbol, "price.csv")
+        if not os.path.exists(price_path):
+            continue
+        try:
+            frames[symbol] = pd.read_csv(price_path, index_col=0, parse_dates=True)
+        except Exception as e:
+            print("[build_panel] Warning ", symbol, str(e))
+
+    symbols = list(frames.keys())
+    dates = np.unique(np.concatenate([_to_days(df.index) for df in frames.values()])) \
+        if len(frames) > 0 else np.array([], dtype="datetime64[D]")
+    values = np.full((len(symbols), len(dates), len(FIELDS)), np.nan)
+    for i, symbol in enumerate(symbols):
+        df = frames[symbol]
+        values[i, np.searchsorted(dates, _to_days(df.index))] = df[list(FIELDS)].to_numpy(dtype=np.float64)
+
+    panel_dir = PANEL_PATH if panel_dir is None else panel_dir
+    _write_panel(panel_dir, symbols, dates, values, headroom=headroom)
+    return PricePanel(panel_dir, mode="r+")
+
+
+def panel_exists(panel_dir=None):
+    return os.path.exists(_paths(PANEL_PATH if panel_dir is None else panel_dir)[3])
+
+
+def update_price_panel(symbol, df, panel_dir=None):
+    """ Write new bars of a symbol into the panel when the panel has been built """
+    panel_dir = PANEL_PATH if panel_dir is None else panel_dir
+    if not panel_exists(panel_dir):
+        return
+    try:
+        PricePanel(panel_dir, mode="r+").append(symbol, df)
+    except Exception as e:
+        print("[update_price_panel] Warning ", str(e))
+
+
+if __name__ == "__main__":
+    build_panel()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.utils.price_panel import PricePanel, build_panel, update_price_panel, FIELDS
+
+
+def make_price_df(dates, start=10.0):
+    n = len(dates)
+    close = start + np.arange(n, dtype=float)
+    df = pd.DataFrame({
+        "Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+        "Volume": np.arange(n) * 100 + 1000
+    }, index=pd.DatetimeIndex(dates, name="Date"))
+    return df
+
+
+class PricePanelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.panel_dir = os.path.join(self.tmp_dir, "market/panel")
+        self.patches = [
+            mock.patch("finb.utils.price_panel.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.price_panel.PANEL_PATH", self.panel_dir),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.days = pd.bdate_range("2020-01-01", periods=10)
+        self.frames = {
+            "AAA": make_price_df(self.days),
+            "BBB": make_price_df(self.days[3:], start=50)
+        }
+        for symbol, df in self.frames.items():
+            symbol_dir = os.path.join(self.tmp_dir, "market/company", symbol)
+            os.makedirs(symbol_dir)
+            df.to_csv(os.path.join(symbol_dir, "price.csv"))
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_build_and_read_views(self):
+        build_panel(headroom=5)
+        panel = PricePanel()
+
+        self.assertEqual(panel.symbols.tolist(), ["AAA", "BBB"])
+        self.assertTrue(panel.dates.equals(pd.DatetimeIndex(self.days, name="Date")))
+        self.assertEqual(panel.values.shape, (2, 10, len(FIELDS)))
+        self.assertEqual(panel.capacity, 15)
+
+        close = panel.field("Close")
+        self.assertTrue(np.shares_memory(close.values, panel.values))
+        self.assertTrue(np.isnan(close["BBB"].iloc[0]))
+        self.assertEqual(close["BBB"].iloc[3], 50)
+        # 2020-01-01 is New Year
+        on_sessions = panel.field("Close", on_sessions=True)
+        self.assertEqual(on_sessions.index[0], pd.Timestamp("2020-01-02"))
+        pd.testing.assert_frame_equal(on_sessions, close.iloc[1:], check_freq=False, check_names=False)
+
+        cross = panel.cross_section(self.days[5])
+        self.assertEqual(cross.loc["AAA", "Close"], 15)
+
+        pd.testing.assert_frame_equal(
+            panel.symbol_df("BBB"), self.frames["BBB"].astype(float), check_freq=False)
+
+    def test_append_in_place(self):
+        build_panel(headroom=5)
+        reader = PricePanel()
+        values_inode = os.stat(os.path.join(self.panel_dir, "values.npy")).st_ino
+
+        new_days = pd.bdate_range(self.days[-1], periods=3)
+        update_price_panel("AAA", make_price_df(new_days, start=100))
+
+        self.assertEqual(os.stat(os.path.join(self.panel_dir, "values.npy")).st_ino, values_inode)
+        reader.reload()
+        self.assertEqual(len(reader.dates), 12)
+        self.assertEqual(reader.field("Close")["AAA"].iloc[-3:].tolist(), [100, 101, 102])
+        self.assertTrue(np.isnan(reader.field("Close")["BBB"].iloc[-1]))
+
+    def test_new_symbol_and_full_headroom_rewrite(self):
+        build_panel(headroom=1)
+        panel = PricePanel(mode="r+")
+        panel.append("CCC", make_price_df(pd.bdate_range(self.days[-2], periods=4), start=7))
+
+        panel = PricePanel()
+        self.assertEqual(panel.symbols.tolist(), ["AAA", "BBB", "CCC"])
+        self.assertEqual(len(panel.dates), 12)
+        self.assertEqual(panel.field("Close")["CCC"].dropna().tolist(), [7, 8, 9, 10])
+        self.assertEqual(panel.field("Close")["AAA"].dropna().tolist(), self.frames["AAA"]["Close"].tolist())
+
+    def test_read_only_panel(self):
+        build_panel()
+        with self.assertRaises(ValueError):
+            PricePanel().append("AAA", self.frames["AAA"])
+
+
+if __name__ == '__main__':
+    unittest.main()
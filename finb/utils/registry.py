@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+import pandas as pd
+from unidecode import unidecode
+from finb import PROJECT_PATH
+
+# Reference data of the listed companies, market/companies.csv and market/considered.csv, parsed once
+# per process into hash indexes
+#   symbol -> row
+#   normalized name -> symbol, for the full name (company) and the short name (companyName)
+#   industry -> symbols, floor -> symbols
+# A registry is rebuilt by get_registry when the mtime or the size of its file changes.
+# Names are matched without accents, case and punctuation, the abbreviations of NAME_ABBREVIATIONS expanded.
+
+COMPANIES_PATH = os.path.join(PROJECT_PATH, "market/companies.csv")
+CONSIDERED_PATH = os.path.join(PROJECT_PATH, "market/considered.csv")
+
+NAME_COLUMNS = ["company", "companyName"]
+
+# abbreviations used by the holder names, matched as whole words after unidecode
+NAME_ABBREVIATIONS = {
+    "ctcp": "cong ty co phan",
+    "cty": "cong ty",
+    "tnhh": "trach nhiem huu han",
+    "mtv": "mot thanh vien",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_ABBREVIATIONS = re.compile(r"\b(" + "|".join(NAME_ABBREVIATIONS) + r")\b")
+
+
+def normalize_name(name):
+    """ Key of a company name, "CTCP Tập đoàn Hòa Phát" -> "cong ty co phan tap doan hoa phat" """
+    if not isinstance(name, str):
+        return ""
+    name = _PUNCTUATION.sub(" ", unidecode(name).lower())
+    name = _ABBREVIATIONS.sub(lambda m: NAME_ABBREVIATIONS[m.group(1)], name)
+    return _SPACES.sub(" ", name).strip()
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class CompanyRegistry:
+    """ Indexes of a csv of companies keyed by symbol """
+    def __init__(self, path):
+        self.path = path
+        self.stamp = _stamp(path)
+        df = pd.read_csv(path)
+        df.set_index("symbol", inplace=True)
+        self.df = df
+
+        listed = df["delistedDate"].isnull() if "delistedDate" in df.columns else pd.Series(True, index=df.index)
+        self.listed = set(df.index[listed.to_numpy()])
+        self.by_symbol = {symbol: row for symbol, row in zip(df.index, df.to_dict("records"))}
+        self.by_name = dict()
+        self.by_industry = dict()
+        self.by_floor = dict()
+        # a name shared by a delisted company and a listed one resolves to the listed one
+        for symbol in sorted(df.index, key=lambda s: s in self.listed):
+            row = self.by_symbol[symbol]
+            for col in NAME_COLUMNS:
+                key = normalize_name(row.get(col))
+                if key != "":
+                    self.by_name[key] = symbol
+        for col, index in [("industryName", self.by_industry), ("floor", self.by_floor)]:
+            if col not in df.columns:
+                continue
+            for symbol, value in zip(df.index, df[col]):
+                if not pd.isnull(value):
+                    index.setdefault(value, []).append(symbol)
+
+    def frame(self, filter_delisted=False) -> pd.DataFrame:
+        """ Rows indexed by symbol, a copy the caller may modify """
+        if filter_delisted:
+            return self.df[self.df.index.isin(self.listed)].copy()
+        return self.df.copy()
+
+    def get(self, symbol):
+        """ Row of a symbol as a dict, None when it is not registered """
+        return self.by_symbol.get(symbol)
+
+    def symbol_of(self, name):
+        """ Symbol of a company name, None when no company has the name """
+        return self.by_name.get(normalize_name(name))
+
+    def industry(self, name, listed_only=False):
+        """ Symbols of an industry """
+        return self._filter(self.by_industry.get(name, []), listed_only)
+
+    def floor(self, name, listed_only=False):
+        """ Symbols traded on a floor, e.g. HOSE """
+        return self._filter(self.by_floor.get(name, []), listed_only)
+
+    def _filter(self, symbols, listed_only):
+        return [s for s in symbols if s in self.listed] if listed_only else list(symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.by_symbol
+
+    def __len__(self):
+        return len(self.by_symbol)
+
+
+_registries = dict()
+_lock = threading.Lock()
+
+
+def get_registry(path=None):
+    """ Registry of a csv of companies, default companies.csv, None when the file does not exist """
+    path = COMPANIES_PATH if path is None else path
+    try:
+        stamp = _stamp(path)
+    except OSError:
+        return None
+    with _lock:
+        registry = _registries.get(path)
+        if registry is None or registry.stamp != stamp:
+            registry = CompanyRegistry(path)
+            _registries[path] = registry
+        return registry
+
+
+def get_considered_registry():
+    return get_registry(CONSIDERED_PATH)
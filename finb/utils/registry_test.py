@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from finb.utils import datahub, registry
+from finb.utils.datahub import FileCache, read_companies_df, read_company_registry, get_same_industry
+from finb.utils.registry import normalize_name, get_registry
+
+
+def write_companies(path, rows):
+    pd.DataFrame(rows, columns=["symbol", "company", "companyName", "status", "listedDate", "delistedDate", "floor",
+                                "industryName"]).to_csv(path, index=False)
+
+
+class RegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmp_dir, "market"))
+        self.path = os.path.join(self.tmp_dir, "market/companies.csv")
+        self.patches = [
+            mock.patch("finb.utils.datahub.PROJECT_PATH", self.tmp_dir),
+            mock.patch.object(registry, "COMPANIES_PATH", self.path),
+            mock.patch.object(registry, "_registries", dict()),
+            mock.patch.object(datahub, "file_cache", FileCache()),
+        ]
+        for p in self.patches:
+            p.start()
+        write_companies(self.path, [
+            ["HPG", "Công ty Cổ phần Tập đoàn Hòa Phát", "Hòa Phát", "listed", "2007-11-15", None, "HOSE", "Thép"],
+            ["HSG", "Công ty Cổ phần Tập đoàn Hoa Sen", "Hoa Sen", "listed", "2008-12-05", None, "HOSE", "Thép"],
+            ["SSI", "Công ty Cổ phần Chứng khoán SSI", "Chứng khoán SSI", "listed", "2006-10-29", None, "HOSE",
+             "Chứng khoán"],
+            ["OLD", "Công ty Cổ phần Tập đoàn Hoa Sen", "Hoa Sen cũ", "delisted", "2001-01-01", "2005-01-01", "HNX",
+             "Thép"],
+        ])
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("CTCP  Tập đoàn Hòa Phát."), "cong ty co phan tap doan hoa phat")
+        self.assertEqual(normalize_name("Công ty TNHH MTV X"), "cong ty trach nhiem huu han mot thanh vien x")
+        self.assertEqual(normalize_name(None), "")
+
+    def test_indexes(self):
+        reg = get_registry()
+        self.assertEqual(reg.get("HPG")["floor"], "HOSE")
+        self.assertIsNone(reg.get("XXX"))
+        self.assertEqual(reg.symbol_of("CTCP TẬP ĐOÀN HÒA PHÁT"), "HPG")
+        self.assertEqual(reg.symbol_of("cong ty co phan chung khoan ssi"), "SSI")
+        # the listed company wins a shared name
+        self.assertEqual(reg.symbol_of("Công ty Cổ phần Tập đoàn Hoa Sen"), "HSG")
+        self.assertIsNone(reg.symbol_of("Nguyễn Văn A"))
+        self.assertEqual(reg.industry("Thép"), ["HPG", "HSG", "OLD"])
+        self.assertEqual(reg.industry("Thép", listed_only=True), ["HPG", "HSG"])
+        self.assertEqual(reg.floor("HNX"), ["OLD"])
+        self.assertIs(get_registry(), reg)
+
+    def test_reload_on_change(self):
+        reg = get_registry()
+        write_companies(self.path, [["VNM", "Công ty Cổ phần Sữa Việt Nam", "Vinamilk", "listed", "2006-01-19", None,
+                                     "HOSE", "Thực phẩm"]])
+        os.utime(self.path, ns=(reg.stamp[0] + 10 ** 9, reg.stamp[0] + 10 ** 9))
+        reg = get_registry()
+        self.assertNotIn("HPG", reg)
+        self.assertEqual(reg.symbol_of("cong ty co phan sua viet nam"), "VNM")
+
+    def test_datahub_readers(self):
+        self.assertEqual(read_companies_df().index.tolist(), ["HPG", "HSG", "SSI"])
+        self.assertEqual(len(read_companies_df(False)), 4)
+        # callers get a copy
+        read_companies_df().drop(columns="company", inplace=True)
+        self.assertIn("company", read_company_registry().df.columns)
+        self.assertEqual(get_same_industry("HPG", using_considered=False).index.tolist(), ["HPG", "HSG"])
+
+
+if __name__ == "__main__":
+    unittest.main()
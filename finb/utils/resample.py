@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from finb.utils.price_panel import FIELDS
+
+# OHLCV bars over calendar periods, freq is a pandas period frequency:
+#   "W" weeks from Monday, "W-WED" weeks ending on Wednesday, "M" months, "Q" quarters,
+#   "Q-JUN" quarters of a fiscal year ending in June, "A" years
+# Bars are labelled by the first day of their period.
+
+
+def period_starts(index, freq="W") -> np.ndarray:
+    """ Positions of the first row of every period, index is sorted """
+    ordinals = pd.DatetimeIndex(index).to_period(freq).asi8
+    if len(ordinals) == 0:
+        return np.array([], dtype=np.int64)
+    return np.flatnonzero(np.diff(ordinals, prepend=ordinals[0] - 1))
+
+
+def period_labels(index, freq="W") -> pd.DatetimeIndex:
+    """ First day of the period of every row """
+    return pd.DatetimeIndex(index).to_period(freq).start_time
+
+
+def resample_ohlcv(df: pd.DataFrame, freq="W") -> pd.DataFrame:
+    """ OHLCV bars of a price frame in one grouped pass
+
+    :param df: price frame indexed by date with FIELDS columns
+    :return: frame indexed by the first day of each period, in time order
+    """
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    starts = period_starts(df.index, freq)
+    ends = np.append(starts[1:], len(df)) - 1
+
+    bars = pd.DataFrame(index=period_labels(df.index[starts], freq))
+    if len(starts) == 0:
+        return pd.DataFrame(columns=list(FIELDS), index=bars.index)
+    bars["Open"] = df["Open"].to_numpy()[starts]
+    bars["High"] = np.maximum.reduceat(df["High"].to_numpy(), starts)
+    bars["Low"] = np.minimum.reduceat(df["Low"].to_numpy(), starts)
+    bars["Close"] = df["Close"].to_numpy()[ends]
+    bars["Volume"] = np.add.reduceat(df["Volume"].to_numpy(), starts)
+    return bars
+
+
+def resample_panel(panel, freq="W"):
+    """ OHLCV bars of every symbol of a PricePanel
+
+    A symbol without a bar in a period is NaN, open and close are the first and the last bars
+    the symbol has in the period.
+
+    :return: (DatetimeIndex of the periods, symbols x periods x FIELDS array)
+    """
+    values = panel.values
+    starts = period_starts(panel.dates, freq)
+    labels = period_labels(panel.dates[starts], freq)
+    n_symbols, n_dates, _ = values.shape
+    ret = np.full((n_symbols, len(starts), len(FIELDS)), np.nan)
+    if len(starts) == 0:
+        return labels, ret
+
+    close = values[:, :, FIELDS.index("Close")]
+    valid = ~np.isnan(close)
+    positions = np.broadcast_to(np.arange(n_dates), valid.shape)
+    first = np.minimum.reduceat(np.where(valid, positions, n_dates), starts, axis=1)
+    last = np.maximum.reduceat(np.where(valid, positions, -1), starts, axis=1)
+    has_bar = last >= 0
+    rows = np.arange(n_symbols)[:, None]
+
+    ret[:, :, FIELDS.index("Open")] = np.where(
+        has_bar, values[rows, np.minimum(first, n_dates - 1), FIELDS.index("Open")], np.nan)
+    ret[:, :, FIELDS.index("Close")] = np.where(has_bar, close[rows, np.maximum(last, 0)], np.nan)
+    with np.errstate(invalid="ignore"):
+        ret[:, :, FIELDS.index("High")] = np.fmax.reduceat(values[:, :, FIELDS.index("High")], starts, axis=1)
+        ret[:, :, FIELDS.index("Low")] = np.fmin.reduceat(values[:, :, FIELDS.index("Low")], starts, axis=1)
+    volume = np.add.reduceat(np.nan_to_num(values[:, :, FIELDS.index("Volume")]), starts, axis=1)
+    ret[:, :, FIELDS.index("Volume")] = np.where(has_bar, volume, np.nan)
+    return labels, ret
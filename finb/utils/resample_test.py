@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.utils import datahub
+from finb.utils.datahub import FileCache, generate_weekly_quotes, read_resampled_price_df, read_resampled_price_panel
+from finb.utils.price_panel import build_panel
+from finb.utils.resample import resample_ohlcv, resample_panel
+
+
+def make_price_df(dates, seed=0):
+    rng = np.random.RandomState(seed)
+    close = np.round(50 + rng.rand(len(dates)) * 10, 1)
+    return pd.DataFrame({
+        "Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+        "Volume": rng.randint(1, 100, len(dates)) * 100
+    }, index=pd.DatetimeIndex(dates, name="Date"))
+
+
+class ResampleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df = make_price_df(pd.bdate_range("2020-01-01", "2020-12-31"))
+
+    def test_weekly_quotes(self):
+        df = generate_weekly_quotes(self.df)
+        week = self.df.index - pd.to_timedelta(self.df.index.dayofweek, unit="d")
+        expected = self.df.groupby(week).agg(
+            {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+
+        self.assertEqual(df.index.name, "Week")
+        self.assertEqual(df.index.tolist(), expected.index.tolist())
+        np.testing.assert_array_equal(df.to_numpy(), expected.to_numpy())
+        self.assertEqual(df["Volume"].dtype, self.df["Volume"].dtype)
+
+    def test_frequencies(self):
+        for freq in ["M", "Q", "W-WED"]:
+            df = resample_ohlcv(self.df, freq)
+            expected = self.df.groupby(self.df.index.to_period(freq)).agg(
+                {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+            np.testing.assert_array_equal(df.to_numpy(), expected.to_numpy(), err_msg=freq)
+
+        # labelled by the first day of the period
+        self.assertEqual(resample_ohlcv(self.df, "Q").index.tolist(),
+                         pd.to_datetime(["2020-01-01", "2020-04-01", "2020-07-01", "2020-10-01"]).tolist())
+        self.assertEqual(resample_ohlcv(self.df, "W-WED").index[0], pd.Timestamp("2019-12-26"))
+
+    def test_resample_panel(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            frames = {"AAA": self.df, "BBB": make_price_df(self.df.index[30:-40], seed=1)}
+            frames["BBB"] = frames["BBB"].drop(frames["BBB"].index[10:13])
+            for symbol, df in frames.items():
+                os.makedirs(os.path.join(tmp_dir, "market/company", symbol))
+                df.to_csv(os.path.join(tmp_dir, "market/company", symbol, "price.csv"))
+            with mock.patch("finb.utils.price_panel.PROJECT_PATH", tmp_dir):
+                panel = build_panel(panel_dir=os.path.join(tmp_dir, "market/panel"))
+
+            labels, values = resample_panel(panel, "W")
+            for i, symbol in enumerate(panel.symbols):
+                expected = resample_ohlcv(frames[symbol], "W")
+                positions = labels.get_indexer(expected.index)
+                np.testing.assert_array_equal(values[i, positions], expected.to_numpy(dtype=np.float64))
+                other = np.setdiff1d(np.arange(len(labels)), positions)
+                self.assertTrue(np.isnan(values[i, other]).all())
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class ResampledReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch("finb.utils.datahub.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.price_panel.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.utils.price_panel.PANEL_PATH", os.path.join(self.tmp_dir, "market/panel")),
+            mock.patch.object(datahub, "file_cache", FileCache()),
+        ]
+        for p in self.patches:
+            p.start()
+        self.df = make_price_df(pd.date_range("2020-01-01", pd.Timestamp.now().normalize()))
+        os.makedirs(os.path.join(self.tmp_dir, "market/company/AAA"))
+        self.df.to_csv(os.path.join(self.tmp_dir, "market/company/AAA/price.csv"))
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cached(self):
+        monthly = read_resampled_price_df("AAA", "M")
+        pd.testing.assert_frame_equal(monthly, resample_ohlcv(self.df, "M"), check_freq=False, check_names=False)
+        misses = datahub.file_cache.stats()["misses"]
+        read_resampled_price_df("AAA", "M")
+        self.assertEqual(datahub.file_cache.stats()["misses"], misses)
+
+        panel_df = read_resampled_price_panel("M")
+        np.testing.assert_array_equal(panel_df[("Close", "AAA")].to_numpy(), monthly["Close"].to_numpy())
+        self.assertEqual(panel_df["Volume"].columns.tolist(), ["AAA"])
+
+
+if __name__ == "__main__":
+    unittest.main()
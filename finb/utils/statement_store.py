@@ -0,0 +1,224 @@
+import os
+import numpy as np
+import pandas as pd
+from finb import PROJECT_PATH
+from finb.crawl.planner import stored_quarters
+from finb.utils.accounts import account_ids, account_label, is_listed, normalize_label
+
+# One file per symbol and statement, market/company/{symbol}/{dir}.npz holding
+#   ids: int32 account ids of the rows, see finb.utils.accounts
+#   extra_ids, extra_labels: labels of the rows outside the chart of accounts
+#   quarters: "{year}-Q{quarter}" labels sorted in time
+#   values: float64 matrix rows x quarters, NaN where a quarter has no value
+# Stores written before the chart of accounts hold the labels in fields instead of ids and extra_*.
+# Frames derived from a store, e.g. the percent statements, are saved next to it as {dir}_{kind}.npz
+
+STATEMENT_DIRS = {
+    "balance_sheet": "balansheet",
+    "income_statement": "incomestat",
+    "cashflow": "cashflow",
+    "financial_indicators": "fininds"
+}
+
+
+def quarter_label(year, quarter):
+    return f"{year}-Q{quarter}"
+
+
+def parse_quarter_label(label):
+    """ "2020-Q3" -> (3, 2020) """
+    year, quarter = label.split("-Q")
+    return int(quarter), int(year)
+
+
+def _sort_key(label):
+    quarter, year = parse_quarter_label(label)
+    return year * 4 + quarter
+
+
+def store_path(symbol, statement, kind="raw"):
+    name = STATEMENT_DIRS[statement] if kind == "raw" else f"{STATEMENT_DIRS[statement]}_{kind}"
+    return os.path.join(PROJECT_PATH, "market/company", symbol, name + ".npz")
+
+
+def _csv_dir(symbol, statement):
+    return os.path.join(PROJECT_PATH, "market/company", symbol, STATEMENT_DIRS[statement])
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def write_statement_store(symbol, statement, df, kind="raw", source=(0, 0)):
+    """ Save a fields x quarters frame as the store of a symbol
+
+    :param source: (mtime_ns, size) of the raw store a derived frame was built from
+    """
+    path = store_path(symbol, statement, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = sorted(df.columns, key=_sort_key)
+    df = df[columns].apply(pd.to_numeric, errors="coerce")
+    ids = account_ids(statement, df.index)
+    labels = dict()
+    for i, label in zip(ids.tolist(), df.index):
+        labels.setdefault(i, normalize_label(label))
+    df = _merge_rows(df, ids)
+    ids = df.index.to_numpy()
+    extra = [(i, labels[i]) for i in ids.tolist() if not is_listed(i)]
+
+    # write to a temporary file first so readers never see a partially written store
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fobj:
+        np.savez(fobj,
+                 ids=ids.astype(np.int32),
+                 extra_ids=np.array([i for i, _ in extra], dtype=np.int32),
+                 extra_labels=np.array([label for _, label in extra], dtype=str),
+                 quarters=np.array(columns, dtype=str),
+                 values=df.to_numpy(dtype=np.float64),
+                 source=np.array(source, dtype=np.int64))
+    os.replace(tmp_path, path)
+
+
+def _merge_rows(df, ids):
+    """ Frame indexed by ids, rows of the spellings of one account are merged into one """
+    if len(np.unique(ids)) < len(ids):
+        df = df.groupby(ids, sort=False).first()
+    else:
+        df = df.set_axis(ids)
+    df.index.name = "account"
+    return df
+
+
+def _load(path, statement, by_id=False):
+    """ Store as a frame indexed by labels, or by account ids with by_id """
+    with np.load(path) as data:
+        quarters = data["quarters"].tolist()
+        values = data["values"]
+        fields = data["fields"].tolist() if "fields" in data.files else None
+        if fields is None:
+            ids = data["ids"].astype(np.int64)
+            extra = dict(zip(data["extra_ids"].tolist(), data["extra_labels"].tolist()))
+
+    if fields is not None:
+        df = pd.DataFrame(values, index=pd.Index(fields, name="fields"), columns=quarters)
+        return _merge_rows(df, account_ids(statement, fields)) if by_id else df
+
+    labels = [extra[i] if i in extra else account_label(i) for i in ids.tolist()]
+    if by_id:
+        # labels added to the table since the store was written get their account ids
+        return _merge_rows(pd.DataFrame(values, index=labels, columns=quarters), account_ids(statement, labels))
+    return pd.DataFrame(values, index=pd.Index(labels, name="fields"), columns=quarters)
+
+
+def read_statement_store(symbol, statement, migrate=True, by_id=False):
+    """ Read all quarters of a statement in one file read
+
+    :param migrate: build the store from the {year}-Q{quarter}.csv tree when there is no store yet
+    :param by_id: index the rows by account ids instead of labels
+    :return: DataFrame indexed by fields with one column per quarter, None when nothing is stored
+    """
+    path = store_path(symbol, statement)
+    if not os.path.exists(path):
+        if not migrate or migrate_statement_csvs(symbol, statement) is None:
+            return None
+    return _load(path, statement, by_id=by_id)
+
+
+def read_derived_store(symbol, statement, kind, build):
+    """ Frame built from the raw store by build(raw_df), saved next to the raw store
+    and built again when the raw store changes
+
+    :return: DataFrame, None when nothing is stored
+    """
+    raw_path = store_path(symbol, statement)
+    if not os.path.exists(raw_path) and migrate_statement_csvs(symbol, statement) is None:
+        return None
+    stamp = _stamp(raw_path)
+    path = store_path(symbol, statement, kind)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            source = tuple(data["source"].tolist()) if "source" in data.files else None
+        if source == stamp:
+            return _load(path, statement)
+    df = build(_load(raw_path, statement))
+    write_statement_store(symbol, statement, df, kind=kind, source=stamp)
+    return df
+
+
+def stored_store_quarters(symbol, statement):
+    """ Quarters held by the store with at least one value, set of (quarter, year) """
+    df = read_statement_store(symbol, statement)
+    if df is None:
+        return set()
+    return {parse_quarter_label(label) for label in df.columns[df.notnull().any(axis=0).to_numpy()]}
+
+
+def update_statement_store(symbol, statement, quarter_frames):
+    """ Merge crawled quarters into the store, new quarters replace stored ones
+
+    :param quarter_frames: dict (quarter, year) -> DataFrame indexed by fields with a "values" column
+    """
+    if len(quarter_frames) == 0:
+        return
+    df = read_statement_store(symbol, statement)
+    if df is None:
+        df = pd.DataFrame(index=pd.Index([], name="fields"))
+
+    new_df = pd.concat(
+        [f["values"].rename(quarter_label(year, quarter)) for (quarter, year), f in quarter_frames.items()],
+        axis=1)
+    # keep the order of stored fields, new fields go to the end
+    fields = df.index.tolist() + [f for f in new_df.index if f not in set(df.index)]
+    df = df.drop(columns=[c for c in new_df.columns if c in df.columns])
+    df = pd.concat([df.reindex(fields), new_df.reindex(fields)], axis=1)
+    df.index.name = "fields"
+    write_statement_store(symbol, statement, df)
+
+
+def migrate_statement_csvs(symbol, statement):
+    """ Build the store of a statement from its {year}-Q{quarter}.csv files
+
+    :return: the migrated frame, None when there is no csv
+    """
+    csv_dir = _csv_dir(symbol, statement)
+    columns = dict()
+    for quarter, year in stored_quarters(csv_dir):
+        label = quarter_label(year, quarter)
+        quarter_df = pd.read_csv(os.path.join(csv_dir, label + ".csv"), header=0)
+        quarter_df.set_index("fields", inplace=True)
+        quarter_df = quarter_df[~quarter_df.index.duplicated(keep='first')]
+        columns[label] = quarter_df["values"]
+    if len(columns) == 0:
+        return None
+
+    # fields in the order of the latest quarter, fields only seen in older quarters go to the end
+    labels = sorted(columns.keys(), key=_sort_key, reverse=True)
+    fields = []
+    seen = set()
+    for label in labels:
+        for f in columns[label].index:
+            if f not in seen:
+                seen.add(f)
+                fields.append(f)
+    df = pd.concat([columns[label].reindex(fields).rename(label) for label in labels], axis=1)
+    df.index.name = "fields"
+    write_statement_store(symbol, statement, df)
+    return df
+
+
+def migrate_all(symbols=None):
+    """ Migrate the csv trees of every symbol in market/company """
+    company_dir = os.path.join(PROJECT_PATH, "market/company")
+    if symbols is None:
+        symbols = sorted(os.listdir(company_dir)) if os.path.exists(company_dir) else []
+    for symbol in symbols:
+        for statement in STATEMENT_DIRS.keys():
+            try:
+                migrate_statement_csvs(symbol, statement)
+            except Exception as e:
+                print("[migrate_all] Warning ", symbol, statement, str(e))
+
+
+if __name__ == "__main__":
+    migrate_all()
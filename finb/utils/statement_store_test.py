@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import numpy as np
+import pandas as pd
+from finb.utils import statement_store
+from finb.utils.statement_store import read_statement_store, update_statement_store, store_path, \
+    stored_store_quarters
+from finb.crawl.company_profile import CrawlCompanyProfile
+from finb.crawl.planner import plan_statement_requests
+from finb.utils.accounts import ACCOUNT, account_id
+from finb.utils.datahub import read_balance_sheet, read_balance_sheet_with_year_range
+
+
+def quarter_df(values):
+    df = pd.DataFrame(list(values.items()), columns=["fields", "values"])
+    df.set_index("fields", inplace=True)
+    return df
+
+
+class StatementStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch("finb.utils.statement_store.PROJECT_PATH", self.tmp_dir),
+            mock.patch("finb.crawl.company_profile.PROJECT_PATH", self.tmp_dir),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_csv(self, symbol, year, quarter, values):
+        csv_dir = os.path.join(self.tmp_dir, "market/company", symbol, "balansheet")
+        os.makedirs(csv_dir, exist_ok=True)
+        quarter_df(values).to_csv(os.path.join(csv_dir, f"{year}-Q{quarter}.csv"))
+
+    def test_migrate_csv_tree(self):
+        self.write_csv("AAA", 2019, 4, {"a": 1, "b": 2})
+        self.write_csv("AAA", 2020, 1, {"a": 3, "b": 4, "c": 5})
+        self.write_csv("AAA", 2018, 2, {"a": 6, "d": None})
+
+        df = read_statement_store("AAA", "balance_sheet")
+
+        self.assertTrue(os.path.exists(store_path("AAA", "balance_sheet")))
+        self.assertEqual(df.columns.tolist(), ["2018-Q2", "2019-Q4", "2020-Q1"])
+        self.assertEqual(df.index.tolist(), ["a", "b", "c", "d"])
+        self.assertEqual(df.loc["c", "2020-Q1"], 5)
+        self.assertTrue(np.isnan(df.loc["c", "2019-Q4"]))
+        self.assertTrue(np.isnan(df.loc["d", "2018-Q2"]))
+
+    def test_update_merges_quarters(self):
+        update_statement_store("AAA", "balance_sheet", {(1, 2020): quarter_df({"a": 1, "b": 2})})
+        update_statement_store("AAA", "balance_sheet", {
+            (4, 2019): quarter_df({"a": 3, "c": 4}),
+            (1, 2020): quarter_df({"a": 10, "b": 20})
+        })
+
+        df = read_statement_store("AAA", "balance_sheet")
+        self.assertEqual(df.columns.tolist(), ["2019-Q4", "2020-Q1"])
+        self.assertEqual(df.index.tolist(), ["a", "b", "c"])
+        self.assertEqual(df["2020-Q1"].tolist()[:2], [10, 20])
+        self.assertEqual(df.loc["c", "2019-Q4"], 4)
+
+    def test_unpublished_quarter_is_crawled_again(self):
+        crawler = CrawlCompanyProfile("AAA")
+        # BSC returns the quarters of a call which are not published yet without values
+        crawler._save_statement("balance_sheet", {(1, 2020): [["x", 1.0], ["y", 2.0]],
+                                                  (2, 2020): [["x", None], ["y", None]]})
+        self.assertEqual(stored_store_quarters("AAA", "balance_sheet"), {(1, 2020)})
+        plan = plan_statement_requests(2020, 2021, stored_store_quarters("AAA", "balance_sheet"),
+                                       now=datetime(2020, 8, 15))
+        self.assertEqual(plan, [(2020, 2, 1)])
+
+        # stores written before hold the empty quarter
+        update_statement_store("AAA", "balance_sheet", {(3, 2020): quarter_df({"x": np.nan, "y": np.nan})})
+        self.assertEqual(stored_store_quarters("AAA", "balance_sheet"), {(1, 2020)})
+
+    def test_rows_keyed_by_account_ids(self):
+        update_statement_store("AAA", "balance_sheet", {
+            (1, 2020): quarter_df({"TỔNG CỘNG TÀI SẢN": 10, "IV. Tổng hàng tồn kho": 1, "x": 2}),
+            (2, 2020): quarter_df({"Tổng cộng tài sản ": 20, "IV. Hàng tồn kho": 3, "x": 4}),
+        })
+        with np.load(store_path("AAA", "balance_sheet")) as data:
+            self.assertNotIn("fields", data.files)
+            self.assertEqual(data["ids"].dtype, np.int32)
+            self.assertEqual(data["extra_labels"].tolist(), ["x"])
+
+        # the spellings of an account share one row
+        df = read_statement_store("AAA", "balance_sheet")
+        self.assertEqual(df.index.tolist(), ["TỔNG CỘNG TÀI SẢN", "IV. Tổng hàng tồn kho", "x"])
+        self.assertEqual(df.loc["TỔNG CỘNG TÀI SẢN"].tolist(), [10, 20])
+        self.assertEqual(df.loc["IV. Tổng hàng tồn kho"].tolist(), [1, 3])
+
+        ids_df = read_statement_store("AAA", "balance_sheet", by_id=True)
+        self.assertEqual(ids_df.loc[ACCOUNT["total_assets"]].tolist(), [10, 20])
+        self.assertEqual(ids_df.loc[account_id("balance_sheet", "x")].tolist(), [2, 4])
+
+    def test_colliding_labels_keep_their_rows(self):
+        update_statement_store("AAA", "cashflow", {
+            (1, 2020): quarter_df({"Khoản mục 3824": 1, "Khoản mục 6607": 2}),
+        })
+        df = read_statement_store("AAA", "cashflow")
+        self.assertEqual(df["2020-Q1"].to_dict(), {"Khoản mục 3824": 1, "Khoản mục 6607": 2})
+        self.assertEqual(len(read_statement_store("AAA", "cashflow", by_id=True)), 2)
+
+    def test_reads_label_stores(self):
+        path = store_path("AAA", "balance_sheet")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as fobj:
+            np.savez(fobj, fields=np.array(["TỔNG CỘNG TÀI SẢN", "x"]), quarters=np.array(["2020-Q1"]),
+                     values=np.array([[1.0], [2.0]]), source=np.array([0, 0]))
+        self.assertEqual(read_statement_store("AAA", "balance_sheet").index.tolist(), ["TỔNG CỘNG TÀI SẢN", "x"])
+        df = read_statement_store("AAA", "balance_sheet", by_id=True)
+        self.assertEqual(df.loc[ACCOUNT["total_assets"], "2020-Q1"], 1)
+
+    def test_year_range_reads_store_once(self):
+        frames = {(q, y): quarter_df({"a": y + q, "b": q}) for y in range(2017, 2020) for q in range(1, 5)}
+        update_statement_store("AAA", "balance_sheet", frames)
+
+        with mock.patch.object(statement_store, "_load", wraps=statement_store._load) as load:
+            df = read_balance_sheet_with_year_range("AAA", 2018, 2019)
+        self.assertEqual(load.call_count, 1)
+
+        self.assertEqual(df.columns.tolist(), [f"{y}-Q{q}" for y in range(2018, 2020) for q in range(1, 5)])
+        self.assertEqual(df.loc["a", "2019-Q3"], 2022)
+        pd.testing.assert_series_equal(
+            read_balance_sheet("AAA", 2018, 2)["values"], df["2018-Q2"].rename("values"), check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+from datetime import datetime, time
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Trading calendar of HOSE and HNX, both exchanges share the holidays and the session times.
+# Sessions are weekdays that are not exchange holidays:
+#   New Year 1/1, Reunification Day 30/4, Labour Day 1/5, National Day 2/9 and Hung Kings
+#   Commemoration 10/3 of the lunar calendar, a holiday on a weekend is taken the next weekday
+#   Tet, the exchanges close from two days before the lunar new year to its fourth day
+#   EXTRA_HOLIDAYS, days off the government adds around the holidays
+# Lunar dates are tabled from FIRST_YEAR to LAST_YEAR, add the dates of a new year to TET and HUNG_KINGS.
+
+FIRST_YEAR = 2001
+LAST_YEAR = 2030
+
+# first day of the lunar year
+TET = {
+    2001: "2001-01-24", 2002: "2002-02-12", 2003: "2003-02-01", 2004: "2004-01-22", 2005: "2005-02-09",
+    2006: "2006-01-29", 2007: "2007-02-17", 2008: "2008-02-07", 2009: "2009-01-26", 2010: "2010-02-14",
+    2011: "2011-02-03", 2012: "2012-01-23", 2013: "2013-02-10", 2014: "2014-01-31", 2015: "2015-02-19",
+    2016: "2016-02-08", 2017: "2017-01-28", 2018: "2018-02-16", 2019: "2019-02-05", 2020: "2020-01-25",
+    2021: "2021-02-12", 2022: "2022-02-01", 2023: "2023-01-22", 2024: "2024-02-10", 2025: "2025-01-29",
+    2026: "2026-02-17", 2027: "2027-02-06", 2028: "2028-01-26", 2029: "2029-02-13", 2030: "2030-02-03",
+}
+
+# 10th day of the 3rd lunar month, a public holiday since 2007
+HUNG_KINGS = {
+    2007: "2007-04-26", 2008: "2008-04-15", 2009: "2009-04-05", 2010: "2010-04-23", 2011: "2011-04-12",
+    2012: "2012-03-31", 2013: "2013-04-19", 2014: "2014-04-09", 2015: "2015-04-28", 2016: "2016-04-16",
+    2017: "2017-04-06", 2018: "2018-04-25", 2019: "2019-04-14", 2020: "2020-04-02", 2021: "2021-04-21",
+    2022: "2022-04-10", 2023: "2023-04-29", 2024: "2024-04-18", 2025: "2025-04-07", 2026: "2026-04-26",
+    2027: "2027-04-16", 2028: "2028-04-04", 2029: "2029-04-23", 2030: "2030-04-12",
+}
+
+# (month, day)
+FIXED_HOLIDAYS = [(1, 1), (4, 30), (5, 1), (9, 2)]
+
+# days before and after the lunar new year the exchanges are closed
+TET_CLOSURE = (-2, 4)
+
+EXTRA_HOLIDAYS = [
+    # the second day of National Day, from 2021
+    "2021-09-03", "2022-09-01", "2023-09-01", "2024-09-03", "2025-09-01",
+    # swapped with a working Saturday
+    "2024-04-29", "2025-05-02",
+]
+
+SESSION_TIMES = {
+    "HOSE": {"open": time(9, 0), "break": (time(11, 30), time(13, 0)), "atc": (time(14, 30), time(14, 45)),
+             "close": time(15, 0)},
+    "HNX": {"open": time(9, 0), "break": (time(11, 30), time(13, 0)), "atc": (time(14, 30), time(14, 45)),
+            "close": time(15, 0)},
+}
+
+
+def holidays(from_year=FIRST_YEAR, to_year=LAST_YEAR) -> pd.DatetimeIndex:
+    """ Weekdays the exchanges are closed """
+    days = set()
+    for year in range(from_year, to_year + 1):
+        public = [pd.Timestamp(year, m, d) for m, d in FIXED_HOLIDAYS]
+        if year in HUNG_KINGS:
+            public.append(pd.Timestamp(HUNG_KINGS[year]))
+        if year in TET:
+            tet = pd.Timestamp(TET[year])
+            days.update(pd.date_range(tet + pd.Timedelta(days=TET_CLOSURE[0]), tet + pd.Timedelta(days=TET_CLOSURE[1])))
+
+        days.update(public)
+        # a holiday on a weekend is taken the next free weekday
+        for day in sorted(public):
+            if day.dayofweek < 5:
+                continue
+            while day.dayofweek >= 5 or day in days:
+                day += pd.Timedelta(days=1)
+            days.add(day)
+
+    days.update(pd.to_datetime(EXTRA_HOLIDAYS))
+    days = pd.DatetimeIndex(sorted(days))
+    return days[(days.dayofweek < 5) & (days.year >= from_year) & (days.year <= to_year)]
+
+
+@lru_cache(maxsize=1)
+def busdaycalendar() -> np.busdaycalendar:
+    """ numpy business day calendar of the sessions, for np.busday_offset and np.busday_count """
+    return np.busdaycalendar(weekmask="1111100", holidays=holidays().values.astype("datetime64[D]"))
+
+
+def _to_days(dates):
+    """ datetime64[D] array of dates and whether a single date was given """
+    scalar = np.ndim(dates) == 0 and not isinstance(dates, (pd.Index, pd.Series))
+    days = pd.DatetimeIndex([dates] if scalar else dates).values.astype("datetime64[D]")
+    return days, scalar
+
+
+def _from_days(days, scalar):
+    index = pd.DatetimeIndex(days.astype("datetime64[ns]"))
+    return index[0] if scalar else index
+
+
+def is_session(dates):
+    """ Whether the dates are sessions, bool or bool array """
+    days, scalar = _to_days(dates)
+    ret = np.is_busday(days, busdaycal=busdaycalendar())
+    return bool(ret[0]) if scalar else ret
+
+
+def next_session(dates, inclusive=False):
+    """ First session after each date, on or after with inclusive
+
+    :param dates: a date or array-like of dates
+    :return: Timestamp or DatetimeIndex
+    """
+    days, scalar = _to_days(dates)
+    if inclusive:
+        ret = np.busday_offset(days, 0, roll="forward", busdaycal=busdaycalendar())
+    else:
+        ret = np.busday_offset(days, 1, roll="backward", busdaycal=busdaycalendar())
+    return _from_days(ret, scalar)
+
+
+def previous_session(dates, inclusive=False):
+    """ Last session before each date, on or before with inclusive """
+    days, scalar = _to_days(dates)
+    if inclusive:
+        ret = np.busday_offset(days, 0, roll="backward", busdaycal=busdaycalendar())
+    else:
+        ret = np.busday_offset(days, -1, roll="forward", busdaycal=busdaycalendar())
+    return _from_days(ret, scalar)
+
+
+def sessions(start, end) -> pd.DatetimeIndex:
+    """ Sessions from start to end, both included """
+    days = np.arange(np.datetime64(pd.Timestamp(start).date()), np.datetime64(pd.Timestamp(end).date()) + 1)
+    return pd.DatetimeIndex(days[np.is_busday(days, busdaycal=busdaycalendar())].astype("datetime64[ns]"),
+                            name="Date")
+
+
+def session_count(start, end):
+    """ Number of sessions from start to end, both included, vectorized like np.busday_count """
+    start, _ = _to_days(start)
+    end, scalar = _to_days(end)
+    ret = np.busday_count(start, end + 1, busdaycal=busdaycalendar())
+    return int(ret[0]) if scalar else ret
+
+
+def quarter_end_sessions(years, quarters):
+    """ Last session of each quarter
+
+    :param years: a year or array-like of years
+    :param quarters: quarters 1 to 4 of the years
+    """
+    scalar = np.ndim(years) == 0
+    months = (np.atleast_1d(years).astype(np.int64) - 1970) * 12 + 3 * np.atleast_1d(quarters).astype(np.int64)
+    last_days = months.astype("datetime64[M]").astype("datetime64[D]") - 1
+    return _from_days(np.busday_offset(last_days, 0, roll="backward", busdaycal=busdaycalendar()), scalar)
+
+
+def session_close(date, exchange="HOSE") -> datetime:
+    """ End of the session of a date, put-through trades included """
+    return datetime.combine(pd.Timestamp(date).date(), SESSION_TIMES[exchange]["close"])
+
+
+def latest_closed_session(now=None, exchange="HOSE") -> pd.Timestamp:
+    """ Last session whose trading has ended, its bar is final """
+    now = datetime.now() if now is None else pd.Timestamp(now).to_pydatetime()
+    today = pd.Timestamp(now.date())
+    if is_session(today) and now >= session_close(today, exchange):
+        return today
+    return previous_session(today)
@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from finb.utils.trading_calendar import holidays, is_session, next_session, previous_session, sessions, \
+    session_count, quarter_end_sessions, latest_closed_session
+
+
+class TradingCalendarTestCase(unittest.TestCase):
+    def test_holidays(self):
+        days = holidays(2023, 2024)
+        # Tet 2024 from Thursday 8/2 to Wednesday 14/2
+        for day in pd.date_range("2024-02-08", "2024-02-14"):
+            self.assertFalse(is_session(day))
+        self.assertTrue(is_session("2024-02-15"))
+        # Hung Kings on Saturday 29/4/2023 and Reunification Day on Sunday are taken after Labour Day
+        for day in ["2023-05-01", "2023-05-02", "2023-05-03"]:
+            self.assertIn(pd.Timestamp(day), days)
+        self.assertTrue((days.dayofweek < 5).all())
+
+    def test_vectorized(self):
+        dates = pd.to_datetime(["2024-02-07", "2024-02-10", "2024-02-15", "2024-02-17"])
+        self.assertEqual(next_session(dates).strftime("%Y-%m-%d").tolist(),
+                         ["2024-02-15", "2024-02-15", "2024-02-16", "2024-02-19"])
+        self.assertEqual(next_session(dates, inclusive=True).strftime("%Y-%m-%d").tolist(),
+                         ["2024-02-07", "2024-02-15", "2024-02-15", "2024-02-19"])
+        self.assertEqual(previous_session(dates).strftime("%Y-%m-%d").tolist(),
+                         ["2024-02-06", "2024-02-07", "2024-02-07", "2024-02-16"])
+        np.testing.assert_array_equal(is_session(dates), [True, False, True, False])
+        self.assertEqual(previous_session("2024-02-15", inclusive=True), pd.Timestamp("2024-02-15"))
+
+        days = sessions("2024-02-01", "2024-02-29")
+        self.assertEqual(len(days), 16)
+        self.assertEqual(session_count("2024-02-01", "2024-02-29"), 16)
+        np.testing.assert_array_equal(session_count(["2024-02-01", "2024-02-15"], ["2024-02-14", "2024-02-16"]),
+                                      [5, 2])
+
+    def test_quarter_end(self):
+        self.assertEqual(quarter_end_sessions([2024, 2023, 2024], [1, 4, 2]).strftime("%Y-%m-%d").tolist(),
+                         ["2024-03-29", "2023-12-29", "2024-06-28"])
+        self.assertEqual(quarter_end_sessions(2025, 3), pd.Timestamp("2025-09-30"))
+
+    def test_latest_closed_session(self):
+        self.assertEqual(latest_closed_session(datetime(2024, 2, 15, 14)), pd.Timestamp("2024-02-07"))
+        self.assertEqual(latest_closed_session(datetime(2024, 2, 15, 15, 30)), pd.Timestamp("2024-02-15"))
+        self.assertEqual(latest_closed_session(datetime(2024, 2, 18, 10)), pd.Timestamp("2024-02-16"))
+
+
+if __name__ == "__main__":
+    unittest.main()